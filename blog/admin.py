@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import BlogCategory, Blog, BlogComment, Notification, ModerationLog
+from .models import BlogCategory, Blog, BlogComment, Notification, ModerationLog, ModerationTask
 
 
 # Register your models here.
@@ -12,7 +12,7 @@ class BlogAdmin(admin.ModelAdmin):
 
 
 class BlogCommentAdmin(admin.ModelAdmin):
-    list_display = ['blog', 'content', 'pub_time', 'author']
+    list_display = ['blog', 'content', 'pub_time', 'author', 'deleted_at']
 
 
 class NotificationAdmin(admin.ModelAdmin):
@@ -23,8 +23,13 @@ class ModerationLogAdmin(admin.ModelAdmin):
     list_display = ['author', 'content_type', 'content_id', 'original_content', 'reason', 'status', 'created_at']
 
 
+class ModerationTaskAdmin(admin.ModelAdmin):
+    list_display = ['author', 'kind', 'status', 'created_at', 'started_at', 'finished_at']
+
+
 admin.site.register(BlogCategory, BlogCategoryAdmin)
 admin.site.register(Blog, BlogAdmin)
 admin.site.register(BlogComment, BlogCommentAdmin)
 admin.site.register(Notification, NotificationAdmin)
 admin.site.register(ModerationLog, ModerationLogAdmin)
+admin.site.register(ModerationTask, ModerationTaskAdmin)
@@ -1,6 +1,19 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        # 注册列表计数缓存的信号处理函数
+        from . import counters  # noqa: F401
+
+        # 只在服务进程（wsgi/asgi 入口或 runserver）中预先构建审核引擎，
+        # 迁移、测试等其他 manage.py 命令在第一次审核时才加载词典
+        if os.environ.get('MODERATION_EAGER_LOAD') == '1' or 'runserver' in sys.argv:
+            from .moderation import get_engine
+            get_engine()
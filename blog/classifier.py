@@ -0,0 +1,119 @@
+"""
+高级审查：本地离线训练的文本分类模型。
+
+模型为 HashingVectorizer（字符 n-gram，适合中文）+ 线性分类器，
+由 manage.py train_moderation_model 根据审核日志中的人工通过 / 拒绝记录训练。
+每个进程只加载一次，按批量向量化推理；未安装 scikit-learn 或模型文件不存在时不启用。
+"""
+import hashlib
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.utils.html import strip_tags
+
+logger = logging.getLogger(__name__)
+
+_words_file = getattr(settings, 'SENSITIVE_WORDS_FILE', None)
+# 模型文件，默认与敏感词词典同目录
+MODERATION_MODEL_PATH = getattr(
+    settings, 'MODERATION_MODEL_FILE',
+    os.path.join(os.path.dirname(_words_file), 'moderation_model.joblib') if _words_file else None
+)
+# 违规概率不低于该阈值时判定为不规范
+MODERATION_MODEL_THRESHOLD = getattr(settings, 'MODERATION_MODEL_THRESHOLD', 0.9)
+# 过短的文本模型判断不可靠，直接跳过
+MODERATION_MODEL_MIN_LENGTH = getattr(settings, 'MODERATION_MODEL_MIN_LENGTH', 4)
+
+
+def prepare_text(text):
+    """
+    训练和推理共用的预处理：去掉 HTML 标签，统一小写
+    """
+    return strip_tags(text).lower()
+
+
+def build_pipeline():
+    """
+    构建待训练的模型。HashingVectorizer 无需保存词表，模型体积与训练数据量无关
+    """
+    from sklearn.feature_extraction.text import HashingVectorizer
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.pipeline import make_pipeline
+
+    return make_pipeline(
+        HashingVectorizer(analyzer='char_wb', ngram_range=(1, 3), n_features=2 ** 20, alternate_sign=False),
+        SGDClassifier(loss='log_loss', class_weight='balanced', random_state=0),
+    )
+
+
+class ModerationClassifier:
+    """
+    已训练模型的封装，predict_proba 对一批文本一次向量化、一次推理
+    """
+
+    def __init__(self, path):
+        import joblib
+
+        with open(path, 'rb') as f:
+            self.version = hashlib.sha1(f.read()).hexdigest()[:8]
+        bundle = joblib.load(path)
+        self.pipeline = bundle['pipeline']
+        self.trained_at = bundle.get('trained_at')
+
+    def predict_proba(self, texts):
+        """
+        返回每条文本的违规概率
+        """
+        if not texts:
+            return []
+        probabilities = self.pipeline.predict_proba([prepare_text(text) for text in texts])
+        return [float(row[1]) for row in probabilities]
+
+
+_classifier = None
+_classifier_loaded = False
+_classifier_lock = threading.Lock()
+
+
+def get_classifier():
+    """
+    获取本进程的分类模型，首次调用时加载；不可用时返回 None
+    """
+    global _classifier, _classifier_loaded
+    if not _classifier_loaded:
+        with _classifier_lock:
+            if not _classifier_loaded:
+                if MODERATION_MODEL_PATH and os.path.exists(MODERATION_MODEL_PATH):
+                    try:
+                        _classifier = ModerationClassifier(MODERATION_MODEL_PATH)
+                        logger.info("Loaded moderation model (version %s).", _classifier.version)
+                    except Exception as e:
+                        logger.error("Failed to load moderation model: %s", e)
+                _classifier_loaded = True
+    return _classifier
+
+
+def model_version():
+    """
+    模型版本，未启用模型时为空字符串；用于审核结果缓存键
+    """
+    classifier = get_classifier()
+    return classifier.version if classifier else ''
+
+
+def classify_many(texts):
+    """
+    批量高级审查，返回与 texts 一一对应的 (is_safe, message)
+    """
+    results = [(True, "")] * len(texts)
+    classifier = get_classifier()
+    if classifier is None:
+        return results
+    indexes = [index for index, text in enumerate(texts) if len(text) >= MODERATION_MODEL_MIN_LENGTH]
+    probabilities = classifier.predict_proba([texts[index] for index in indexes])
+    for index, probability in zip(indexes, probabilities):
+        if probability >= MODERATION_MODEL_THRESHOLD:
+            results[index] = (False, f"疑似违规内容（模型评分 {probability:.2f}）")
+    return results
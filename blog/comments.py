@@ -0,0 +1,204 @@
+"""
+评论的写入和删除。
+
+Blog.comment_count 是冗余的评论数，列表页和详情页直接读取，不再对评论表 JOIN + GROUP BY。
+评论的新增和删除都要经过这里，在同一个事务中用 F() 表达式原子地更新计数；
+后台等绕过这里的修改造成的偏差由 reconcile_comment_counts 命令修正。
+删除评论只在请求中把整棵子树标记为已删除（deleted_at），读取时过滤掉，
+物理删除由 purge_deleted_comments 命令在后台分批完成，删除请求不再级联删除整棵子树。
+
+评论树以物化路径（BlogComment.path）保存，新评论只追加一行，子树按路径前缀查询。
+详情页的评论树在内存中组装父子关系，模板通过 get_children 遍历，查询次数与评论的层数和数量无关。
+子树的结构查询用按 parent_id 分区的窗口函数在数据库中截断，每条评论最多返回 INLINE_REPLIES 条回复，
+回复数由同一分区上的 COUNT 聚合得到，热门评论下的大量回复不会整棵读入内存。
+顶级评论在数据库中按 (pub_time, id) 游标分页，详情页只取第一页，之后的页由「加载更多」接口按游标返回。
+回复同样按需加载：每条评论只内联显示最新的 INLINE_REPLIES 条回复，其余的由「查看更多回复」接口
+按父评论分页返回，热门评论下的大量回复不再随详情页一起加载和渲染；
+这个接口只按索引查询一页直接回复和它们各自最新的几条回复，不再读取整棵子树。
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, When, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import Blog, BlogComment
+from .pagination import KeysetPaginator
+
+# 每页的顶级评论数
+COMMENT_PAGE_SIZE = 10
+# 顶级评论和回复的排序键，新评论在前
+ROOT_COMMENT_KEYS = ('-pub_time', '-id')
+# 每条评论内联显示的回复数，其余的由「查看更多回复」接口按页加载
+INLINE_REPLIES = 3
+REPLY_PAGE_SIZE = 10
+REPLY_KEYS = ROOT_COMMENT_KEYS
+
+
+def change_comment_count(blog_id, delta):
+    """
+    原子地调整博客的评论数，减少时不低于 0（comment_count 为无符号整数，不能先减后比较）
+    """
+    if delta >= 0:
+        value = F('comment_count') + delta
+    else:
+        value = Case(When(comment_count__gt=-delta, then=F('comment_count') + delta), default=0)
+    Blog.objects.filter(id=blog_id).update(comment_count=value)
+
+
+def save_comment(comment):
+    """
+    保存新评论并增加所属博客的评论数
+    """
+    with transaction.atomic():
+        comment.save()
+        change_comment_count(comment.blog_id, 1)
+    return comment
+
+
+def create_comment(**fields):
+    return save_comment(BlogComment(**fields))
+
+
+def delete_comment_tree(comment):
+    """
+    删除评论及其全部回复：一条 UPDATE 把路径前缀相同、尚未删除的评论标记为已删除，评论数减去标记的条数
+    """
+    with transaction.atomic():
+        count = BlogComment.objects.filter(
+            comment.subtree_filter(), deleted_at__isnull=True
+        ).update(deleted_at=timezone.now())
+        change_comment_count(comment.blog_id, -count)
+    return count
+
+
+def build_comment_trees(nodes, blog=None):
+    """
+    把按 path 排序（即先序）的评论组装成树，返回根节点列表。
+    每个节点的 get_children() 和 parent 都使用内存中的对象，不再查询数据库
+    """
+    roots = []
+    stack = []
+    for node in nodes:
+        node._cached_children = []
+        if blog is not None:
+            node.blog = blog
+        # 弹出已经结束的祖先，栈顶即为父节点
+        while stack and not node.path.startswith(stack[-1].path):
+            stack.pop()
+        if stack:
+            node.parent = stack[-1]
+            stack[-1]._cached_children.append(node)
+        else:
+            roots.append(node)
+        stack.append(node)
+    return roots
+
+
+def reply_cursor(reply):
+    """
+    排在 reply 之后的回复的游标，与 reply_page 使用相同的排序键
+    """
+    return KeysetPaginator(BlogComment.objects.none(), REPLY_PAGE_SIZE, REPLY_KEYS).encode_cursor(reply, forward=True)
+
+
+def reply_outline(scope, inline_replies):
+    """
+    scope 范围内未删除的评论中，每条评论最新的 inline_replies 条回复的 (id, parent_id, pub_time, 回复总数)。
+    按 parent_id 分区的窗口函数在数据库中排序和截断，回复总数是同一分区上的 COUNT，不需要取出全部回复
+    """
+    partition = {'partition_by': F('parent_id')}
+    return BlogComment.objects.filter(scope, deleted_at__isnull=True).annotate(
+        rank=Window(RowNumber(), order_by=(F('pub_time').desc(), F('id').desc()), **partition),
+        siblings=Window(Count('id'), **partition),
+    ).filter(rank__lte=inline_replies).values_list('id', 'parent_id', 'pub_time', 'siblings')
+
+
+def visible_comment_ids(tops, outline):
+    """
+    outline 为 reply_outline 的结果。从 tops 开始逐层展开其中的回复，返回要显示的评论 id 和每条评论的回复数
+    """
+    replies = {}
+    reply_counts = {}
+    for comment_id, parent_id, pub_time, siblings in outline:
+        replies.setdefault(parent_id, []).append((pub_time, comment_id))
+        reply_counts[parent_id] = siblings
+    visible = [top.id for top in tops]
+    # 遍历中追加到 visible 的回复会继续展开自己的回复
+    for comment_id in visible:
+        visible.extend(child_id for _, child_id in sorted(replies.get(comment_id, ()), reverse=True))
+    return visible, {comment_id: reply_counts.get(comment_id, 0) for comment_id in visible}
+
+
+def load_comment_trees(blog, tops, parent=None, inline_replies=INLINE_REPLIES, nested=True):
+    """
+    加载 tops（一页顶级评论，或同一条评论下的一页回复）的评论树，返回与 tops 顺序相同的节点。
+    先按路径前缀查询子树的结构，每条评论只取最新的 inline_replies 条回复和回复总数，
+    再一次查询要显示的评论（连同作者、头像和被回复的用户）；其余回复由「查看更多回复」按需加载。
+    nested 为 False 时只展开 tops 的直接回复（走 (parent, pub_time, id) 索引），不读取更深的子树，
+    这些回复自己的回复只聚合数量
+    """
+    if not tops:
+        return []
+    top_ids = [top.id for top in tops]
+    if nested:
+        subtrees = Q()
+        for top in tops:
+            subtrees |= top.subtree_filter()
+        # tops 自身不是要展开的回复，排除后窗口函数只对它们下面的评论分区
+        scope = subtrees & Q(blog=blog) & ~Q(id__in=top_ids)
+    else:
+        scope = Q(parent_id__in=top_ids)
+    visible, reply_counts = visible_comment_ids(tops, reply_outline(scope, inline_replies))
+    inline = visible[len(tops):]
+    if not nested and inline:
+        reply_counts.update(BlogComment.objects.filter(
+            parent_id__in=inline, deleted_at__isnull=True
+        ).values_list('parent_id').annotate(Count('id')))
+
+    nodes = list(BlogComment.objects.filter(id__in=visible).select_related(
+        'author__profile', 'reply_to'
+    ).order_by('path'))
+    trees = {node.id: node for node in build_comment_trees(nodes, blog)}
+    for node in nodes:
+        children = node._cached_children
+        children.sort(key=lambda child: (child.pub_time, child.id), reverse=True)
+        node.reply_count = reply_counts[node.id]
+        node.hidden_reply_count = max(node.reply_count - len(children), 0)
+        node.replies_cursor = reply_cursor(children[-1]) if node.hidden_reply_count and children else ''
+    tops = [trees[top.id] for top in tops if top.id in trees]
+    if parent is not None:
+        for top in tops:
+            top.parent = parent
+    return tops
+
+
+def root_comments(blog):
+    """
+    博客未删除的顶级评论
+    """
+    return BlogComment.objects.filter(blog=blog, level=0, deleted_at__isnull=True)
+
+
+def comment_page(blog, cursor=None):
+    """
+    按游标取一页顶级评论，并加载它们的评论树
+    """
+    page = KeysetPaginator(root_comments(blog), COMMENT_PAGE_SIZE, ROOT_COMMENT_KEYS).get_page(cursor)
+    page.object_list = load_comment_trees(blog, page.object_list)
+    return page
+
+
+def replies(comment):
+    """
+    评论未删除的直接回复，走 (parent, pub_time, id) 索引
+    """
+    return BlogComment.objects.filter(parent=comment, deleted_at__isnull=True)
+
+
+def reply_page(comment, cursor=None):
+    """
+    按游标取评论的一页直接回复，每条回复只内联显示最新的几条下级回复，更深的回复只给出数量
+    """
+    page = KeysetPaginator(replies(comment), REPLY_PAGE_SIZE, REPLY_KEYS).get_page(cursor)
+    page.object_list = load_comment_trees(comment.blog, page.object_list, parent=comment, nested=False)
+    return page
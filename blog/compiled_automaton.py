@@ -0,0 +1,165 @@
+"""
+预编译的 Aho-Corasick 自动机文件。
+
+把内存中的自动机压平成若干连续的 uint32 / uint8 数组写入一个二进制文件，
+各工作进程以只读方式 mmap 映射同一个文件，页面由操作系统在进程间共享，
+启动时不再重建自动机，词典再大每个进程的常驻内存也基本不变。
+
+文件布局（小端）：
+    header: magic, 格式版本, 敏感词数, 状态数, 边数, 输出数, 词典版本, 规则指纹
+    edge_start[状态数 + 1]   每个状态的出边在 edge_char / edge_target 中的起止位置
+    edge_char[边数]          出边字符的码位，同一状态内升序，便于二分查找
+    edge_target[边数]        出边指向的状态
+    fail[状态数]             失败指针
+    out_start[状态数 + 1]    每个状态的命中在 out_length / out_tag 中的起止位置
+    out_length[输出数]       命中的模式长度
+    out_tag[输出数]          0 表示敏感词，i 表示第 i 条正则规则（从 1 开始）的触发词
+    has_output[状态数]       uint8，该状态是否有命中，扫描时快速判断
+"""
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from .normalization import NORMALIZATION_VERSION
+
+MAGIC = b'QXAC'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sIIIII16s16s')
+
+
+def rules_fingerprint(rules):
+    """
+    正则规则触发词与归一化转换表的指纹，二者变化后预编译文件需要重新生成
+    """
+    data = repr([(index, rule.triggers) for index, rule in enumerate(rules)] + [NORMALIZATION_VERSION]).encode('utf-8')
+    return hashlib.sha1(data).hexdigest()[:16]
+
+
+def compile_automaton(automaton, path, words_version, rules, word_count):
+    """
+    把内存中的 AhoCorasick 自动机写入预编译文件。
+    先写临时文件再 os.replace 原子替换，正在映射旧文件的进程不受影响。
+    """
+    tags = {id(rule): index + 1 for index, rule in enumerate(rules)}
+    state_count = len(automaton.goto)
+
+    edge_start, edge_char, edge_target = array('I', [0]), array('I'), array('I')
+    out_start, out_length, out_tag = array('I', [0]), array('I'), array('I')
+    has_output = array('B')
+    for state in range(state_count):
+        for char, target in sorted(automaton.goto[state].items(), key=lambda item: ord(item[0])):
+            edge_char.append(ord(char))
+            edge_target.append(target)
+        edge_start.append(len(edge_char))
+        for length, rule in automaton.output[state]:
+            out_length.append(length)
+            out_tag.append(0 if rule is None else tags[id(rule)])
+        out_start.append(len(out_length))
+        has_output.append(1 if automaton.output[state] else 0)
+
+    tables = [edge_start, edge_char, edge_target, array('I', automaton.fail), out_start, out_length, out_tag]
+    if sys.byteorder != 'little':
+        for table in tables:
+            table.byteswap()
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(
+            MAGIC, FORMAT_VERSION, word_count, state_count, len(edge_char), len(out_length),
+            words_version.encode('ascii'), rules_fingerprint(rules).encode('ascii'),
+        ))
+        for table in tables:
+            table.tofile(f)
+        has_output.tofile(f)
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+class MappedAutomaton:
+    """
+    只读映射预编译文件的自动机，提供与 AhoCorasick 相同的 step / has_output / outputs 接口。
+    根状态的出边最多、访问最频繁，单独缓存成字典；其余状态在映射的数组上二分查找。
+    """
+
+    def __init__(self, path, rules):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        (magic, version, word_count, state_count, edge_count, output_count,
+         words_version, fingerprint) = HEADER.unpack_from(view)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError('预编译文件格式不匹配')
+        self.word_count = word_count
+        self.words_version = words_version.rstrip(b'\0').decode('ascii')
+        self.rules_fingerprint = fingerprint.rstrip(b'\0').decode('ascii')
+        self.tags = [None] + list(rules)
+
+        offset = HEADER.size
+
+        def take(count, fmt='I'):
+            nonlocal offset
+            size = count * (4 if fmt == 'I' else 1)
+            table = view[offset:offset + size].cast(fmt)
+            offset += size
+            return table
+
+        self.edge_start = take(state_count + 1)
+        self.edge_char = take(edge_count)
+        self.edge_target = take(edge_count)
+        self.fail = take(state_count)
+        self.out_start = take(state_count + 1)
+        self.out_length = take(output_count)
+        self.out_tag = take(output_count)
+        self.has_output = take(state_count, 'B')
+        self.state_count = state_count
+        self.root = {
+            chr(self.edge_char[i]): self.edge_target[i] for i in range(self.edge_start[0], self.edge_start[1])
+        }
+        self.max_length = max(self.out_length, default=0)  # 最长模式的长度
+
+    def __len__(self):
+        return self.state_count
+
+    def step(self, state, char):
+        """
+        状态转移：沿失败链查找 char 的出边
+        """
+        edge_start, edge_char, fail = self.edge_start, self.edge_char, self.fail
+        code = ord(char)
+        while state:
+            low, high = edge_start[state], edge_start[state + 1]
+            while low < high:
+                middle = (low + high) // 2
+                value = edge_char[middle]
+                if value < code:
+                    low = middle + 1
+                elif value > code:
+                    high = middle
+                else:
+                    return self.edge_target[middle]
+            state = fail[state]
+        return self.root.get(char, 0)
+
+    def outputs(self, state):
+        tags = self.tags
+        return tuple(
+            (self.out_length[i], tags[self.out_tag[i]]) for i in range(self.out_start[state], self.out_start[state + 1])
+        )
+
+
+def load_compiled_automaton(path, words_version, rules):
+    """
+    映射与当前词典版本、规则一致的预编译文件；文件不存在或已过期时返回 None
+    """
+    if not path or not os.path.exists(path) or sys.byteorder != 'little':
+        return None
+    try:
+        automaton = MappedAutomaton(path, rules)
+    except (OSError, ValueError, struct.error):
+        return None
+    if automaton.words_version != words_version or automaton.rules_fingerprint != rules_fingerprint(rules):
+        return None
+    return automaton
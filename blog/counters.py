@@ -0,0 +1,157 @@
+"""
+列表页的博客总数缓存。
+
+页码分页每次请求都要对 blog_blog 执行 COUNT(*)，InnoDB 上需要扫描整个索引。
+这里把首页（全部）、分类、作者三种列表的总数缓存在 CACHES 中：
+    - 缓存未命中时，全表总数优先使用数据库的估算行数（MySQL 的 TABLE_ROWS、PostgreSQL 的 reltuples），
+      带过滤条件的列表执行一次 COUNT(*)；
+    - 博客新增、删除、修改分类时由 Blog 的 post_save / post_delete 信号增量更新对应的计数，不使缓存失效，
+      后台、级联删除和 QuerySet.delete() 同样会触发；绕过信号的 QuerySet.update() 修改分类不会更新计数。
+计数允许有少量偏差（估算值、并发更新），最多影响最后一页的页码，缓存过期后按数据库重新统计。
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils.functional import cached_property
+
+logger = logging.getLogger(__name__)
+
+# 计数缓存的过期时间（秒），过期后重新统计以修正偏差
+BLOG_COUNT_CACHE_TIMEOUT = getattr(settings, 'BLOG_COUNT_CACHE_TIMEOUT', 3600)
+
+ALL_SCOPE = 'all'
+
+
+def category_scope(category_id):
+    return f'category:{category_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def blog_scopes(blog, category_id=None):
+    return [ALL_SCOPE, category_scope(category_id or blog.category_id), author_scope(blog.author_id)]
+
+
+def make_key(scope):
+    return f'blog:count:{scope}'
+
+
+def estimated_row_count(model):
+    """
+    数据库统计信息中的估算行数，不支持的数据库返回 None
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                [table],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    # PostgreSQL 未 ANALYZE 的表 reltuples 为 -1
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def cached_count(scope, queryset):
+    """
+    列表的总数：优先读缓存，未命中时统计后写入缓存
+    """
+    key = make_key(scope)
+    try:
+        count = cache.get(key)
+    except Exception as e:
+        logger.warning("Blog count cache get failed: %s", e)
+        count = None
+    if count is not None:
+        return count
+
+    count = estimated_row_count(queryset.model) if scope == ALL_SCOPE else None
+    if count is None:
+        count = queryset.count()
+    try:
+        # 并发时只保留先写入的值，避免覆盖期间已经增量更新过的计数
+        cache.add(key, count, BLOG_COUNT_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.warning("Blog count cache set failed: %s", e)
+    return count
+
+
+def change_count(scopes, delta):
+    """
+    增量更新计数；缓存中没有的计数不处理，下次读取时重新统计
+    """
+    for scope in scopes:
+        try:
+            cache.incr(make_key(scope), delta)
+        except ValueError:
+            pass
+        except Exception as e:
+            logger.warning("Blog count cache incr failed: %s", e)
+
+
+def blog_created(blog):
+    change_count(blog_scopes(blog), 1)
+
+
+def blog_deleted(blog):
+    change_count(blog_scopes(blog), -1)
+
+
+def blog_moved(blog, old_category_id):
+    """
+    博客修改了分类
+    """
+    if old_category_id and old_category_id != blog.category_id:
+        change_count([category_scope(old_category_id)], -1)
+        change_count([category_scope(blog.category_id)], 1)
+
+
+@receiver(post_init, sender='blog.Blog')
+def remember_category(sender, instance, **kwargs):
+    """
+    记下加载时的分类，保存时据此判断是否修改了分类。分类被延迟加载（only / defer）时不读取，避免额外查询
+    """
+    instance._counted_category_id = instance.__dict__.get('category_id')
+
+
+@receiver(post_save, sender='blog.Blog')
+def count_saved_blog(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if created:
+        blog_created(instance)
+    elif update_fields is None or 'category' in update_fields:
+        blog_moved(instance, instance._counted_category_id)
+    instance._counted_category_id = instance.category_id
+
+
+@receiver(post_delete, sender='blog.Blog')
+def count_deleted_blog(sender, instance, **kwargs):
+    blog_deleted(instance)
+
+
+class CachedCountPaginator(Paginator):
+    """
+    总数读取计数缓存的 Paginator，模板中的 paginator.num_pages 等用法不变
+    """
+
+    def __init__(self, object_list, per_page, scope, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.scope = scope
+
+    @cached_property
+    def count(self):
+        return cached_count(self.scope, self.object_list)
@@ -0,0 +1,178 @@
+"""
+审核前的 HTML 正文提取。
+
+wangEditor 保存的正文是 HTML，直接审核会扫描所有标签、属性和内联样式，
+站内上传图片的 <img src="http..."> 还会触发外部链接规则。
+这里用一遍正则分词把 HTML 转成审核用的纯文本：
+    - 文本节点原样保留（实体解码），块级标签和 <br> 转为换行，行内标签不产生字符，
+      因此被 <b>、<span> 拆开的敏感词也能被发现；
+    - script / style 的内容、注释和其余属性不参与审核；
+    - href / src 只保留站外地址（站内媒体文件 MEDIA_URL 下的地址视为白名单），alt / title 作为文本审核。
+提取结果记录每一段文本在原始 HTML 中的位置，命中位置可以映射回原文用于高亮。
+"""
+import bisect
+import html
+import re
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.http.request import validate_host
+
+# 站内地址的域名（相对地址总是视为站内），默认取 ALLOWED_HOSTS
+MODERATION_INTERNAL_HOSTS = getattr(
+    settings, 'MODERATION_INTERNAL_HOSTS',
+    [host for host in settings.ALLOWED_HOSTS if host != '*'] + ['localhost', '127.0.0.1'],
+)
+
+_TOKEN = re.compile(
+    r'<!--.*?(?:-->|\Z)'  # 注释
+    r'|<(/?)([a-zA-Z][a-zA-Z0-9]*)((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>'  # 标签
+    r'|&(?:#[0-9]+|#[xX][0-9a-fA-F]+|[a-zA-Z][a-zA-Z0-9]*);?',  # 字符实体
+    re.S,
+)
+_TAG = re.compile(r'<[^>]*>')
+_ATTRIBUTE = re.compile(r'([^\s"\'<>/=]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))')
+# 内容不可见、不参与审核的标签
+SKIPPED_TAGS = {'script', 'style', 'template'}
+_SKIPPED_END = {name: re.compile(f'</{name}', re.I) for name in SKIPPED_TAGS}
+# 在前后产生换行的块级标签
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'figcaption', 'figure',
+    'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'ol', 'p', 'pre', 'section',
+    'table', 'td', 'th', 'tr', 'ul',
+}
+URL_ATTRIBUTES = {'href', 'src'}
+TEXT_ATTRIBUTES = {'alt', 'title'}
+
+
+def is_internal_media(url):
+    """
+    是否为站内媒体文件地址：路径在 MEDIA_URL 下，且为相对地址或站内域名
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return False
+    if not parts.path.startswith(settings.MEDIA_URL):
+        return False
+    if not parts.netloc:
+        return not parts.scheme
+    return parts.scheme in ('http', 'https') and validate_host(parts.hostname or '', MODERATION_INTERNAL_HOSTS)
+
+
+def iter_html_text(source):
+    """
+    流式提取审核文本，依次产生 (文本, 原文起点, 原文终点)。
+    文本与原文长度相同时逐字符对应，否则（实体、标签产生的换行）整段对应
+    """
+    position = 0
+    length = len(source)
+    while position < length:
+        match = _TOKEN.search(source, position)
+        if match is None:
+            yield source[position:], position, length
+            return
+        if match.start() > position:
+            yield source[position:match.start()], position, match.start()
+        position = match.end()
+
+        token = match.group()
+        if token.startswith('&'):
+            yield html.unescape(token), match.start(), match.end()
+            continue
+        name = match.group(2)
+        if name is None:  # 注释
+            continue
+        name = name.lower()
+        if match.group(1):  # 结束标签
+            if name in BLOCK_TAGS:
+                yield '\n', match.start(), match.end()
+            continue
+
+        if name in SKIPPED_TAGS:
+            end = _SKIPPED_END[name].search(source, position)
+            position = end.start() if end else length
+            continue
+        if name in BLOCK_TAGS:
+            yield '\n', match.start(), match.end()
+        offset = match.start(3)
+        for attribute in _ATTRIBUTE.finditer(match.group(3)):
+            key = attribute.group(1).lower()
+            group = next(index for index in (2, 3, 4) if attribute.group(index) is not None)
+            value = attribute.group(group)
+            if not value or (key in URL_ATTRIBUTES and is_internal_media(html.unescape(value))):
+                continue
+            if key in URL_ATTRIBUTES or key in TEXT_ATTRIBUTES:
+                start = offset + attribute.start(group)
+                # 属性值单独成行，不与前后的文本拼成敏感词
+                yield '\n', start, start
+                yield value, start, start + len(value)
+                yield '\n', start + len(value), start + len(value)
+
+
+class HtmlText:
+    """
+    提取后的审核文本，source_span 把文本中的区间映射回原始 HTML
+    """
+
+    def __init__(self, source):
+        pieces = []
+        self.starts = []  # 每一段在提取文本中的起点
+        self.spans = []  # 每一段在原文中的 (起点, 终点)
+        position = 0
+        for text, start, end in iter_html_text(source):
+            if not text:
+                continue
+            pieces.append(text)
+            self.starts.append(position)
+            self.spans.append((start, end))
+            position += len(text)
+        self.text = ''.join(pieces)
+
+    def _source_position(self, position, is_end):
+        index = bisect.bisect_right(self.starts, position - 1 if is_end else position) - 1
+        if index < 0:
+            return 0
+        start, end = self.spans[index]
+        offset = position - self.starts[index]
+        piece_length = (self.starts[index + 1] if index + 1 < len(self.starts) else len(self.text)) - self.starts[index]
+        if piece_length == end - start:
+            return start + offset
+        return end if is_end else start
+
+    def source_span(self, start, end):
+        """
+        提取文本中的 [start, end) 对应原始 HTML 中的区间
+        """
+        return self._source_position(start, False), self._source_position(end, True)
+
+
+def html_to_text(source):
+    """
+    返回 HTML 正文的审核文本
+    """
+    return ''.join(text for text, _, _ in iter_html_text(source))
+
+
+def mark_html(source, spans, start_tag='<mark>', end_tag='</mark>'):
+    """
+    在原始 HTML 中标出 spans（HtmlText.source_span 映射得到的区间）。
+    区间跨越标签时只包裹其中的文本部分，位于标签内部（属性值）的区间不做标记，保证输出的标签结构不变
+    """
+    pieces = []
+    position = 0
+    for start, end in spans:
+        if start < position or source.rfind('<', 0, start) > source.rfind('>', 0, start):
+            continue
+        pieces.append(source[position:start])
+        text_start = start
+        for tag in _TAG.finditer(source, start, end):
+            if tag.start() > text_start:
+                pieces.append(f'{start_tag}{source[text_start:tag.start()]}{end_tag}')
+            pieces.append(tag.group())
+            text_start = tag.end()
+        if end > text_start:
+            pieces.append(f'{start_tag}{source[text_start:end]}{end_tag}')
+        position = max(end, text_start)
+    pieces.append(source[position:])
+    return ''.join(pieces)
@@ -0,0 +1,112 @@
+import random
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+
+from blog.comments import create_comment
+from blog.models import COMMENT_PATH_STEP, Blog, BlogCategory, BlogComment, User, comment_path_step
+
+TARGETS = ('roots', 'replies', 'random')
+
+
+class Command(BaseCommand):
+    help = ('并发写入评论的吞吐量：多个线程同时向同一篇临时博客发表评论，结束后检查评论路径并删除临时数据。'
+            'roots 全部是顶级评论，replies 全部回复同一条评论（热门评论串），random 随机回复已有的评论。'
+            '会写入当前配置的数据库，必须加 --write 才会运行，请只在测试库上使用')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='并发写入的线程数')
+        parser.add_argument('--per-writer', type=int, default=50, help='每个线程发表的评论数')
+        parser.add_argument('--target', choices=TARGETS, default='replies', help='评论的位置')
+        parser.add_argument('--write', action='store_true', help='确认向当前配置的数据库写入临时博客和评论')
+        parser.add_argument('--keep', action='store_true', help='保留临时博客和评论')
+
+    def handle(self, *args, **options):
+        # 各写入线程使用各自的数据库连接，无法放进同一个事务回滚，只能由调用者明确确认
+        if not options['write']:
+            raise CommandError(f'该命令会向数据库 {connection.settings_dict["NAME"]} 写入数据，'
+                               '确认是测试库后加 --write 运行')
+        author = User.objects.order_by('id').first()
+        category = BlogCategory.objects.order_by('id').first()
+        if author is None or category is None:
+            raise CommandError('需要至少一个用户和一个博客分类')
+
+        blog = Blog.objects.create(title='bench_comment_inserts', content='<p>评论写入测试</p>',
+                                   category=category, author=author)
+        root = create_comment(blog=blog, author=author, content='root')
+        try:
+            latencies, errors, elapsed = self.run_writers(blog, root, author, options)
+            self.report(blog, latencies, errors, elapsed, options)
+        finally:
+            if not options['keep']:
+                blog.delete()
+
+    def run_writers(self, blog, root, author, options):
+        latencies = []
+        errors = []
+        # random 模式下可回复的评论，各线程共享
+        parents = [root]
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(options['writers'])
+
+        def writer(index):
+            rng = random.Random(index)
+            try:
+                start_barrier.wait()
+                for number in range(options['per_writer']):
+                    if options['target'] == 'roots':
+                        parent = None
+                    elif options['target'] == 'replies':
+                        parent = root
+                    else:
+                        with lock:
+                            parent = rng.choice(parents)
+                    begin = time.perf_counter()
+                    try:
+                        comment = create_comment(blog=blog, author=author, parent=parent,
+                                                 content=f'writer {index} comment {number}')
+                    except DatabaseError as e:
+                        with lock:
+                            errors.append(str(e))
+                        continue
+                    duration = time.perf_counter() - begin
+                    with lock:
+                        latencies.append(duration)
+                        parents.append(comment)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer, args=(index,)) for index in range(options['writers'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, errors, time.perf_counter() - start
+
+    def report(self, blog, latencies, errors, elapsed, options):
+        self.stdout.write(f'数据库: {connection.vendor}，{options["writers"]} 个线程 x {options["per_writer"]} 条，'
+                          f'位置: {options["target"]}')
+        self.stdout.write(f'成功 {len(latencies)} 条，失败 {len(errors)} 条，耗时 {elapsed:.2f} s，'
+                          f'吞吐量 {len(latencies) / elapsed:.1f} 条/秒')
+        if latencies:
+            ordered = sorted(latencies)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            self.stdout.write(f'单条耗时: 中位数 {statistics.median(ordered) * 1000:.1f} ms，'
+                              f'p95 {p95 * 1000:.1f} ms，最大 {ordered[-1] * 1000:.1f} ms')
+        if errors:
+            self.stdout.write(self.style.WARNING(f'失败示例: {errors[0]}'))
+
+        # 每条评论的路径都是父评论的路径加上自身 id，层级与路径长度一致
+        comments = {comment.id: comment for comment in BlogComment.objects.filter(blog=blog)}
+        broken = 0
+        for comment in comments.values():
+            parent_path = comments[comment.parent_id].path if comment.parent_id else ''
+            if (comment.path != parent_path + comment_path_step(comment.id)
+                    or comment.level != len(comment.path) // COMMENT_PATH_STEP - 1):
+                broken += 1
+        blog.refresh_from_db(fields=['comment_count'])
+        self.stdout.write(f'评论数: 实际 {len(comments)}，comment_count {blog.comment_count}，路径错误 {broken}')
@@ -0,0 +1,87 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.moderation import (
+    SENSITIVE_WORDS_FILE_PATH, build_trie, get_engine, primary_moderation, read_sensitive_words, trie_search,
+)
+
+from .bench_moderation_suite import FILLER, scrub
+
+# 测试文本大小：1 KB、100 KB、1 MB
+SIZES = [('1KB', 1024), ('100KB', 100 * 1024), ('1MB', 1024 * 1024)]
+
+
+def make_post(size, alphabet, seed=0):
+    """
+    生成不含敏感词的模拟文章（wangEditor 风格的 HTML 段落），保证整篇都会被扫描。
+    """
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        paragraph = '<p>' + ''.join(rng.choice(alphabet) for _ in range(rng.randint(20, 120))) + '</p>'
+        parts.append(paragraph)
+        length += len(paragraph)
+    return ''.join(parts)[:size]
+
+
+def scrub_trie(root, text):
+    """
+    去掉字典树逐位置匹配能找到的敏感词（如跨单词拼出的词），保证两种实现都扫描全文
+    """
+    while True:
+        hit = trie_search(root, text.lower())
+        if not hit:
+            return text
+        text = text[:hit[0]] + ''.join(FILLER[index % len(FILLER)] for index in range(*hit)) + text[hit[1]:]
+
+
+def best_of(func, text, repeat):
+    """
+    多次运行取最短耗时（秒）
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class Command(BaseCommand):
+    help = '对比字典树逐位置匹配（旧实现）与线上初级审查 primary_moderation 的耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3, help='每组测试重复次数，取最优值')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        words = sorted(read_sensitive_words(SENSITIVE_WORDS_FILE_PATH)[0])
+
+        start = time.perf_counter()
+        trie_root = build_trie(words)
+        trie_build = time.perf_counter() - start
+        self.stdout.write(f'词典: {len(words)} 个敏感词，自动机 {len(get_engine().automaton)} 个状态')
+        self.stdout.write(f'TrieNode 构建耗时: {trie_build * 1000:.1f} ms')
+
+        # 使用词典中出现过的字符生成文本，让字典树匹配能走得更深，更接近真实场景
+        alphabet = sorted({char for word in words for char in word if not char.isspace()}) or list('abcdefg')
+        alphabet += list('，。的了是在有和 ')
+
+        self.stdout.write(f'{"大小":<8}{"TrieNode":>14}{"primary_moderation":>22}{"加速比":>10}')
+        for label, size in SIZES:
+            # 去掉文本中偶然拼出的敏感词，保证两种实现都扫描全文
+            text = make_post(size, alphabet)
+            while True:
+                scrubbed = scrub_trie(trie_root, scrub(text))
+                if scrubbed == text:
+                    break
+                text = scrubbed
+            trie_time = best_of(lambda t: trie_search(trie_root, t.lower()), text, repeat)
+            moderation_time = best_of(primary_moderation, text, repeat)
+            self.stdout.write(
+                f'{label:<8}{trie_time * 1000:>12.1f}ms{moderation_time * 1000:>20.1f}ms'
+                f'{trie_time / moderation_time:>9.2f}x'
+            )
@@ -0,0 +1,213 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.classifier import get_classifier
+from blog.html_text import html_to_text
+from blog.moderation import (
+    MODERATION_STATS, REPEAT_CHAR_LIMIT, SENSITIVE_WORDS_FILE_PATH, AhoCorasick, get_engine, read_sensitive_words,
+    scan_fields,
+)
+
+CORPORA = ['comments', 'html', 'adversarial', 'megabyte']
+FILLER = list('，。的了是在有和我你他这那就也都要会对说好')
+MEGABYTE = 1024 * 1024
+
+
+def scrub(text):
+    """
+    去掉文本中偶然拼出的敏感词和链接，保证审核会扫描全文
+    """
+    engine = get_engine()
+    while True:
+        hits = engine.scan(text, first_only=False)
+        if not hits:
+            return text
+        chars = list(text)
+        for hit in hits:
+            # 轮换填充字符，避免替换后又触发重复字符规则
+            for index in range(hit.start, hit.end):
+                chars[index] = FILLER[index % len(FILLER)]
+        text = ''.join(chars)
+
+
+def comment_corpus(alphabet, count=2000, seed=1):
+    """
+    短评论：5 ~ 200 个字符的纯文本
+    """
+    rng = random.Random(seed)
+    return [scrub(''.join(rng.choice(alphabet) for _ in range(rng.randint(5, 200)))) for _ in range(count)]
+
+
+def html_corpus(alphabet, count=40, seed=2):
+    """
+    长篇 HTML 文章：wangEditor 风格的段落、行内样式、站内图片和代码块，每篇 10 ~ 60 KB
+    """
+    rng = random.Random(seed)
+    posts = []
+    for index in range(count):
+        size = rng.randint(10, 60) * 1024
+        parts = []
+        length = 0
+        while length < size:
+            text = scrub(''.join(rng.choice(alphabet) for _ in range(rng.randint(40, 200))))
+            kind = rng.random()
+            if kind < 0.15:
+                part = (f'<p><img src="/media/articles/20250101/{index}_{length}.png" alt="" '
+                        f'data-href="/media/articles/20250101/{index}_{length}.png" style="width: 100%;"/></p>')
+            elif kind < 0.25:
+                part = f'<pre><code class="language-python">{text}</code></pre>'
+            else:
+                part = (f'<p style="text-align: left; line-height: 1.5;">'
+                        f'<span style="color: rgb(51, 51, 51); font-size: 16px;">{text}</span></p>')
+            parts.append(part)
+            length += len(part)
+        posts.append(''.join(parts))
+    return posts
+
+
+def adversarial_corpus(words, seed=3):
+    """
+    对抗性输入：反复出现敏感词前缀（自动机沿失败链回退最多）、大量链接触发词、
+    插满分隔符和零宽字符的文本，每条约 20 KB
+    """
+    rng = random.Random(seed)
+    size = 20 * 1024
+    longest = sorted(words, key=len, reverse=True)[:20]
+    corpus = [scrub((word[:-1] * (size // len(word) + 1))[:size]) for word in longest]
+    corpus.append(('http:/' * (size // 6 + 1))[:size])
+    corpus.append(('https://x' * (size // 9 + 1))[:size])
+    alphabet = sorted({char for word in words for char in word if not char.isspace()})
+    corpus.append(scrub('.'.join(rng.choice(alphabet) for _ in range(size // 2))))
+    corpus.append(scrub('\u200b'.join(rng.choice(alphabet) for _ in range(size // 2))))
+    return corpus
+
+
+def megabyte_corpus(alphabet, seed=4):
+    """
+    1 MB 的长文本：中文（词典字符与常用字、标点）和英文（单词、空格与标点）各一篇
+    """
+    rng = random.Random(seed)
+    chinese = ''.join(rng.choice(alphabet) for _ in range(MEGABYTE))
+    latin = []
+    length = 0
+    while length < MEGABYTE:
+        word = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(1, 10)))
+        latin.append(word + rng.choice('     ,.\n'))
+        length += len(word) + 1
+    return {'zh': scrub(chinese), 'en': scrub(''.join(latin)[:MEGABYTE])}
+
+
+def plain_scan(automaton, text):
+    """
+    对照组：不做归一化的扫描循环，只转小写后逐字符走自动机并统计重复字符（加入分隔符处理之前的实现）
+    """
+    step, has_output = automaton.step, automaton.has_output
+    state = 0
+    previous = None
+    run = 0
+    found = 0
+    for char in text.lower():
+        if char == previous:
+            run += 1
+            if run == REPEAT_CHAR_LIMIT and char != '\n':
+                found += 1
+        else:
+            previous = char
+            run = 1
+        state = step(state, char)
+        if has_output[state]:
+            found += 1
+    return found
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Command(BaseCommand):
+    help = '用固定的合成语料（短评论、长篇 HTML、对抗性输入、1 MB 长文本）测试审核引擎的吞吐量和延迟'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', choices=CORPORA, action='append', help='只运行指定语料，可重复指定')
+        parser.add_argument('--repeat', type=int, default=3, help='每个语料重复运行的次数')
+        parser.add_argument(
+            '--max-slowdown', type=float, default=1.1,
+            help='megabyte 语料中审核扫描相对对照组允许的最大耗时倍数，超过时命令失败',
+        )
+
+    def handle(self, *args, **options):
+        words = sorted(read_sensitive_words(SENSITIVE_WORDS_FILE_PATH)[0]) if SENSITIVE_WORDS_FILE_PATH else []
+        engine = get_engine()
+        self.stdout.write(
+            f'词典 {len(words)} 个敏感词，自动机 {len(engine.automaton)} 个状态，'
+            f'高级审查模型：{"已启用" if get_classifier() else "未启用"}'
+        )
+        # 使用词典中出现过的字符生成文本，让自动机走得更深，更接近真实场景
+        alphabet = sorted({char for word in words for char in word if not char.isspace()}) or list('abcdefg')
+        alphabet += FILLER + [' ']
+
+        builders = {
+            'comments': lambda: comment_corpus(alphabet),
+            'html': lambda: html_corpus(alphabet),
+            'adversarial': lambda: adversarial_corpus(words or ['abcdef']),
+        }
+        corpora = options['corpus'] or CORPORA
+        timed = [name for name in corpora if name != 'megabyte']
+        if timed:
+            self.time_corpora(timed, builders, options['repeat'])
+        if 'megabyte' in corpora:
+            self.guard_megabyte(engine, words, alphabet, options['repeat'], options['max_slowdown'])
+
+    def time_corpora(self, names, builders, repeat):
+        MODERATION_STATS.reset()
+        self.stdout.write(
+            f'{"语料":<12}{"条数":>6}{"字符数":>12}{"字符/秒":>14}{"p50":>10}{"p99":>10}{"最大":>10}'
+        )
+        for name in names:
+            corpus = builders[name]()
+            latencies = []
+            for _ in range(repeat):
+                for text in corpus:
+                    start = time.perf_counter()
+                    if name == 'html':
+                        scan_fields([html_to_text(text)])
+                    else:
+                        scan_fields([text])
+                    latencies.append(time.perf_counter() - start)
+            chars = sum(len(text) for text in corpus) * repeat
+            self.stdout.write(
+                f'{name:<12}{len(corpus):>8}{chars:>14}{chars / sum(latencies):>16,.0f}'
+                f'{percentile(latencies, 0.5) * 1000:>10.2f}ms{percentile(latencies, 0.99) * 1000:>8.2f}ms'
+                f'{max(latencies) * 1000:>8.2f}ms'
+            )
+        stats = MODERATION_STATS.snapshot()
+        self.stdout.write(f'规则命中：{stats["rule_hits"] or "无"}')
+
+    def guard_megabyte(self, engine, words, alphabet, repeat, max_slowdown):
+        """
+        1 MB 文本的吞吐量：审核扫描与不做归一化的对照组交替运行各取最优值，
+        耗时超过对照组的 max_slowdown 倍时失败，防止归一化拖慢长文本审核
+        """
+        baseline = AhoCorasick(words)
+        self.stdout.write(f'{"1MB 语料":<12}{"审核扫描":>14}{"对照组":>14}{"耗时比":>10}')
+        slow = []
+        for label, text in megabyte_corpus(alphabet).items():
+            scan_time = plain_time = float('inf')
+            for _ in range(max(repeat, 5)):
+                start = time.process_time()
+                engine.scan(text)
+                scan_time = min(scan_time, time.process_time() - start)
+                start = time.process_time()
+                plain_scan(baseline, text)
+                plain_time = min(plain_time, time.process_time() - start)
+            ratio = scan_time / plain_time
+            self.stdout.write(
+                f'{label:<12}{len(text) / scan_time:>14,.0f}/s{len(text) / plain_time:>12,.0f}/s{ratio:>9.2f}x'
+            )
+            if ratio > max_slowdown:
+                slow.append(f'{label} {ratio:.2f}x')
+        if slow:
+            raise CommandError(f'1MB 审核扫描慢于对照组的 {max_slowdown} 倍：{", ".join(slow)}')
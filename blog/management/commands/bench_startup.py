@@ -0,0 +1,43 @@
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# 在子进程中计时导入，避免当前进程已加载的模块影响结果
+TIMER = (
+    'import time; start = time.perf_counter(); import {module}; '
+    'print(time.perf_counter() - start)'
+)
+MODULES = ['sjt_blog.wsgi', 'sjt_blog.asgi']
+
+
+class Command(BaseCommand):
+    help = '测量 sjt_blog.wsgi / sjt_blog.asgi 的导入耗时，用于发现启动时间的回退'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='每个入口重复导入的次数')
+
+    def measure(self, module, eager, repeat):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE))
+        env['MODERATION_EAGER_LOAD'] = '1' if eager else '0'
+        timings = []
+        for _ in range(repeat):
+            result = subprocess.run(
+                [sys.executable, '-c', TIMER.format(module=module)],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+            )
+            timings.append(float(result.stdout.strip().splitlines()[-1]))
+        return min(timings), statistics.median(timings)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        self.stdout.write(f'{"入口":<16}{"审核引擎":<10}{"最短":>10}{"中位数":>10}')
+        for module in MODULES:
+            for eager in (False, True):
+                best, median = self.measure(module, eager, repeat)
+                self.stdout.write(
+                    f'{module:<16}{"预加载" if eager else "按需":<10}{best * 1000:>8.1f}ms{median * 1000:>8.1f}ms'
+                )
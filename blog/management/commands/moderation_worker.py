@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.moderation import get_engine
+from blog.moderation_tasks import process_pending
+
+
+class Command(BaseCommand):
+    help = '后台处理异步审核队列（MODERATION_ASYNC 开启时需要运行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20, help='每次领取的任务数')
+        parser.add_argument('--sleep', type=float, default=1.0, help='队列为空时的轮询间隔（秒）')
+        parser.add_argument('--once', action='store_true', help='处理完当前队列后退出')
+
+    def handle(self, *args, **options):
+        # 先加载审核词典，避免第一个任务承担初始化耗时
+        get_engine()
+        total = 0
+        try:
+            while True:
+                count = process_pending(options['batch_size'])
+                total += count
+                if count:
+                    self.stdout.write(f'已处理 {count} 个审核任务')
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'共处理 {total} 个审核任务'))
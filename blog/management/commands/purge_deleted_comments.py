@@ -0,0 +1,57 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from blog.comments import delete_comment_tree
+from blog.models import BlogComment
+
+
+class Command(BaseCommand):
+    help = ('物理删除已标记删除的评论：按路径倒序（先删回复再删父评论）分批删除，每批一个短事务，'
+            '不会长时间锁住热门评论串，可由定时任务在后台运行')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='每批删除的评论数')
+        parser.add_argument('--older-than', type=int, default=0, help='只删除标记超过指定分钟数的评论')
+        parser.add_argument('--pause', type=float, default=0, help='每批之间暂停的秒数，降低对线上写入的影响')
+        parser.add_argument('--dry-run', action='store_true', help='只统计待删除的评论数，不删除')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['older_than'])
+        tombstones = BlogComment.objects.filter(deleted_at__lte=cutoff).order_by('-path')
+        if options['dry_run']:
+            self.stdout.write(f'待删除 {tombstones.count()} 条评论')
+            return
+
+        purged = skipped = 0
+        last_path = None
+        while True:
+            # 按路径倒序游标分页，每条评论都排在它的父评论之前
+            batch = tombstones.filter(path__lt=last_path) if last_path is not None else tombstones
+            rows = list(batch.values_list('id', 'path')[:options['chunk_size']])
+            if not rows:
+                break
+            last_path = rows[-1][1]
+            ids = [comment_id for comment_id, _ in rows]
+            with transaction.atomic():
+                # 标记删除之后才发表到这些评论下的回复：同样标记删除（评论数随之减少）
+                for orphan in BlogComment.objects.filter(parent_id__in=ids, deleted_at__isnull=True):
+                    delete_comment_tree(orphan)
+                # 仍有回复不在本批中的评论留到下次清理，避免级联删除这些回复
+                blocked = list(
+                    BlogComment.objects.filter(parent_id__in=ids).exclude(id__in=ids).values_list('path', flat=True)
+                )
+                deletable = [
+                    comment_id for comment_id, path in rows if not any(child.startswith(path) for child in blocked)
+                ]
+                BlogComment.objects.filter(id__in=deletable).delete()
+            purged += len(deletable)
+            skipped += len(rows) - len(deletable)
+            self.stdout.write(f'已删除 {purged} 条评论')
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(f'清理完成，删除 {purged} 条，{skipped} 条留到下次清理'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from blog.models import Blog, BlogComment
+
+
+class Command(BaseCommand):
+    help = '按评论表重新统计每篇博客的评论数，修正 Blog.comment_count 的偏差'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='每批核对的博客数')
+        parser.add_argument('--dry-run', action='store_true', help='只报告偏差，不写入')
+
+    def handle(self, *args, **options):
+        counts = BlogComment.objects.filter(
+            blog=OuterRef('pk'), deleted_at__isnull=True
+        ).order_by().values('blog').annotate(count=Count('id')).values('count')
+        blogs = Blog.objects.order_by('id').annotate(actual=Coalesce(Subquery(counts), 0))
+
+        checked = fixed = 0
+        last_id = 0
+        while True:
+            # 按主键分页，每批一条带子查询的 LIMIT 查询
+            chunk = list(blogs.filter(id__gt=last_id).values_list('id', 'comment_count', 'actual')[:options['chunk_size']])
+            if not chunk:
+                break
+            last_id = chunk[-1][0]
+            checked += len(chunk)
+            for blog_id, stored, actual in chunk:
+                if stored == actual:
+                    continue
+                fixed += 1
+                self.stdout.write(f'博客 {blog_id}：记录 {stored} 条，实际 {actual} 条')
+                if not options['dry_run']:
+                    # 只在计数仍为读到的值时写入，避免覆盖期间并发的增减
+                    Blog.objects.filter(id=blog_id, comment_count=stored).update(comment_count=actual)
+
+        action = '发现' if options['dry_run'] else '修正'
+        self.stdout.write(self.style.SUCCESS(f'核对 {checked} 篇博客，{action} {fixed} 篇评论数偏差'))
@@ -0,0 +1,226 @@
+import datetime
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from blog.html_text import html_to_text
+from blog.models import Blog, BlogComment, ModerationLog
+from blog.moderation import format_moderation_reason, get_engine, moderation_version, scan_fields
+
+
+def init_worker():
+    """
+    子进程初始化：fork 方式启动时直接继承父进程已构建的审核引擎，spawn 方式启动时重新加载
+    """
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+    get_engine()
+
+
+def scan_blogs(rows):
+    """
+    审核一批博客，rows 为 [(id, title, content), ...]，返回不规范的 [(id, 原因), ...]
+    """
+    texts = []
+    for _, title, content in rows:
+        texts += [title, html_to_text(content)]
+    results = scan_fields(texts)
+    flagged = []
+    for index, (blog_id, _, _) in enumerate(rows):
+        title_result, content_result = results[2 * index], results[2 * index + 1]
+        if not title_result.is_safe or not content_result.is_safe:
+            flagged.append((blog_id, format_moderation_reason([('标题', title_result), ('内容', content_result)])))
+    return flagged
+
+
+def scan_comments(rows):
+    """
+    审核一批评论，rows 为 [(id, content), ...]，返回不规范的 [(id, 原因), ...]
+    """
+    results = scan_fields(content for _, content in rows)
+    return [(comment_id, result.message) for (comment_id, _), result in zip(rows, results) if not result.is_safe]
+
+
+def iter_chunks(rows, size, last_id=0):
+    """
+    按主键分页读取 id > last_id 的记录：每批一条 id > 上一批最大 id 的 LIMIT 查询。
+    MySQL 驱动执行 .iterator() 时仍会把整个结果集读入客户端内存，按主键分页才能保证内存只与批大小有关
+    """
+    while True:
+        chunk = list(rows.filter(id__gt=last_id)[:size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1][0]
+
+
+class Command(BaseCommand):
+    help = '词典或规则更新后，用多进程重新审核已发布的博客和评论，不规范的内容写入审核日志'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', choices=['all', 'blog', 'comment'], default='all', help='复审的内容类型')
+        parser.add_argument('--since', help='只复审该时间之后发布（博客为最后修改）的内容，如 2025-01-01')
+        parser.add_argument('--category', type=int, help='只复审该分类下的博客及其评论')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='审核进程数，1 表示不开子进程')
+        parser.add_argument('--chunk-size', type=int, default=500, help='每批读取和审核的记录数')
+        parser.add_argument('--checkpoint', help='断点文件，中断后使用同一文件重新运行会从上次的位置继续')
+        parser.add_argument('--restart', action='store_true', help='忽略断点文件，从头开始')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                date = parse_date(options['since'])
+                if date is None:
+                    raise CommandError('--since 格式应为 YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS')
+                since = datetime.datetime.combine(date, datetime.time.min)
+            if settings.USE_TZ and timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        # 子进程 fork 时继承已构建的审核引擎
+        get_engine()
+        self.version = moderation_version()
+        self.checkpoint_path = options['checkpoint']
+        self.checkpoint = self.load_checkpoint(options['restart'])
+        self.chunk_size = options['chunk_size']
+
+        blogs = Blog.objects.order_by('id')
+        comments = BlogComment.objects.filter(deleted_at__isnull=True).order_by('id')
+        if since:
+            blogs = blogs.filter(pub_time__gte=since)
+            comments = comments.filter(pub_time__gte=since)
+        if options['category']:
+            blogs = blogs.filter(category_id=options['category'])
+            comments = comments.filter(blog__category_id=options['category'])
+
+        pool = None
+        if options['workers'] > 1:
+            # 子进程不使用数据库，先关闭连接，避免 fork 后共享同一个连接
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker)
+        try:
+            if options['type'] in ('all', 'blog'):
+                rows = blogs.values_list('id', 'title', 'content', 'author_id', 'category_id')
+                self.run('blog', rows, scan_blogs, pool, options['workers'])
+            if options['type'] in ('all', 'comment'):
+                rows = comments.values_list('id', 'content', 'author_id', 'blog_id', 'parent_id', 'reply_to_id')
+                self.run('comment', rows, scan_comments, pool, options['workers'])
+        finally:
+            if pool:
+                pool.shutdown()
+
+    def load_checkpoint(self, restart):
+        checkpoint = {'version': self.version, 'blog': 0, 'comment': 0}
+        if not self.checkpoint_path or restart or not os.path.exists(self.checkpoint_path):
+            return checkpoint
+        with open(self.checkpoint_path, encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get('version') != self.version:
+            self.stdout.write(self.style.WARNING('审核版本已变化，断点作废，从头开始复审'))
+            return checkpoint
+        checkpoint.update(saved)
+        self.stdout.write(f'从断点继续：博客 ID > {checkpoint["blog"]}，评论 ID > {checkpoint["comment"]}')
+        return checkpoint
+
+    def save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        tmp_path = f'{self.checkpoint_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def run(self, kind, rows, scan, pool, workers):
+        """
+        分批读取记录交给子进程审核；同时进行的批次数有上限，内存只与批大小有关。
+        按读取顺序处理审核结果，每批日志写入后才推进断点
+        """
+        label = '博客' if kind == 'blog' else '评论'
+        start = time.perf_counter()
+        scanned = flagged = 0
+        in_flight = deque()
+
+        def finish(limit):
+            nonlocal scanned, flagged
+            while len(in_flight) > limit:
+                chunk, result = in_flight.popleft()
+                flagged += self.finish_chunk(kind, chunk, result.result() if pool else result)
+                scanned += len(chunk)
+                if scanned % (self.chunk_size * 20) < len(chunk):
+                    rate = scanned / (time.perf_counter() - start)
+                    self.stdout.write(f'{label}：已复审 {scanned} 条，新增 {flagged} 条待审核日志（{rate:.0f} 条/秒）')
+
+        for chunk in iter_chunks(rows, self.chunk_size, self.checkpoint[kind]):
+            if kind == 'blog':
+                payload = [(row[0], row[1], row[2]) for row in chunk]
+            else:
+                payload = [(row[0], row[1]) for row in chunk]
+            in_flight.append((chunk, pool.submit(scan, payload) if pool else scan(payload)))
+            finish(2 * workers if pool else 0)
+        finish(0)
+        self.stdout.write(self.style.SUCCESS(
+            f'{label}复审完成：共 {scanned} 条，新增 {flagged} 条待审核日志，耗时 {time.perf_counter() - start:.1f} 秒'
+        ))
+
+    def finish_chunk(self, kind, chunk, flagged):
+        """
+        写入一批的审核日志（已有待审核日志的内容不重复写入），推进断点
+        """
+        reasons = dict(flagged)
+        logs = []
+        if reasons:
+            existing = set(ModerationLog.objects.filter(
+                content_type=kind, content_id__in=list(reasons), status='pending'
+            ).values_list('content_id', flat=True))
+            for row in chunk:
+                if row[0] not in reasons or row[0] in existing:
+                    continue
+                logs.append(self.make_log(kind, row, reasons[row[0]]))
+            ModerationLog.objects.bulk_create(logs, batch_size=self.chunk_size)
+        self.checkpoint[kind] = chunk[-1][0]
+        self.save_checkpoint()
+        return len(logs)
+
+    @staticmethod
+    def make_log(kind, row, reason):
+        if kind == 'blog':
+            blog_id, title, content, author_id, category_id = row
+            return ModerationLog(
+                content_type='blog',
+                content_id=blog_id,
+                original_content=f'标题: {title}\n内容: {content}',
+                flagged_by_ai=True,
+                is_published=True,
+                reason=reason,
+                status='pending',
+                author_id=author_id,
+                category_id=category_id,
+            )
+        comment_id, content, author_id, blog_id, parent_id, reply_to_id = row
+        return ModerationLog(
+            content_type='comment',
+            content_id=comment_id,
+            original_content=json.dumps({
+                'content': content,
+                'blog_id': blog_id,
+                'parent_comment_id': parent_id,
+                'reply_to_user_id': reply_to_id,
+            }, ensure_ascii=False),
+            flagged_by_ai=True,
+            is_published=True,
+            reason=reason,
+            status='pending',
+            author_id=author_id,
+        )
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import Blog
+from blog.rendering import RENDER_VERSION, RENDERED_FIELDS, render_blog
+
+
+class Command(BaseCommand):
+    help = '预渲染博客正文：默认只处理渲染版本过期的博客，升级渲染规则后运行可避免详情页首次访问时渲染'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='重新渲染全部博客')
+        parser.add_argument('--chunk-size', type=int, default=200, help='每批处理的博客数')
+
+    def handle(self, *args, **options):
+        blogs = Blog.objects.order_by('id').only('id', 'content', 'render_hash')
+        if not options['all']:
+            blogs = blogs.exclude(render_hash__startswith=f'{RENDER_VERSION}:')
+
+        rendered = 0
+        last_id = 0
+        while True:
+            chunk = list(blogs.filter(id__gt=last_id)[:options['chunk_size']])
+            if not chunk:
+                break
+            for blog in chunk:
+                render_blog(blog)
+            Blog.objects.bulk_update(chunk, RENDERED_FIELDS)
+            rendered += len(chunk)
+            last_id = chunk[-1].id
+            self.stdout.write(f'已渲染 {rendered} 篇博客')
+        self.stdout.write(self.style.SUCCESS(f'渲染完成，共 {rendered} 篇'))
@@ -0,0 +1,98 @@
+import datetime
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.classifier import MODERATION_MODEL_PATH, MODERATION_MODEL_THRESHOLD, build_pipeline, prepare_text
+from blog.models import ModerationLog
+
+
+def log_text(log):
+    """
+    从审核日志中取出被审核的原文
+    """
+    if log.content_type == 'comment':
+        try:
+            return json.loads(log.original_content).get('content', '')
+        except (json.JSONDecodeError, AttributeError):
+            return log.original_content
+    return log.original_content.replace('标题: ', '', 1).replace('\n内容: ', '\n', 1)
+
+
+def export_decisions():
+    """
+    导出人工复核的结论：拒绝记为 1（违规），通过记为 0
+    """
+    logs = ModerationLog.objects.filter(status__in=['approved', 'rejected']).only(
+        'content_type', 'original_content', 'status'
+    )
+    for log in logs.iterator(chunk_size=500):
+        text = log_text(log)
+        if text:
+            yield {'text': text, 'label': 1 if log.status == 'rejected' else 0}
+
+
+class Command(BaseCommand):
+    help = '根据审核日志中的人工通过 / 拒绝记录训练并评估高级审查模型'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--export', metavar='PATH', help='只把审核结论导出为 JSONL 文件，不训练')
+        parser.add_argument('--data', metavar='PATH', help='使用导出的 JSONL 文件训练，默认直接读取数据库')
+        parser.add_argument('--output', default=MODERATION_MODEL_PATH, help='模型保存路径')
+        parser.add_argument('--test-size', type=float, default=0.2, help='评估集比例')
+
+    def handle(self, *args, **options):
+        if options['export']:
+            count = 0
+            with open(options['export'], 'w', encoding='utf-8') as f:
+                for sample in export_decisions():
+                    f.write(json.dumps(sample, ensure_ascii=False) + '\n')
+                    count += 1
+            self.stdout.write(self.style.SUCCESS(f'已导出 {count} 条审核结论 -> {options["export"]}'))
+            return
+
+        try:
+            import joblib
+            from sklearn.metrics import classification_report
+            from sklearn.model_selection import train_test_split
+        except ImportError:
+            raise CommandError('训练模型需要安装 scikit-learn')
+
+        if options['data']:
+            with open(options['data'], encoding='utf-8') as f:
+                samples = [json.loads(line) for line in f if line.strip()]
+        else:
+            samples = list(export_decisions())
+        texts = [sample['text'] for sample in samples]
+        labels = [sample['label'] for sample in samples]
+        if len(set(labels)) < 2 or len(samples) < 10:
+            raise CommandError('训练数据不足：至少需要 10 条记录，且同时包含通过和拒绝的结论')
+
+        train_texts, test_texts, train_labels, test_labels = train_test_split(
+            texts, labels, test_size=options['test_size'], random_state=0, stratify=labels
+        )
+        pipeline = build_pipeline()
+        start = time.perf_counter()
+        pipeline.fit([prepare_text(text) for text in train_texts], train_labels)
+        train_seconds = time.perf_counter() - start
+
+        # 评估：使用与线上一致的判定阈值
+        start = time.perf_counter()
+        probabilities = pipeline.predict_proba([prepare_text(text) for text in test_texts])
+        predict_ms = (time.perf_counter() - start) * 1000 / max(len(test_texts), 1)
+        predictions = [int(row[1] >= MODERATION_MODEL_THRESHOLD) for row in probabilities]
+        self.stdout.write(f'训练样本 {len(train_texts)} 条，评估样本 {len(test_texts)} 条，训练耗时 {train_seconds:.2f} 秒')
+        self.stdout.write(classification_report(
+            test_labels, predictions, labels=[0, 1], target_names=['通过', '拒绝'], zero_division=0
+        ))
+        self.stdout.write(f'批量推理平均每条 {predict_ms:.3f} ms（阈值 {MODERATION_MODEL_THRESHOLD}）')
+
+        # 评估完成后用全部数据重新训练再保存
+        pipeline.fit([prepare_text(text) for text in texts], labels)
+        joblib.dump({
+            'pipeline': pipeline,
+            'trained_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'samples': len(texts),
+        }, options['output'])
+        self.stdout.write(self.style.SUCCESS(f'模型已保存到 {options["output"]}，重启服务进程后生效'))
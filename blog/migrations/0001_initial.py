@@ -1,7 +1,6 @@
 # Generated by Django 5.2 on 2025-08-12 21:56
 
 import django.db.models.deletion
-import mptt.fields
 from django.conf import settings
 from django.db import migrations, models
 
@@ -124,7 +123,9 @@ class Migration(migrations.Migration):
                 ),
                 (
                     "parent",
-                    mptt.fields.TreeForeignKey(
+                    # 原为 mptt.fields.TreeForeignKey，它是 ForeignKey 的子类，数据库结构相同；
+                    # 评论改用物化路径后不再依赖 django-mptt，这里改为 ForeignKey 使迁移历史不再导入 mptt
+                    models.ForeignKey(
                         blank=True,
                         null=True,
                         on_delete=django.db.models.deletion.CASCADE,
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0011_alter_moderationlog_options_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blog",
+            name="moderated_version",
+            field=models.CharField(
+                blank=True, default="", max_length=32, verbose_name="审核版本"
+            ),
+        ),
+    ]
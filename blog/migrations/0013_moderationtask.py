@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0012_blog_moderated_version"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ModerationTask",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("blog", "博客文章"), ("comment", "评论")],
+                        max_length=20,
+                        verbose_name="内容类型",
+                    ),
+                ),
+                ("payload", models.JSONField(verbose_name="提交内容")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "排队中"),
+                            ("processing", "审核中"),
+                            ("published", "已发布"),
+                            ("flagged", "待人工审核"),
+                            ("failed", "处理失败"),
+                        ],
+                        db_index=True,
+                        default="pending",
+                        max_length=20,
+                        verbose_name="任务状态",
+                    ),
+                ),
+                (
+                    "result",
+                    models.JSONField(blank=True, default=dict, verbose_name="处理结果"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="提交时间"),
+                ),
+                (
+                    "started_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="开始处理时间"
+                    ),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="完成时间"
+                    ),
+                ),
+                (
+                    "author",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="moderation_tasks",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="提交者",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "异步审核任务",
+                "verbose_name_plural": "异步审核任务",
+                "ordering": ["created_at"],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0013_moderationtask"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="moderationlog",
+            name="is_published",
+            field=models.BooleanField(default=False, verbose_name="内容已发布"),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:23
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_comment_count(apps, schema_editor):
+    Blog = apps.get_model("blog", "Blog")
+    BlogComment = apps.get_model("blog", "BlogComment")
+    counts = (
+        BlogComment.objects.filter(blog=OuterRef("pk"))
+        .order_by()
+        .values("blog")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    Blog.objects.update(comment_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0014_moderationlog_is_published"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blog",
+            name="comment_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="评论数"),
+        ),
+        migrations.RunPython(fill_comment_count, migrations.RunPython.noop),
+    ]
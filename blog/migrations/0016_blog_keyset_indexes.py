@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0015_blog_comment_count"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="blog",
+            index=models.Index(fields=["pub_time", "id"], name="blog_pub_time_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="blog",
+            index=models.Index(
+                fields=["category", "like_count", "id"],
+                name="blog_category_like_id_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="blog",
+            index=models.Index(
+                fields=["author", "pub_time", "id"], name="blog_author_pub_time_id_idx"
+            ),
+        ),
+    ]
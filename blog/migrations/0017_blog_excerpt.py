@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:26
+
+import html
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+# 迁移时的摘要规则，固定在迁移中，不随 blog.models 变化
+EXCERPT_LENGTH = 100
+
+
+def plain_text(source):
+    return " ".join(html.unescape(strip_tags(source)).split())
+
+
+def make_excerpt(content):
+    return Truncator(plain_text(content)).chars(EXCERPT_LENGTH)
+
+
+def fill_excerpt(apps, schema_editor):
+    Blog = apps.get_model("blog", "Blog")
+    last_id = 0
+    while True:
+        blogs = list(Blog.objects.filter(id__gt=last_id).order_by("id")[:500])
+        if not blogs:
+            break
+        for blog in blogs:
+            blog.plain_title = plain_text(blog.title)
+            blog.excerpt = make_excerpt(blog.content)
+        Blog.objects.bulk_update(blogs, ["plain_title", "excerpt"])
+        last_id = blogs[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0016_blog_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blog",
+            name="excerpt",
+            field=models.CharField(
+                blank=True, default="", max_length=200, verbose_name="摘要"
+            ),
+        ),
+        migrations.AddField(
+            model_name="blog",
+            name="plain_title",
+            field=models.CharField(
+                blank=True, default="", max_length=200, verbose_name="纯文本标题"
+            ),
+        ),
+        migrations.RunPython(fill_excerpt, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0017_blog_excerpt"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blog",
+            name="render_hash",
+            field=models.CharField(
+                blank=True, default="", max_length=64, verbose_name="渲染版本"
+            ),
+        ),
+        migrations.AddField(
+            model_name="blog",
+            name="rendered_content",
+            field=models.TextField(blank=True, default="", verbose_name="渲染后的内容"),
+        ),
+        migrations.AddField(
+            model_name="blog",
+            name="toc",
+            field=models.JSONField(blank=True, default=list, verbose_name="目录"),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0018_blog_rendered_content"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blog",
+            name="needs_highlight",
+            field=models.BooleanField(default=False, verbose_name="需要前端代码高亮"),
+        ),
+    ]
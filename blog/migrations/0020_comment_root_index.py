@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0019_blog_needs_highlight"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="blogcomment",
+            index=models.Index(
+                fields=["blog", "level", "pub_time", "id"], name="comment_blog_root_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="blogcomment",
+            index=models.Index(
+                fields=["tree_id", "lft"], name="blog_blogcomment_tree_id_ld9de"
+            ),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:36
+
+import logging
+
+from django.db import migrations, models
+
+logger = logging.getLogger(__name__)
+
+# 迁移时的路径规则，固定在迁移中，不随 blog.models 变化
+COMMENT_PATH_STEP = 7
+COMMENT_MAX_LEVEL = 252 // COMMENT_PATH_STEP - 1
+BASE36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def comment_path_step(comment_id):
+    digits = ""
+    while comment_id:
+        comment_id, remainder = divmod(comment_id, 36)
+        digits = BASE36[remainder] + digits
+    return digits.rjust(COMMENT_PATH_STEP, "0")
+
+
+def fill_comment_path(apps, schema_editor):
+    """
+    按 MPTT 的先序（tree_id, lft）遍历评论，父评论总在子评论之前，由父评论的路径生成子评论的路径；
+    超过最大层数的回复挂到最深一层，改挂的条数记录到日志
+    """
+    BlogComment = apps.get_model("blog", "BlogComment")
+    comments = (
+        BlogComment.objects.order_by("tree_id", "lft")
+        .only("id", "parent_id", "tree_id")
+        .iterator(chunk_size=2000)
+    )
+    tree_id = None
+    nodes = {}
+    batch = []
+    reparented = 0
+    for comment in comments:
+        if comment.tree_id != tree_id:
+            tree_id, nodes = comment.tree_id, {}
+        parent = nodes.get(comment.parent_id)
+        if parent is not None and parent[2] >= COMMENT_MAX_LEVEL:
+            comment.parent_id = parent[0]
+            parent = nodes[parent[0]]
+            reparented += 1
+        comment.level = parent[2] + 1 if parent else 0
+        comment.path = (parent[1] if parent else "") + comment_path_step(comment.id)
+        # id -> (父评论 id, 路径, 层级)
+        nodes[comment.id] = (comment.parent_id, comment.path, comment.level)
+        batch.append(comment)
+        if len(batch) >= 1000:
+            BlogComment.objects.bulk_update(batch, ["parent", "path", "level"])
+            batch = []
+    if batch:
+        BlogComment.objects.bulk_update(batch, ["parent", "path", "level"])
+    if reparented:
+        logger.warning(
+            "fill_comment_path: %d replies nested deeper than level %d were re-parented to level %d",
+            reparented,
+            COMMENT_MAX_LEVEL,
+            COMMENT_MAX_LEVEL,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0020_comment_root_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blogcomment",
+            name="path",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                default="",
+                editable=False,
+                max_length=252,
+                verbose_name="评论路径",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="blogcomment",
+            index=models.Index(
+                fields=["parent", "pub_time", "id"], name="comment_parent_time_idx"
+            ),
+        ),
+        migrations.RunPython(fill_comment_path, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def rebuild_mptt_fields(apps, schema_editor):
+    """
+    回滚时由评论路径重建 MPTT 的 tree_id、lft、rght：
+    与原来的 order_insertion_by = ['-pub_time'] 一致，顶级评论和同级回复都按发表时间倒序
+    """
+    BlogComment = apps.get_model("blog", "BlogComment")
+    roots = BlogComment.objects.filter(parent__isnull=True).order_by("-pub_time", "-id")
+    for tree_id, root in enumerate(roots.only("id", "path").iterator(), start=1):
+        comments = list(
+            BlogComment.objects.filter(path__startswith=root.path).only(
+                "id", "parent_id", "pub_time"
+            )
+        )
+        children = {}
+        for comment in sorted(comments, key=lambda c: (c.pub_time, c.id), reverse=True):
+            children.setdefault(comment.parent_id, []).append(comment)
+        # 非递归先序遍历：进入节点时分配 lft，子节点全部处理完后分配 rght
+        counter = 1
+        root_node = next(c for c in comments if c.id == root.id)
+        root_node.tree_id, root_node.lft = tree_id, counter
+        stack = [(root_node, iter(children.get(root_node.id, ())))]
+        while stack:
+            node, pending = stack[-1]
+            child = next(pending, None)
+            counter += 1
+            if child is None:
+                node.rght = counter
+                stack.pop()
+            else:
+                child.tree_id, child.lft = tree_id, counter
+                stack.append((child, iter(children.get(child.id, ()))))
+        BlogComment.objects.bulk_update(
+            comments, ["tree_id", "lft", "rght"], batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0021_blogcomment_path"),
+    ]
+
+    operations = [
+        # 先给 MPTT 字段加上默认值，回滚时重新加回字段不会因已有数据失败，再由 rebuild_mptt_fields 填充
+        migrations.AlterField(
+            model_name="blogcomment",
+            name="lft",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name="blogcomment",
+            name="rght",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name="blogcomment",
+            name="tree_id",
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, rebuild_mptt_fields),
+        migrations.RemoveIndex(
+            model_name="blogcomment",
+            name="blog_blogcomment_tree_id_ld9de",
+        ),
+        migrations.RemoveField(
+            model_name="blogcomment",
+            name="lft",
+        ),
+        migrations.RemoveField(
+            model_name="blogcomment",
+            name="rght",
+        ),
+        migrations.RemoveField(
+            model_name="blogcomment",
+            name="tree_id",
+        ),
+        migrations.AlterField(
+            model_name="blogcomment",
+            name="level",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="层级"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="blogcomment",
+            name="parent",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="children",
+                to="blog.blogcomment",
+                verbose_name="回复的评论",
+            ),
+        ),
+    ]
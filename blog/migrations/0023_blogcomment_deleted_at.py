@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0022_remove_blogcomment_mptt_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blogcomment",
+            name="deleted_at",
+            field=models.DateTimeField(
+                blank=True, db_index=True, null=True, verbose_name="删除时间"
+            ),
+        ),
+    ]
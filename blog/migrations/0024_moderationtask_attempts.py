@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0023_blogcomment_deleted_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="moderationtask",
+            name="attempts",
+            field=models.PositiveIntegerField(default=0, verbose_name="领取次数"),
+        ),
+        migrations.AddField(
+            model_name="moderationtask",
+            name="content_id",
+            field=models.PositiveIntegerField(
+                blank=True, null=True, verbose_name="发布内容ID"
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+# 与 0021 相同的路径规则，固定在迁移中，不随 blog.models 变化
+PATH_STEP = 7
+BASE36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def path_step(comment_id):
+    digits = ""
+    while comment_id:
+        comment_id, remainder = divmod(comment_id, 36)
+        digits = BASE36[remainder] + digits
+    return digits.rjust(PATH_STEP, "0")
+
+
+def repair_empty_path(apps, schema_editor):
+    """
+    补上路径为空的评论（按层级从浅到深，父评论先补）
+    """
+    BlogComment = apps.get_model("blog", "BlogComment")
+    for comment in BlogComment.objects.filter(path="").order_by("level", "id"):
+        parent_path = ""
+        if comment.parent_id:
+            parent_path = (
+                BlogComment.objects.filter(id=comment.parent_id)
+                .values_list("path", flat=True)
+                .get()
+            )
+        comment.path = parent_path + path_step(comment.id)
+        comment.level = len(comment.path) // PATH_STEP - 1
+        comment.save(update_fields=["path", "level"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0024_moderationtask_attempts"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(repair_empty_path, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="blogcomment",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("path", ""), _negated=True),
+                name="comment_path_not_empty",
+            ),
+        ),
+    ]
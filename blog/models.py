@@ -1,9 +1,45 @@
-from django.db import models
+import html
+import uuid
+
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
-from mptt.models import MPTTModel, TreeForeignKey
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+from .rendering import RENDERED_FIELDS, render_blog
 
 User = get_user_model()
 
+# 列表页摘要的长度（字符）
+EXCERPT_LENGTH = 100
+
+
+def plain_text(source):
+    """
+    去掉 HTML 标签、解码实体并合并空白后的纯文本
+    """
+    return ' '.join(html.unescape(strip_tags(source)).split())
+
+
+def make_excerpt(content):
+    return Truncator(plain_text(content)).chars(EXCERPT_LENGTH)
+
+
+# 评论路径中每一层的长度：评论 id 的 36 进制，左侧补 0
+COMMENT_PATH_STEP = 7
+COMMENT_PATH_LENGTH = 252
+# 最深的评论层级（顶级评论为 0），更深的回复挂到这一层
+COMMENT_MAX_LEVEL = COMMENT_PATH_LENGTH // COMMENT_PATH_STEP - 1
+_BASE36 = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def comment_path_step(comment_id):
+    digits = ''
+    while comment_id:
+        comment_id, remainder = divmod(comment_id, 36)
+        digits = _BASE36[remainder] + digits
+    return digits.rjust(COMMENT_PATH_STEP, '0')
+
 
 class BlogCategory(models.Model):
     """
@@ -28,11 +64,41 @@ class Blog(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='作者')
     view_count = models.PositiveIntegerField(default=0, verbose_name='浏览量')
     like_count = models.PositiveIntegerField(default=0, verbose_name='点赞数')
+    # 冗余的评论数，由 blog.comments 在评论新增、删除时原子更新
+    comment_count = models.PositiveIntegerField(default=0, verbose_name='评论数')
+    # 最近一次审核通过时的审核版本（词典版本 + 规则版本），编辑时据此决定能否只审核修改部分
+    moderated_version = models.CharField(max_length=32, blank=True, default='', verbose_name='审核版本')
+    # 保存时由标题和正文生成，列表页只读这两列，不加载正文
+    plain_title = models.CharField(max_length=200, blank=True, default='', verbose_name='纯文本标题')
+    excerpt = models.CharField(max_length=200, blank=True, default='', verbose_name='摘要')
+    # 保存时预渲染的正文（过滤、图片懒加载、标题锚点）和目录，详情页直接输出，见 blog.rendering
+    rendered_content = models.TextField(blank=True, default='', verbose_name='渲染后的内容')
+    toc = models.JSONField(blank=True, default=list, verbose_name='目录')
+    # 有代码块未能在服务端高亮（未安装 Pygments、未知语言），详情页需要加载 highlight.js
+    needs_highlight = models.BooleanField(default=False, verbose_name='需要前端代码高亮')
+    render_hash = models.CharField(max_length=64, blank=True, default='', verbose_name='渲染版本')
 
     class Meta:
         verbose_name = '博客'
         verbose_name_plural = verbose_name
         ordering = ['-pub_time']
+        # 列表页游标分页使用的排序键（blog.pagination）
+        indexes = [
+            models.Index(fields=['pub_time', 'id'], name='blog_pub_time_id_idx'),
+            models.Index(fields=['category', 'like_count', 'id'], name='blog_category_like_id_idx'),
+            models.Index(fields=['author', 'pub_time', 'id'], name='blog_author_pub_time_id_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # 只更新浏览量、点赞数等字段时不重新生成
+        if update_fields is None or {'title', 'content'} & set(update_fields):
+            self.plain_title = plain_text(self.title)
+            self.excerpt = make_excerpt(self.content)
+            render_blog(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'plain_title', 'excerpt', *RENDERED_FIELDS}
+        super().save(*args, **kwargs)
 
 
 class BlogLike(models.Model):
@@ -49,7 +115,7 @@ class BlogLike(models.Model):
         unique_together = ('blog', 'user')
 
 
-class BlogComment(MPTTModel):
+class BlogComment(models.Model):
     """
     评论
     """
@@ -64,12 +130,12 @@ class BlogComment(MPTTModel):
                                on_delete=models.CASCADE,
                                verbose_name='评论的作者'
                                )
-    parent = TreeForeignKey('self',
-                            on_delete=models.CASCADE,
-                            null=True,
-                            blank=True,
-                            related_name='children',
-                            verbose_name='回复的评论')
+    parent = models.ForeignKey('self',
+                               on_delete=models.CASCADE,
+                               null=True,
+                               blank=True,
+                               related_name='children',
+                               verbose_name='回复的评论')
     reply_to = models.ForeignKey(User,
                                  on_delete=models.CASCADE,
                                  null=True,
@@ -77,17 +143,68 @@ class BlogComment(MPTTModel):
                                  related_name='replyers',
                                  verbose_name='回复的作者'
                                  )
-
-    class MPTTMeta:
-        order_insertion_by = ['-pub_time']
+    # 物化路径：从顶级评论到自身的 id 依次拼接，子树即以自身路径为前缀的评论。
+    # 新评论只写入自己这一行，不像 MPTT 那样要调整同一棵树中其他评论的 lft/rght
+    path = models.CharField(max_length=COMMENT_PATH_LENGTH, blank=True, default='', editable=False,
+                            db_index=True, verbose_name='评论路径')
+    level = models.PositiveIntegerField(default=0, editable=False, verbose_name='层级')
+    # 软删除：删除评论时只标记整棵子树并立即隐藏，由 purge_deleted_comments 命令在后台分批物理删除
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name='删除时间')
 
     class Meta:
         verbose_name = '博客评论'
         verbose_name_plural = verbose_name
+        # 详情页顶级评论和回复的游标分页（blog.comments.root_comments、blog.comments.replies）
+        indexes = [
+            models.Index(fields=['blog', 'level', 'pub_time', 'id'], name='comment_blog_root_idx'),
+            models.Index(fields=['parent', 'pub_time', 'id'], name='comment_parent_time_idx'),
+        ]
+        # 空路径是所有路径的前缀，子树查询会匹配到全部评论
+        constraints = [
+            models.CheckConstraint(condition=~models.Q(path=''), name='comment_path_not_empty'),
+        ]
 
     def __str__(self):
         return self.content[:20]
 
+    def save(self, *args, **kwargs):
+        if self.path:
+            return super().save(*args, **kwargs)
+        # 新评论：路径需要自身的 id。先写入以 ~ 开头的临时路径（不是任何评论路径的前缀），插入后在同一事务中补上
+        parent = self.parent if self.parent_id else None
+        if parent is not None and parent.level >= COMMENT_MAX_LEVEL:
+            parent = self.parent = parent.parent
+        self.level = parent.level + 1 if parent else 0
+        with transaction.atomic():
+            self.path = f'~{uuid.uuid4().hex}'
+            try:
+                super().save(*args, **kwargs)
+            except Exception:
+                self.path = ''
+                raise
+            self.path = (parent.path if parent else '') + comment_path_step(self.id)
+            BlogComment.objects.filter(id=self.id).update(path=self.path)
+
+    def get_children(self):
+        """
+        直接回复。blog.comments 组装评论树后读取内存中的结果，不再查询
+        """
+        if hasattr(self, '_cached_children'):
+            return self._cached_children
+        return self.children.filter(deleted_at__isnull=True).order_by('-pub_time', '-id')
+
+    def subtree_filter(self):
+        """
+        自身及全部回复的查询条件。路径缺失（数据异常）时只包含自身，避免前缀匹配到所有评论
+        """
+        if not self.path:
+            return models.Q(pk=self.pk)
+        return models.Q(path__startswith=self.path)
+
+    def get_descendants(self, include_self=False):
+        descendants = BlogComment.objects.filter(self.subtree_filter(), deleted_at__isnull=True)
+        return descendants if include_self else descendants.exclude(id=self.id)
+
 
 class Notification(models.Model):
     """
@@ -150,6 +267,8 @@ class ModerationLog(models.Model):
     flagged_by_ai = models.BooleanField(default=False, verbose_name='是否由AI标记')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, verbose_name='审核状态')
     reason = models.TextField(blank=True, verbose_name='标记原因')
+    # 复查已发布内容（如词典更新后的批量复审）时为 True：通过时内容保持不变，拒绝时删除内容
+    is_published = models.BooleanField(default=False, verbose_name='内容已发布')
     category = models.ForeignKey(
         BlogCategory,
         on_delete=models.SET_NULL,
@@ -179,3 +298,44 @@ class ModerationLog(models.Model):
     def __str__(self):
         source = '举报' if self.flagged_by_ai else 'AI审核'
         return f'{source}记录 - 类型: {self.content_type}, ID: {self.id}'
+
+
+class ModerationTask(models.Model):
+    """
+    异步审核任务队列，由 moderation_worker 后台处理
+    """
+    KIND_CHOICES = [
+        ('blog', '博客文章'),
+        ('comment', '评论'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', '排队中'),
+        ('processing', '审核中'),
+        ('published', '已发布'),
+        ('flagged', '待人工审核'),
+        ('failed', '处理失败'),
+    ]
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name='内容类型')
+    payload = models.JSONField(verbose_name='提交内容')
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, verbose_name='提交者', related_name='moderation_tasks'
+    )
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True, verbose_name='任务状态'
+    )
+    result = models.JSONField(default=dict, blank=True, verbose_name='处理结果')
+    # 发布时创建的博客或评论，重新处理同一任务时据此跳过，不会重复发布
+    content_id = models.PositiveIntegerField(null=True, blank=True, verbose_name='发布内容ID')
+    # 被领取的次数，同时作为领取凭证：超时后被重新领取的任务，原 worker 不能再提交结果
+    attempts = models.PositiveIntegerField(default=0, verbose_name='领取次数')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='提交时间')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='开始处理时间')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='完成时间')
+
+    class Meta:
+        verbose_name = '异步审核任务'
+        verbose_name_plural = verbose_name
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f'{self.get_kind_display()}审核任务 - ID: {self.id}, 状态: {self.get_status_display()}'
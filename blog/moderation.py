@@ -1,34 +1,70 @@
 from typing import Tuple, List
 from pathlib import Path
+import hashlib
+import logging
 import os
 import re
+import sys
+import threading
+import time
+from collections import deque, namedtuple
 from django.conf import settings
 
+from .compiled_automaton import MappedAutomaton, load_compiled_automaton
+from .moderation_cache import ModerationResultCache
+from .moderation_stats import ModerationStats
+from .classifier import classify_many, get_classifier, model_version
+from .normalization import (
+    BOUNDARY_SET, BREAK, CJK_START, FOLD_TABLE, MARKER_SET, NORMALIZATION_VERSION, SEPARATOR_SET, SKIP, fold_text,
+    fold_word, is_cjk,
+)
+
+logger = logging.getLogger(__name__)
+
 
 SENSITIVE_WORDS_FILE_PATH = getattr(settings, 'SENSITIVE_WORDS_FILE', None)
-SENSITIVE_WORDS = set()  # 敏感词词典
+# 预编译的自动机文件，由 manage.py compile_sensitive_words 生成，默认与词典文件同目录
+SENSITIVE_WORDS_AUTOMATON_PATH = getattr(
+    settings, 'SENSITIVE_WORDS_AUTOMATON_FILE',
+    os.path.splitext(SENSITIVE_WORDS_FILE_PATH)[0] + '.bin' if SENSITIVE_WORDS_FILE_PATH else None
+)
+# 词典文件变更检查间隔（秒），每个进程在审核时按此间隔检查一次文件修改时间
+SENSITIVE_WORDS_CHECK_INTERVAL = getattr(settings, 'SENSITIVE_WORDS_CHECK_INTERVAL', 5)
+# 每个引擎缓存的状态转移数上限，超过后清空重新缓存
+MODERATION_TRANSITION_CACHE_SIZE = getattr(settings, 'MODERATION_TRANSITION_CACHE_SIZE', 200000)
+SENSITIVE_WORDS = set()  # 敏感词词典（使用预编译文件时不在内存中保留词表）
+ENGINE = None  # 当前使用的审核引擎，首次审核时（或服务进程启动时）才构建
 
+# 词典运行指标，供审核后台查看
+MODERATION_METRICS = {
+    'word_count': 0,  # 词典大小
+    'automaton_states': 0,  # 自动机状态数
+    'automaton_mode': '',  # memory：内存中构建；mmap：映射预编译文件
+    'version': '',  # 词典版本（文件内容哈希）
+    'reload_seconds': 0.0,  # 最近一次构建耗时
+    'reload_count': 0,  # 热加载次数（不含启动时的首次加载）
+    'loaded_at': None,  # 最近一次加载时间
+    'last_error': '',  # 最近一次热加载失败原因
+}
 
-def load_sensitive_words():
+
+def read_sensitive_words(path):
     """
-    从文件中加载敏感词词典。
-    在应用启动时调用。
+    读取词典文件，返回 (敏感词集合, 词典版本)。
+    敏感词与扫描文本做同样的归一化；版本取文件内容的哈希，内容不变时版本不变。
     """
-    global SENSITIVE_WORDS
-    SENSITIVE_WORDS.clear()
+    with open(path, 'rb') as f:
+        data = f.read()
+    text = data.decode('utf-8', errors='ignore')
+    words = {fold_word(line) for line in text.splitlines()}
+    return {word for word in words if len(word) > 1}, words_file_version(data)
 
-    if not SENSITIVE_WORDS_FILE_PATH or not os.path.exists(SENSITIVE_WORDS_FILE_PATH):
-        print("警告：未找到敏感词文件。内容审核将不太有效!")
-        return
 
-    try:
-        with open(SENSITIVE_WORDS_FILE_PATH, "r", encoding="utf-8", errors="ignore") as f:
-            words = {line.strip().lower() for line in f if line.strip() and len(line.strip()) > 1}
-            SENSITIVE_WORDS.update(words)
-        print(f"Successfully loaded {len(SENSITIVE_WORDS)} sensitive words.")
-    except Exception as e:
-        print(f"ERROR: Failed to load sensitive words file: {e}")
-        SENSITIVE_WORDS.clear()
+def words_file_version(data):
+    """
+    词典版本：文件内容的哈希
+    """
+    return hashlib.sha1(data).hexdigest()[:12]
 
 
 #  构建词典字典树
@@ -53,35 +89,831 @@ def build_trie(sensitive_words):
     return root
 
 
-load_sensitive_words()  # 应用启动时加载敏感词
-TRIE_ROOT = build_trie(SENSITIVE_WORDS)  # 构建字典树
-# 初级审查：正则表达式规则
+def trie_search(root, text):
+    """
+    逐位置重启的字典树匹配（旧实现），最坏 O(n·m)。
+    保留用于与 Aho-Corasick 自动机做性能对比。
+    返回第一个命中的 (start, end)，未命中返回 None。
+    """
+    for i in range(len(text)):
+        node = root
+        j = i
+        while j < len(text) and text[j] in node.children:
+            node = node.children[text[j]]
+            if node.is_end:
+                return i, j + 1
+            j += 1
+    return None
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick 多模式匹配自动机。
+    在字典树上补充失败指针，扫描文本时不回退，一遍线性完成匹配。
+    状态用整数编号，goto / fail / output 三张表均以状态编号为下标。
+    除敏感词外，还可以挂载带标记的触发词（tag），供正则规则在同一遍扫描中使用。
+    """
+
+    def __init__(self, words, tagged=()):
+        self.goto = [{}]  # 状态转移：goto[state][char] -> state
+        self.fail = [0]  # 失败指针
+        self.output = [()]  # 在该状态结束的模式 ((长度, tag), ...)，沿失败链合并；敏感词的 tag 为 None
+        self.max_length = 0  # 最长模式的长度
+        for word in words:
+            self._add_word(word, None)
+        for word, tag in tagged:
+            self._add_word(word, tag)
+        self._build_fail_links()
+
+    def _add_word(self, word, tag):
+        state = 0
+        for char in word:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(())
+                self.goto[state][char] = next_state
+            state = next_state
+        if state:
+            self.output[state] += ((len(word), tag),)
+            self.max_length = max(self.max_length, len(word))
+
+    def _build_fail_links(self):
+        """
+        按层序（BFS）计算失败指针，同时把失败链上的命中合并到当前状态。
+        """
+        goto, fail, output = self.goto, self.fail, self.output
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in goto[state].items():
+                queue.append(child)
+                f = fail[state]
+                while f and char not in goto[f]:
+                    f = fail[f]
+                fail[child] = goto[f].get(char, 0)
+                output[child] += output[fail[child]]
+
+    def __len__(self):
+        return len(self.goto)
+
+    @property
+    def has_output(self):
+        return self.output
+
+    def outputs(self, state):
+        return self.output[state]
+
+    def step(self, state, char):
+        """
+        状态转移：沿失败链查找 char 的出边
+        """
+        goto, fail = self.goto, self.fail
+        while state and char not in goto[state]:
+            state = fail[state]
+        return goto[state].get(char, 0)
+
+    def search(self, text):
+        """
+        线性扫描文本，返回第一个命中的 (start, end)，未命中返回 None。
+        """
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                return i + 1 - output[state][0][0], i + 1
+        return None
+
+
+# 命中记录：位置 [start, end)、优先级（越小越优先）、提示信息、命中的敏感词（规则命中时为 None）
+Hit = namedtuple('Hit', ['start', 'end', 'priority', 'message', 'word'])
+# 正则规则：triggers 为规则命中时文本中必然出现的小写字面量，
+# 由自动机在同一遍扫描中发现触发词后，再在触发位置做锚定匹配确认；
+# 没有触发词的规则会合并成一个正则，只额外扫描一遍
+RegexRule = namedtuple('RegexRule', ['pattern', 'message', 'priority', 'triggers'])
+
+WORD_PRIORITY = 0  # 敏感词优先级最高
+# 重复字符规则，等价于原正则 (.)\1{5,}：连续 6 个相同字符即命中，在扫描循环中计数
+REPEAT_CHAR_LIMIT = 6
+REPEAT_CHAR_PRIORITY = 1
+REPEAT_CHAR_MESSAGE = "包含了过多的重复字符。"
+
+
+def _match_start(gaps, end, length):
+    """
+    以 end 结尾、包含 length 个有效字符（不计扫描时跳过的区间 gaps）的命中的起点
+    """
+    start = end - length
+    for gap_start, gap_end in reversed(gaps):
+        if gap_end <= start:
+            break
+        start -= gap_end - gap_start
+    return start
+
+
+def _matched_word(text, gaps, start, end):
+    """
+    命中的敏感词（归一化后）：去掉跳过的区间，单词之间的分隔符显示为空格
+    """
+    pieces = []
+    for gap_start, gap_end in gaps:
+        if gap_end <= start:
+            continue
+        if gap_start >= end:
+            break
+        pieces.append(text[start:gap_start])
+        start = gap_end
+    pieces.append(text[start:end])
+    return ''.join(pieces).translate(FOLD_TABLE).replace(BREAK, ' ')
+
+
+def _separator_run(text, start, gaps):
+    """
+    处理从 start 开始的一段连续的分隔符和零宽字符（规则与 normalization.fold_separators 一致）：
+    扫描时跳过的区间追加到 gaps，返回 (片段终点, 保留为 BREAK 的分隔符的位置，整段跳过时为 -1)
+    """
+    length = len(text)
+    end = start + 1
+    while end < length and text[end] in MARKER_SET:
+        end += 1
+    first_break = next((index for index in range(start, end) if text[index] in SEPARATOR_SET), -1)
+    if first_break >= 0 and start and end < length:
+        before, after = text[start - 1], text[end]
+        if (before != '\n' and after != '\n'
+                and (start == 1 or text[start - 2] in BOUNDARY_SET)
+                and (end + 1 == length or text[end + 1] in BOUNDARY_SET)
+                or is_cjk(before) and is_cjk(after)):
+            # 两侧都是单个字符或都是汉字：整段跳过
+            first_break = -1
+    if first_break < 0:
+        gaps.append((start, end))
+        return end, -1
+    if first_break > start:
+        gaps.append((start, first_break))
+    if end > first_break + 1:
+        gaps.append((first_break + 1, end))
+    return end, first_break
+
+
+# 状态转移缓存中的特殊值：分隔符、零宽字符；有命中的状态 state 编码为 OUTPUT_BASE - state
+SEPARATOR = -1
+ZERO_WIDTH = -2
+OUTPUT_BASE = -2
+BREAK_CODE = -1  # 保留的 BREAK 在缓存中的键
+NEWLINE_CODE = ord('\n')
+# 按本机字节序编码为 UTF-32 后可以直接以码位数组遍历，比逐个取字符再查字典快
+CODE_POINTS_ENCODING = 'utf-32-le' if sys.byteorder == 'little' else 'utf-32-be'
+
+
+class TransitionCache:
+    """
+    状态转移缓存：rows[state] 是 {码位: 下一状态} 的字典，扫描时每个字符只做一次字典查找。
+    未缓存时才查询归一化转换表并调用自动机的 step（沿失败链查找、预编译文件中二分查找）。
+    有命中的下一状态编码为负数，无命中时只需比较一次正负；
+    保留的 BREAK 的转移在新建缓存行时预先填入键 BREAK_CODE 下，扫描时不必处理缺失
+    """
+
+    def __init__(self, automaton):
+        self.automaton = automaton
+        self.rows = [None] * len(automaton)
+        self.size = 0
+        self._add_row(0)
+
+    def transition(self, state, code):
+        folded = FOLD_TABLE.get(code, chr(code))
+        if folded == BREAK:
+            value = SEPARATOR
+        elif folded == SKIP:
+            value = ZERO_WIDTH
+        else:
+            value = self._step(state, folded)
+        self.rows[state][code] = value
+        self.size += 1
+        return value
+
+    def _step(self, state, folded):
+        next_state = self.automaton.step(state, folded)
+        if self.rows[next_state] is None:
+            self._add_row(next_state)
+        return OUTPUT_BASE - next_state if self.automaton.has_output[next_state] else next_state
+
+    def _add_row(self, state):
+        row = self.rows[state] = {}
+        row[BREAK_CODE] = self._step(state, BREAK)
+        self.size += 1
+
+
+class ModerationEngine:
+    """
+    组合规则引擎：敏感词、重复字符和正则规则在同一遍扫描中给出命中，
+    按优先级取最先命中的结果，命中最高优先级时立即提前退出。
+    """
+
+    def __init__(self, words, rules, version='', automaton=None):
+        self.version = version  # 构建时使用的词典版本
+        self.rules = list(rules)
+        if automaton is None:
+            triggers = [(fold_word(trigger), rule) for rule in self.rules for trigger in rule.triggers]
+            automaton = AhoCorasick(words, triggers)
+        # 内存中的 AhoCorasick 或映射预编译文件的 MappedAutomaton
+        self.automaton = automaton
+        self.transitions = TransitionCache(automaton)
+        self.top_priority = min([WORD_PRIORITY, REPEAT_CHAR_PRIORITY] + [rule.priority for rule in self.rules])
+        # 没有触发词的规则合并为一个带命名分组的正则（规则中不要使用编号反向引用）
+        self.untriggered = [rule for rule in self.rules if not rule.triggers]
+        self.untriggered_pattern = None
+        if self.untriggered:
+            self.untriggered_pattern = re.compile('|'.join(
+                f'(?P<r{index}>{rule.pattern.pattern})' for index, rule in enumerate(self.untriggered)
+            ))
+
+    def scan(self, text, first_only=True):
+        """
+        扫描文本，返回命中列表。
+        first_only 为 True 时只返回优先级最高的第一个命中（用于审核判定），
+        为 False 时返回全部命中（用于展示命中位置）。
+        字符的归一化由状态转移缓存完成，遇到分隔符和零宽字符时才按上下文决定跳过还是作为 BREAK 参与匹配，
+        跳过的区间记录在 gaps 中，命中位置仍对应原文。
+        """
+        lowered = text.lower()
+        # 正则规则在原文上确认，lower() 改变长度的极少数情况下退回到小写文本以保证下标一致
+        raw = text if len(lowered) == len(text) else lowered
+        outputs = self.automaton.outputs
+        transitions = self.transitions
+        rows, transition = transitions.rows, transitions.transition
+        top_priority = self.top_priority
+        hits = []
+        best = None
+        gaps = []  # 扫描时跳过的区间 [start, end)
+
+        state = 0
+        row = rows[0]
+        previous = None
+        run = 0
+        run_start = 0
+        run_end = 0  # 已处理的分隔符片段的终点
+        break_at = -1  # 该片段中保留为 BREAK 的分隔符的位置
+        last = len(lowered) - 1
+        code_points = memoryview(lowered.encode(CODE_POINTS_ENCODING, 'surrogatepass')).cast('I')
+        for i, char in enumerate(code_points):
+            try:
+                next_state = row[char]
+            except KeyError:
+                next_state = transition(state, char)
+            if next_state < 0:
+                # 分隔符不受 lower() 影响，按原字符参与重复字符计数，只有保留的 BREAK 参与敏感词匹配
+                if next_state == SEPARATOR:
+                    if i < run_end:
+                        if i == break_at:
+                            next_state = row[BREAK_CODE]
+                    elif 0 < i < last and lowered[i + 1] not in MARKER_SET:
+                        # 最常见的情况：单个分隔符。两侧都是单个字符或都是汉字时跳过，否则保留为 BREAK
+                        before = lowered[i - 1]
+                        after = lowered[i + 1]
+                        if (i > 1 and lowered[i - 2] not in BOUNDARY_SET or i < last - 1 and lowered[i + 2] not in BOUNDARY_SET
+                                or before == '\n' or after == '\n'):
+                            skip = before >= CJK_START and is_cjk(before) and is_cjk(after)
+                        else:
+                            skip = True
+                        if skip:
+                            gaps.append((i, i + 1))
+                        else:
+                            next_state = row[BREAK_CODE]
+                    else:
+                        run_end, break_at = _separator_run(lowered, i, gaps)
+                        if i == break_at:
+                            next_state = row[BREAK_CODE]
+                elif next_state == ZERO_WIDTH:
+                    # 零宽字符完全忽略
+                    if i >= run_end:
+                        run_end, break_at = _separator_run(lowered, i, gaps)
+                    continue
+
+            # 1. 重复字符计数（与 . 一致，不统计换行）
+            if char == previous:
+                run += 1
+                if run >= REPEAT_CHAR_LIMIT and char != NEWLINE_CODE:
+                    if run == REPEAT_CHAR_LIMIT:
+                        hit = Hit(run_start, i + 1, REPEAT_CHAR_PRIORITY, REPEAT_CHAR_MESSAGE, None)
+                        if not first_only:
+                            hits.append(hit)
+                        elif best is None or hit.priority < best.priority:
+                            best = hit
+                    elif not first_only:
+                        # 同一段重复字符只记一次命中，延长它的结束位置
+                        for index in range(len(hits) - 1, -1, -1):
+                            if hits[index].priority == REPEAT_CHAR_PRIORITY and hits[index].start == run_start:
+                                hits[index] = hits[index]._replace(end=i + 1)
+                                break
+            else:
+                previous = char
+                run = 1
+                run_start = i
+
+            # 2. 自动机状态转移：敏感词与正则触发词
+            if next_state >= 0:
+                state = next_state
+                row = rows[state]
+            elif next_state < OUTPUT_BASE:
+                state = OUTPUT_BASE - next_state
+                row = rows[state]
+                for length, rule in outputs(state):
+                    start = _match_start(gaps, i + 1, length) if gaps else i + 1 - length
+                    if rule is None:
+                        hit = Hit(start, i + 1, WORD_PRIORITY, None, _matched_word(lowered, gaps, start, i + 1))
+                    else:
+                        if first_only and best is not None and best.priority <= rule.priority:
+                            continue
+                        match = rule.pattern.match(raw, start)
+                        if not match:
+                            continue
+                        hit = Hit(match.start(), match.end(), rule.priority, rule.message, None)
+                    if not first_only:
+                        hits.append(hit)
+                    elif best is None or hit.priority < best.priority:
+                        best = hit
+                        if best.priority == top_priority:
+                            # 命中最高优先级，提前退出
+                            self._limit_transitions()
+                            return [best]
+
+        self._limit_transitions()
+        # 3. 没有触发词的规则，合并后只扫描一遍
+        if self.untriggered_pattern is not None:
+            for match in self.untriggered_pattern.finditer(raw):
+                rule = self.untriggered[int(match.lastgroup[1:])]
+                if first_only and best is not None and best.priority <= rule.priority:
+                    continue
+                hit = Hit(match.start(), match.end(), rule.priority, rule.message, None)
+                if not first_only:
+                    hits.append(hit)
+                elif best is None or hit.priority < best.priority:
+                    best = hit
+
+        if first_only:
+            return [best] if best else []
+        return sorted(hits, key=lambda h: (h.start, h.priority))
+
+    def _limit_transitions(self):
+        """
+        缓存的状态转移数超过 MODERATION_TRANSITION_CACHE_SIZE 时换一个空缓存，避免内存无限增长
+        """
+        if self.transitions.size > MODERATION_TRANSITION_CACHE_SIZE:
+            self.transitions = TransitionCache(self.automaton)
+
+
+# 初级审查：正则表达式规则（重复字符规则在扫描循环中计数，不再单独写正则）
 REGEX_RULES = [
-    (re.compile(r'(.)\1{5,}'), "包含了过多的重复字符。"),
-    (re.compile(r'http[s]?://[a-zA-Z0-9\-\.]+\.[a-zA-Z]{2,}(?:\S*)'), "包含了外部链接。"),
+    RegexRule(re.compile(r'http[s]?://[a-zA-Z0-9\-\.]+\.[a-zA-Z]{2,}(?:\S*)'), "包含了外部链接。", 2, ('http',)),
 ]
 
 
+def _watched_mtimes():
+    """
+    词典文件与预编译文件的修改时间，任一变化都会触发热加载
+    """
+    mtimes = []
+    for path in (SENSITIVE_WORDS_FILE_PATH, SENSITIVE_WORDS_AUTOMATON_PATH):
+        try:
+            mtimes.append(os.stat(path).st_mtime if path else None)
+        except OSError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
+
+def build_engine(path):
+    """
+    根据词典文件构建审核引擎，返回 (engine, words)。
+    存在与词典版本、规则一致的预编译文件时直接映射，不再在内存中重建自动机。
+    """
+    with open(path, 'rb') as f:
+        version = words_file_version(f.read())
+    automaton = load_compiled_automaton(SENSITIVE_WORDS_AUTOMATON_PATH, version, REGEX_RULES)
+    if automaton is not None:
+        return ModerationEngine((), REGEX_RULES, version, automaton), set()
+    words, version = read_sensitive_words(path)
+    return ModerationEngine(words, REGEX_RULES, version), words
+
+
+def _install_engine(engine, words, started):
+    """
+    替换当前使用的引擎。
+    引擎构建完成后才通过一次赋值替换全局引用，进行中的请求继续持有旧引擎，不会看到构建到一半的自动机。
+    """
+    global ENGINE, SENSITIVE_WORDS
+    ENGINE = engine
+    SENSITIVE_WORDS = words
+    mapped = isinstance(engine.automaton, MappedAutomaton)
+    MODERATION_METRICS.update(
+        word_count=engine.automaton.word_count if mapped else len(words),
+        automaton_states=len(engine.automaton),
+        automaton_mode='mmap' if mapped else 'memory',
+        version=engine.version,
+        reload_seconds=round(time.perf_counter() - started, 4),
+        loaded_at=time.strftime('%Y-%m-%d %H:%M:%S'),
+    )
+
+
+def load_sensitive_words():
+    """
+    从文件中加载敏感词词典，并构建组合规则引擎。
+    首次审核时由 get_engine() 调用，服务进程在 BlogConfig.ready() 中预先调用。
+    """
+    global _words_mtime, _last_check
+    started = time.perf_counter()
+    _words_mtime = _watched_mtimes()
+    _last_check = time.monotonic()
+    if not SENSITIVE_WORDS_FILE_PATH or not os.path.exists(SENSITIVE_WORDS_FILE_PATH):
+        logger.warning("警告：未找到敏感词文件。内容审核将不太有效!")
+        _install_engine(ModerationEngine((), REGEX_RULES), set(), started)
+        return
+
+    try:
+        engine, words = build_engine(SENSITIVE_WORDS_FILE_PATH)
+        if isinstance(engine.automaton, MappedAutomaton):
+            logger.info("Mapped compiled sensitive words automaton (%d states).", len(engine.automaton))
+        else:
+            logger.info("Successfully loaded %d sensitive words.", len(words))
+        _install_engine(engine, words, started)
+    except Exception as e:
+        logger.error("Failed to load sensitive words file: %s", e)
+        _install_engine(ModerationEngine((), REGEX_RULES), set(), started)
+
+
+_init_lock = threading.Lock()
+_reload_lock = threading.Lock()
+_words_mtime = None
+_last_check = 0.0
+
+
+def _reload(mtime):
+    global _words_mtime
+    try:
+        start = time.perf_counter()
+        engine, words = build_engine(SENSITIVE_WORDS_FILE_PATH)
+        if engine.version != ENGINE.version or type(engine.automaton) is not type(ENGINE.automaton):
+            _install_engine(engine, words, start)
+            MODERATION_METRICS['reload_count'] += 1
+            MODERATION_METRICS['last_error'] = ''
+            logger.info("Reloaded sensitive words (version %s, %s).", engine.version, MODERATION_METRICS['automaton_mode'])
+        _words_mtime = mtime
+    except Exception as e:
+        # 热加载失败时保留旧引擎继续工作
+        MODERATION_METRICS['last_error'] = str(e)
+        logger.error("Failed to reload sensitive words file: %s", e)
+    finally:
+        _reload_lock.release()
+
+
+def reload_sensitive_words(background=True):
+    """
+    重新加载敏感词词典并原子替换引擎。
+    background 为 True 时在后台线程中构建，不阻塞当前请求。
+    已有重建任务在进行时直接返回 False。
+    """
+    if not SENSITIVE_WORDS_FILE_PATH or not _reload_lock.acquire(blocking=False):
+        return False
+    mtime = _watched_mtimes()
+    if background:
+        threading.Thread(target=_reload, args=(mtime,), name='sensitive-words-reload', daemon=True).start()
+    else:
+        _reload(mtime)
+    return True
+
+
+def get_engine():
+    """
+    获取当前的审核引擎。
+    首次调用时加载词典并构建引擎（导入本模块不做任何加载）；
+    之后每隔 SENSITIVE_WORDS_CHECK_INTERVAL 秒检查一次词典文件的修改时间，
+    文件有变化时在后台重建引擎，本次请求仍使用旧引擎。
+    """
+    global _last_check
+    if ENGINE is None:
+        with _init_lock:
+            if ENGINE is None:
+                load_sensitive_words()
+        return ENGINE
+    now = time.monotonic()
+    if now - _last_check >= SENSITIVE_WORDS_CHECK_INTERVAL:
+        _last_check = now
+        if _watched_mtimes() != _words_mtime:
+            reload_sensitive_words()
+    return ENGINE
+
+
+def rules_version():
+    """
+    规则版本：正则规则、重复字符规则参数与归一化转换表的哈希，规则变化后审核结果缓存随之失效
+    """
+    data = repr([
+        (rule.pattern.pattern, rule.message, rule.priority, rule.triggers) for rule in REGEX_RULES
+    ] + [REPEAT_CHAR_LIMIT, NORMALIZATION_VERSION]).encode('utf-8')
+    return hashlib.sha1(data).hexdigest()[:8]
+
+
+def moderation_version():
+    """
+    审核版本：词典版本 + 规则版本 + 模型版本，用作审核结果缓存键的一部分
+    """
+    return f'{get_engine().version}-{rules_version()}-{model_version()}'
+
+
+RESULT_CACHE = ModerationResultCache()  # 审核结果缓存
+MODERATION_STATS = ModerationStats()  # 各规则的命中次数与命中时的扫描耗时
+
+
+def moderation_metrics():
+    """
+    返回词典热加载、结果缓存、各规则命中次数与命中时的扫描耗时、模型推理耗时的运行指标
+    """
+    return {**MODERATION_METRICS, **RESULT_CACHE.stats(), 'stats': MODERATION_STATS.snapshot()}
+
+
+def _scan(text, first_only=True):
+    """
+    规则扫描，并记录耗时和命中的规则
+    """
+    start = time.perf_counter()
+    hits = get_engine().scan(text, first_only=first_only)
+    MODERATION_STATS.observe_scan(len(text), time.perf_counter() - start, hits)
+    return hits
+
+
+def _classify(texts):
+    """
+    模型审查，并记录推理耗时和判定不规范的条数
+    """
+    if not texts or get_classifier() is None:
+        return classify_many(texts)
+    start = time.perf_counter()
+    results = classify_many(texts)
+    MODERATION_STATS.observe_model(time.perf_counter() - start, sum(1 for is_safe, _ in results if not is_safe))
+    return results
+
+
 def moderate_content(text: str) -> Tuple[bool, str]:
     """
     内容审查主函数，负责调用各级审查策略。
-    返回 (is_safe, message)。
+    返回 (is_safe, message)。相同文本在同一审核版本下的结果会被缓存，不会重复扫描。
     Args:
         text (str): 用户输入的文本。
     Returns:
         tuple: (True, "") 如果内容规范；(False, "原因") 如果内容不规范。
     """
+    version = moderation_version()
+    result = RESULT_CACHE.get(text, version)
+    if result is None:
+        result = _moderate(text)
+        RESULT_CACHE.set(text, version, result)
+    return result
+
+
+# 向变化区间两侧扩展查找 URL 等不含空白的片段时，最多扩展的字符数
+EDIT_TOKEN_LIMIT = 2048
+_TOKEN_TAIL = re.compile(r'\S+\Z')
+_TOKEN_HEAD = re.compile(r'\S+')
+
+
+def _common_prefix_length(a, b):
+    """
+    两个字符串公共前缀的长度。二分查找 + 切片比较，比较在 C 层完成
+    """
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _common_suffix_length(a, b, limit):
+    low, high = 0, min(len(a), len(b), limit)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:] == b[len(b) - middle:]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def changed_region(old_text, new_text):
+    """
+    返回新文本中相对旧文本发生变化的区间 [start, end)。
+    只剥离公共前缀和公共后缀，多处修改时区间覆盖第一处到最后一处修改。
+    """
+    prefix = _common_prefix_length(old_text, new_text)
+    suffix = _common_suffix_length(old_text, new_text, min(len(old_text), len(new_text)) - prefix)
+    return prefix, len(new_text) - suffix
+
+
+def _extend_to_tokens(text, low, high):
+    """
+    把区间 [low, high) 向两侧扩展到所在的非空白片段边界（最多各扩展 EDIT_TOKEN_LIMIT 个字符）
+    """
+    tail = _TOKEN_TAIL.search(text, max(0, low - EDIT_TOKEN_LIMIT), low)
+    if tail:
+        low = tail.start()
+    head = _TOKEN_HEAD.match(text, high, min(len(text), high + EDIT_TOKEN_LIMIT))
+    if head:
+        high = head.end()
+    return low, high
+
+
+def _overlap_window():
+    """
+    跨边界的命中最多包含多少个有效字符：最长敏感词或重复字符规则的长度减一
+    """
+    return max(get_engine().automaton.max_length, REPEAT_CHAR_LIMIT) - 1
+
+
+def _window_start(text, position, window):
+    """
+    position 之前 window 个有效字符的起点，扫描时跳过的分隔符不计数（最多回退 EDIT_TOKEN_LIMIT 个字符）
+    """
+    low = max(0, position - window - EDIT_TOKEN_LIMIT)
+    folded = fold_text(text[low:position])
+    if len(folded) != position - low:
+        return max(0, position - window)
+    index = len(folded)
+    while index and window:
+        index -= 1
+        if folded[index] not in (SKIP, BREAK):
+            window -= 1
+    return low + index
+
+
+def _window_end(text, position, window):
+    """
+    position 之后 window 个有效字符的终点，与 _window_start 对称
+    """
+    high = min(len(text), position + window + EDIT_TOKEN_LIMIT)
+    folded = fold_text(text[position:high])
+    if len(folded) != high - position:
+        return min(len(text), position + window)
+    index = 0
+    while index < len(folded) and window:
+        if folded[index] not in (SKIP, BREAK):
+            window -= 1
+        index += 1
+    return position + index
+
+
+def edit_scope(approved_text: str, new_text: str, approved_version: str = '') -> str:
+    """
+    编辑后需要重新审核的文本片段。
+    approved_text 是上次审核通过的文本，approved_version 是当时的审核版本；
+    版本一致时只取发生变化的区间，两侧各扩展一个重叠窗口，
+    并扩展到所在的非空白片段边界，保证跨越修改边界的敏感词和链接都能被发现。
+    版本不一致（词典或规则已更新）时返回全文；没有需要审核的部分时返回空字符串。
+    """
+    if not approved_text or not approved_version or approved_version != moderation_version():
+        return new_text
 
+    start, end = changed_region(approved_text, new_text)
+    if start >= end:
+        # 只删除了内容或完全没有修改，剩余部分都已审核通过
+        if len(new_text) == len(approved_text) or start == 0 or start >= len(new_text):
+            return ''
+        end = start
+
+    window = _overlap_window()
+    low, high = _extend_to_tokens(new_text, _window_start(new_text, start, window), _window_end(new_text, end, window))
+    return new_text[low:high]
+
+
+def moderate_edit(approved_text: str, new_text: str, approved_version: str = '') -> Tuple[bool, str]:
+    """
+    增量审核编辑后的文本，只扫描 edit_scope() 给出的片段
+    """
+    scope = edit_scope(approved_text, new_text, approved_version)
+    if not scope:
+        return True, ""
+    return moderate_content(scope)
+
+
+# 批量审核的结果：是否规范、原因、命中列表（Hit，位置相对于该字段）
+ModerationResult = namedtuple('ModerationResult', ['is_safe', 'message', 'hits'])
+# 批量审核时字段之间的分隔符：敏感词不含换行，自动机会回到根状态，链接规则的 \S* 也会在此停止
+FIELD_SEPARATOR = '\n'
+
+
+def _result_from_hits(hits):
+    """
+    按规则优先级从命中列表中选出判定结果
+    """
+    if not hits:
+        return ModerationResult(True, "", [])
+    return ModerationResult(False, hit_message(min(hits, key=lambda h: (h.priority, h.start))), hits)
+
+
+def moderate_many(texts) -> List[ModerationResult]:
+    """
+    批量审核多个字段（如标题 + 正文），返回与 texts 一一对应的 ModerationResult。
+    所有字段拼接后由自动机一遍扫描，再按字段切分命中；
+    结果缓存中已判定为规范的字段直接跳过。
+    """
+    texts = list(texts)
+    version = moderation_version()
+    results = [None] * len(texts)
+    pending = []
+    for index, text in enumerate(texts):
+        cached = RESULT_CACHE.get(text, version)
+        if cached is not None and cached[0]:
+            results[index] = ModerationResult(True, "", [])
+        else:
+            pending.append(index)
+    if not pending:
+        return results
+
+    for index, result in zip(pending, scan_fields([texts[index] for index in pending])):
+        results[index] = result
+        RESULT_CACHE.set(texts[index], version, (result.is_safe, result.message))
+    return results
+
+
+def scan_fields(texts) -> List[ModerationResult]:
+    """
+    不经过结果缓存批量审核多个字段：拼接后由自动机一遍扫描，按字段切分命中，
+    规则没有命中的字段再批量交给模型做高级审查
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    hits = _scan(FIELD_SEPARATOR.join(texts), first_only=False)
+    field_hits = [[] for _ in texts]
+    offset = 0
+    bounds = []
+    for text in texts:
+        bounds.append((offset, offset + len(text)))
+        offset += len(text) + len(FIELD_SEPARATOR)
+    position = 0
+    for hit in hits:
+        while hit.start >= bounds[position][1] + len(FIELD_SEPARATOR):
+            position += 1
+        start, end = bounds[position]
+        field_hits[position].append(hit._replace(start=hit.start - start, end=min(hit.end, end) - start))
+    results = [_result_from_hits(field) for field in field_hits]
+
+    inconclusive = [index for index, result in enumerate(results) if result.is_safe]
+    for index, (is_safe, message) in zip(inconclusive, _classify([texts[index] for index in inconclusive])):
+        if not is_safe:
+            results[index] = ModerationResult(False, message, [])
+    return results
+
+
+def moderate_stream(chunks, first_only=True) -> ModerationResult:
+    """
+    分块审核超长文本，chunks 为依次产生的文本片段（如文件按块读取）。
+    每块与上一块末尾的重叠窗口拼接后扫描，内存只与块大小有关；
+    first_only 为 True 时遇到第一个不规范的块立即停止。
+    """
+    window = _overlap_window()
+    carry = ''
+    offset = 0  # carry 在整个文本中的起始位置
+    seen = set()
+    hits = []
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffer = carry + chunk
+        for hit in _scan(buffer, first_only=first_only):
+            # 完全落在重叠窗口中的命中已经在上一块报告过
+            if hit.end <= len(carry) or (offset + hit.start, hit.priority) in seen:
+                continue
+            seen.add((offset + hit.start, hit.priority))
+            hits.append(hit._replace(start=offset + hit.start, end=offset + hit.end))
+        if first_only and hits:
+            break
+        low, _ = _extend_to_tokens(buffer, _window_start(buffer, len(buffer), window), len(buffer))
+        offset += low
+        carry = buffer[low:]
+        seen = {key for key in seen if key[0] >= offset}
+    return _result_from_hits(hits)
+
+
+def _moderate(text: str) -> Tuple[bool, str]:
+    """
+    依次执行各级审查，不经过缓存
+    """
     # 1. 初级审查（规则匹配）
     is_safe, message = primary_moderation(text)
     if not is_safe:
         return False, message
 
-    # # 2. 高级审查（机器学习） - 待实现
-    # is_safe, message = advanced_moderation(text)
-    # if not is_safe:
-    #     return False, message
-    #
+    # 2. 高级审查（机器学习），只在规则匹配没有结论时运行
+    is_safe, message = advanced_moderation(text)
+    if not is_safe:
+        return False, message
+
     # # 3. 第三方API接口集成 - 待实现
     # is_safe, message = third_party_api_moderation(text)
     # if not is_safe:
@@ -94,29 +926,49 @@ def moderate_content(text: str) -> Tuple[bool, str]:
 def primary_moderation(text: str) -> Tuple[bool, str]:
     """
     初级审查，基于敏感词和正则表达式进行匹配。
+    敏感词和各条规则在一遍扫描中完成，命中时按规则优先级返回原因。
     """
-    text_lower = text.lower()
-    # 遍历文本，从每个字符开始尝试匹配敏感词
-    for i in range(len(text_lower)):
-        node = TRIE_ROOT
-        j = i
-        while j < len(text_lower) and text_lower[j] in node.children:
-            node = node.children[text_lower[j]]
-            if node.is_end:
-                # 找到敏感词，返回匹配的词语
-                matched_word = text_lower[i:j + 1]
-                print(f"contains sensitive word: {matched_word}")
-                return False, f"文字含有敏感词：{matched_word}"
-            j += 1
+    hits = _scan(text)
+    if not hits:
+        return True, ""
+    return False, hit_message(hits[0])
 
-    for regex, message in REGEX_RULES:
-        if regex.search(text):
-            return False, message
 
-    return True, ""
+def hit_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    文本中全部命中的区间（重叠的区间合并），用于审核详情页高亮
+    """
+    spans = []
+    for hit in get_engine().scan(text, first_only=False):
+        if spans and hit.start <= spans[-1][1]:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], hit.end))
+        else:
+            spans.append((hit.start, hit.end))
+    return spans
+
+
+def hit_message(hit) -> str:
+    """
+    命中对应的审核原因
+    """
+    if hit.word is not None:
+        logger.debug("contains sensitive word: %s", hit.word)
+        return f"文字含有敏感词：{hit.word}"
+    return hit.message
+
+
+def format_moderation_reason(fields) -> str:
+    """
+    把多个字段的审核结果拼成审核日志中的原因，fields 为 [(字段名, ModerationResult), ...]
+    """
+    return '; '.join(f'{label}审查: {result.message}' for label, result in fields)
+
 
 def advanced_moderation(text: str) -> Tuple[bool, str]:
-    pass
+    """
+    高级审查，使用本地训练的文本分类模型；没有可用模型时视为通过。
+    """
+    return _classify([text])[0]
 
 
 def third_party_api_moderation(text: str) -> Tuple[bool, str]:
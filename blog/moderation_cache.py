@@ -0,0 +1,108 @@
+"""
+审核结果缓存。
+
+以「规范化文本的哈希 + 审核版本」为键缓存 (is_safe, message)：
+进程内 LRU 在前，配置的 CACHES（django-redis）在后，相同的文本不会被重复扫描。
+审核版本包含词典版本和规则版本，词典或规则变化后旧缓存自然失效，无需手动清理。
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# 共享缓存的过期时间（秒）
+MODERATION_CACHE_TIMEOUT = getattr(settings, 'MODERATION_CACHE_TIMEOUT', 7 * 24 * 3600)
+# 进程内 LRU 的容量（条）
+MODERATION_LOCAL_CACHE_SIZE = getattr(settings, 'MODERATION_LOCAL_CACHE_SIZE', 1024)
+# 短文本扫描比访问一次 Redis 更快，只在进程内缓存
+MODERATION_SHARED_CACHE_MIN_LENGTH = getattr(settings, 'MODERATION_SHARED_CACHE_MIN_LENGTH', 256)
+
+
+class LocalLRUCache:
+    """
+    线程安全的进程内 LRU 缓存
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def normalize_text(text):
+    """
+    生成缓存键前的文本规范化：只统一换行符，不改变审核结果
+    """
+    return text.replace('\r\n', '\n')
+
+
+class ModerationResultCache:
+    """
+    两级审核结果缓存：进程内 LRU + 共享缓存。
+    共享缓存不可用时只记录日志，不影响审核本身。
+    """
+
+    def __init__(self, maxsize=MODERATION_LOCAL_CACHE_SIZE):
+        self.local = LocalLRUCache(maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text, version):
+        digest = hashlib.sha256(normalize_text(text).encode('utf-8', errors='surrogatepass')).hexdigest()
+        return f'moderation:result:{version}:{digest}'
+
+    def get(self, text, version):
+        key = self.make_key(text, version)
+        result = self.local.get(key)
+        if result is None and len(text) >= MODERATION_SHARED_CACHE_MIN_LENGTH:
+            try:
+                result = cache.get(key)
+            except Exception as e:
+                logger.warning("Moderation cache get failed: %s", e)
+            if result is not None:
+                result = tuple(result)
+                self.local.set(key, result)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def set(self, text, version, result):
+        key = self.make_key(text, version)
+        self.local.set(key, result)
+        if len(text) >= MODERATION_SHARED_CACHE_MIN_LENGTH:
+            try:
+                cache.set(key, result, MODERATION_CACHE_TIMEOUT)
+            except Exception as e:
+                logger.warning("Moderation cache set failed: %s", e)
+
+    def stats(self):
+        return {'cache_hits': self.hits, 'cache_misses': self.misses, 'cache_local_size': len(self.local)}
@@ -0,0 +1,156 @@
+"""
+审核运行统计。
+
+每个进程在内存中累计：
+    - 扫描次数、扫描字符数和耗时，得到线上的实际吞吐（字符/秒）；
+    - 按命中规则（敏感词、重复字符、各条正则规则，未命中记为「通过」）分组的命中次数和「命中该规则的扫描」的耗时直方图；
+    - 每个敏感词的命中次数和「命中该敏感词的扫描」的耗时直方图；单独统计耗时的敏感词最多 MODERATION_STATS_MAX_WORDS 个，
+      之后新出现的敏感词计入「其他敏感词」，避免词典很大时直方图无限增长；
+    - 模型批量推理的耗时直方图和判定不规范的条数。
+敏感词和各条规则在同一遍扫描中匹配，无法拆分各自的耗时：一次扫描的总耗时会计入它命中的每条规则和每个敏感词，
+这两组直方图反映的是「命中某规则时整次扫描有多慢」（例如长文本更容易命中），不是该规则本身的开销。
+通过 moderation_metrics() 暴露给审核后台的指标接口。
+"""
+import bisect
+import threading
+from collections import Counter
+
+from django.conf import settings
+
+# 指标接口中展示的命中最多的敏感词个数
+MODERATION_STATS_TOP_WORDS = getattr(settings, 'MODERATION_STATS_TOP_WORDS', 20)
+# 单独统计耗时直方图的敏感词个数上限
+MODERATION_STATS_MAX_WORDS = getattr(settings, 'MODERATION_STATS_MAX_WORDS', 200)
+# 耗时直方图的桶上界（毫秒）
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+WORD_LABEL = '敏感词'
+MODEL_LABEL = '模型'
+CLEAN_LABEL = '通过'
+OTHER_WORDS_LABEL = '其他敏感词'
+
+
+class LatencyHistogram:
+    """
+    固定分桶的耗时直方图，分位数按桶上界估算
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, seconds):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self):
+        buckets = {f'<={bound}ms': count for bound, count in zip(LATENCY_BUCKETS_MS, self.counts)}
+        buckets['+Inf'] = self.counts[-1]
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'p50_ms': self.quantile(0.5),
+            'p99_ms': self.quantile(0.99),
+            'max_ms': round(self.max_ms, 3),
+            'buckets': buckets,
+        }
+
+
+def hit_label(hit):
+    """
+    命中所属的规则名称
+    """
+    return WORD_LABEL if hit.word is not None else hit.message
+
+
+class ModerationStats:
+    """
+    线程安全的审核运行统计
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.scans = 0
+        self.scanned_chars = 0
+        self.scan_seconds = 0.0
+        self.rule_hits = Counter()
+        self.word_hits = Counter()
+        self.rule_scan_latency = {}  # 规则 -> 命中该规则的扫描的耗时
+        self.word_scan_latency = {}  # 敏感词 -> 命中该敏感词的扫描的耗时
+        self.model_latency = LatencyHistogram()
+
+    @staticmethod
+    def _observe(histograms, label, seconds):
+        histogram = histograms.get(label)
+        if histogram is None:
+            histogram = histograms[label] = LatencyHistogram()
+        histogram.observe(seconds)
+
+    def _observe_word_latency(self, word, seconds):
+        if word not in self.word_scan_latency and len(self.word_scan_latency) >= MODERATION_STATS_MAX_WORDS:
+            word = OTHER_WORDS_LABEL
+        self._observe(self.word_scan_latency, word, seconds)
+
+    def observe_scan(self, chars, seconds, hits):
+        """
+        记录一次规则扫描：整次扫描的耗时计入本次命中的每条规则（没有命中时计入「通过」）和每个命中的敏感词
+        """
+        labels = {hit_label(hit) for hit in hits} or {CLEAN_LABEL}
+        words = {hit.word for hit in hits if hit.word is not None}
+        with self._lock:
+            self.scans += 1
+            self.scanned_chars += chars
+            self.scan_seconds += seconds
+            for hit in hits:
+                self.rule_hits[hit_label(hit)] += 1
+                if hit.word is not None:
+                    self.word_hits[hit.word] += 1
+            for label in labels:
+                self._observe(self.rule_scan_latency, label, seconds)
+            for word in words:
+                self._observe_word_latency(word, seconds)
+
+    def observe_model(self, seconds, flagged):
+        """
+        记录一次批量模型推理，flagged 为判定不规范的条数
+        """
+        with self._lock:
+            self.model_latency.observe(seconds)
+            if flagged:
+                self.rule_hits[MODEL_LABEL] += flagged
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'scans': self.scans,
+                'scanned_chars': self.scanned_chars,
+                'chars_per_second': round(self.scanned_chars / self.scan_seconds) if self.scan_seconds else 0,
+                'rule_hits': dict(self.rule_hits),
+                'top_words': self.word_hits.most_common(MODERATION_STATS_TOP_WORDS),
+                'scan_latency_by_rule': {
+                    label: histogram.snapshot() for label, histogram in self.rule_scan_latency.items()
+                },
+                'scan_latency_by_word': {
+                    word: histogram.snapshot() for word, histogram in self.word_scan_latency.items()
+                },
+                'model_latency': self.model_latency.snapshot(),
+            }
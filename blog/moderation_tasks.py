@@ -0,0 +1,172 @@
+"""
+异步审核队列。
+
+开启 MODERATION_ASYNC 后，发表 / 编辑博客和发表评论只把内容写入 ModerationTask 表并立即返回，
+由 manage.py moderation_worker 在后台审核：通过则发布，不通过则创建 ModerationLog 等待人工审核。
+队列直接使用数据库，本地 SQLite 与线上 MySQL 都无需额外服务；
+多个 worker 通过 select_for_update(skip_locked=True) 领取任务，不会重复处理。
+超时的任务会被重新领取：发布与任务状态在同一事务中提交，并以领取次数作为凭证，
+原 worker 处理完时发现任务已被重新领取则回滚，不会重复发布；超时次数过多的任务标记为失败。
+"""
+import datetime
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Blog, BlogCategory, ModerationTask, User
+from .publishing import submit_blog, submit_comment
+
+logger = logging.getLogger(__name__)
+
+# 是否开启异步审核
+MODERATION_ASYNC = getattr(settings, 'MODERATION_ASYNC', False)
+# 处理中的任务超过该时间（秒）仍未完成，视为 worker 已退出，重新排队
+MODERATION_TASK_TIMEOUT = getattr(settings, 'MODERATION_TASK_TIMEOUT', 600)
+# 任务最多被领取的次数，超过后不再重试，标记为失败
+MODERATION_TASK_MAX_ATTEMPTS = getattr(settings, 'MODERATION_TASK_MAX_ATTEMPTS', 3)
+
+# 处理结果的响应码对应的任务状态
+RESULT_STATUS = {200: 'published', 202: 'flagged'}
+
+
+def enqueue_blog(author, title, content, category, blog=None):
+    """
+    提交博客审核任务，blog 不为空时为编辑已有博客
+    """
+    return ModerationTask.objects.create(kind='blog', author=author, payload={
+        'blog_id': blog.id if blog else None,
+        'title': title,
+        'content': content,
+        'category_id': category.id if category else None,
+    })
+
+
+def enqueue_comment(author, blog, content, parent_comment_id=None, reply_to_user_id=None):
+    """
+    提交评论审核任务
+    """
+    return ModerationTask.objects.create(kind='comment', author=author, payload={
+        'blog_id': blog.id,
+        'content': content,
+        'parent_comment_id': parent_comment_id,
+        'reply_to_user_id': reply_to_user_id,
+    })
+
+
+def claim_tasks(limit):
+    """
+    领取一批待处理任务并标记为处理中；超时未完成的任务会被重新领取，领取次数用完的标记为失败
+    """
+    now = timezone.now()
+    stale = now - datetime.timedelta(seconds=MODERATION_TASK_TIMEOUT)
+    with transaction.atomic():
+        ModerationTask.objects.filter(
+            status='processing', started_at__lt=stale, attempts__gte=MODERATION_TASK_MAX_ATTEMPTS
+        ).update(
+            status='failed', finished_at=now,
+            result={'code': 500, 'msg': f'审核任务超时 {MODERATION_TASK_MAX_ATTEMPTS} 次，已停止重试'},
+        )
+        tasks = list(
+            ModerationTask.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='pending') | Q(status='processing', started_at__lt=stale))
+            .order_by('created_at')[:limit]
+        )
+        ModerationTask.objects.filter(id__in=[task.id for task in tasks]).update(
+            status='processing', started_at=now, attempts=F('attempts') + 1
+        )
+    for task in tasks:
+        task.status = 'processing'
+        task.started_at = now
+        task.attempts += 1
+    return tasks
+
+
+def run_task(task):
+    """
+    审核并发布一个任务的内容，返回与同步模式相同的响应内容；已经发布过的任务直接返回上次的结果
+    """
+    if task.content_id is not None:
+        return task.result
+    payload = task.payload
+    if task.kind == 'blog':
+        category = BlogCategory.objects.filter(id=payload['category_id']).first()
+        if payload['blog_id'] is None:
+            return submit_blog(task.author, payload['title'], payload['content'], category)
+        blog = Blog.objects.filter(id=payload['blog_id']).first()
+        if blog is None:
+            return {'code': 404, 'msg': '博客不存在或已被删除'}
+        # 编辑以处理时数据库中的版本为基准，只审核修改过的部分
+        return submit_blog(
+            task.author, payload['title'], payload['content'], category,
+            blog=blog, approved_content=blog.content, approved_version=blog.moderated_version,
+        )
+    blog = Blog.objects.filter(id=payload['blog_id']).first()
+    if blog is None:
+        return {'code': 404, 'msg': '博客不存在或已被删除'}
+    return submit_comment(
+        task.author, blog, payload['content'], payload['parent_comment_id'], payload['reply_to_user_id']
+    )
+
+
+def published_content_id(result):
+    """
+    发布结果中新建的博客或评论的 ID
+    """
+    return result.get('data', {}).get('blog_id') or result.get('comment_id')
+
+
+def process_task(task):
+    """
+    处理一个任务并保存结果：发布和任务状态在同一事务中提交。
+    任务已被其他 worker 重新领取（领取次数变化）或已经完成时放弃处理，返回 None
+    """
+    with transaction.atomic():
+        current = ModerationTask.objects.select_for_update().filter(
+            id=task.id, status='processing', attempts=task.attempts
+        ).first()
+        if current is None:
+            logger.warning("Moderation task %s was reclaimed or finished elsewhere, skipped", task.id)
+            return None
+        task.content_id, task.result = current.content_id, current.result
+        try:
+            # 发布失败时只回滚发布的部分，任务仍记录为失败
+            with transaction.atomic():
+                result = run_task(task)
+        except Exception as e:
+            logger.exception("Moderation task %s failed", task.id)
+            result = {'code': 500, 'msg': f'服务器内部错误：{e}'}
+        task.result = result
+        task.content_id = task.content_id or published_content_id(result)
+        task.status = RESULT_STATUS.get(result.get('code'), 'failed')
+        task.finished_at = timezone.now()
+        task.save(update_fields=['result', 'content_id', 'status', 'finished_at'])
+    return task
+
+
+def process_pending(limit=20):
+    """
+    领取并处理一批任务，返回处理的任务数
+    """
+    tasks = claim_tasks(limit)
+    if tasks:
+        # 批量领取的任务作者一次查出
+        authors = User.objects.in_bulk({task.author_id for task in tasks})
+        for task in tasks:
+            task.author = authors[task.author_id]
+            process_task(task)
+    return len(tasks)
+
+
+def task_status(task):
+    """
+    任务状态的 JSON 表示，供前端轮询
+    """
+    return {
+        'task_id': task.id,
+        'status': task.status,
+        'status_display': task.get_status_display(),
+        'result': task.result,
+    }
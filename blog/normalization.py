@@ -0,0 +1,157 @@
+"""
+审核前的字符归一化。
+
+用户常用全角字符、零宽字符、繁体字和在词中插入标点 / 空格的方式绕过敏感词词典。
+这里预先构建一张 str.translate 转换表，逐字符替换：
+    - 全角 ASCII 转半角；
+    - 繁体等异体字转为常用简体（可通过 MODERATION_CHAR_VARIANTS 补充）；
+    - 零宽字符替换为占位符 SKIP，扫描时跳过；
+    - 分隔符（空格、标点）替换为 BREAK。
+归一化不改变文本长度，命中位置与原文一一对应，可以直接用于高亮。
+
+分隔符只在单字之间跳过：两侧都是汉字，或两侧都是单个字母 / 数字（如 s.e.x、f a 轮）；
+两侧是完整的英文单词时整段分隔符只保留第一个 BREAK，敏感词不会跨单词命中（如 is extremely 不会命中 sex），
+词典中的多词短语（如 fuck you）同样折叠为 BREAK，仍能命中。
+
+扫描时不对全文做 translate（汉字文本上它和扫描本身一样慢）：ModerationEngine 的状态转移缓存未命中时
+才查询转换表，每个 (状态, 字符) 只查一次；遇到分隔符时按上下文决定跳过还是保留 BREAK，不额外遍历文本。
+fold_separators 是同一规则的正则实现，敏感词词典加载时用它做同样的归一化（并去掉 SKIP），两边规则一致。
+"""
+import hashlib
+import re
+
+from django.conf import settings
+
+SKIP = '\x00'  # 扫描时跳过的字符
+BREAK = '\x01'  # 单词之间的分隔，参与匹配，连续的分隔符只保留第一个
+
+# 零宽及不可见字符
+ZERO_WIDTH_CHARS = (
+    '\u00ad\u034f\u061c\u115f\u1160\u180e\u200b\u200c\u200d\u200e\u200f'
+    '\u2060\u2061\u2062\u2063\u2064\ufeff'
+)
+# 插入在词中用于分隔的字符；换行不在其中，批量审核时用它分隔字段；
+# / 和 : 不在其中，避免链接中的单词被拼接
+SEPARATOR_CHARS = (
+    ' \t\r\x0b\x0c\u00a0\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a\u3000'
+    '.,;\'"`*_-~^|\\+=#'
+    '\u00b7\u2022\u30fb\u2027\u2219\u3001\uff0c\u3002\uff0e\uff1b\uff1a\u2018\u2019\u201c\u201d\ufe51\ufe52'
+)
+# 常见繁体字与简体字的对照，两两成对：繁简繁简……
+VARIANT_PAIRS = (
+    '萬万與与專专業业東东絲丝兩两嚴严喪丧個个豐丰臨临為为麗丽舉举義义烏乌樂乐習习鄉乡書书買买亂乱爭争'
+    '虧亏雲云亞亚產产親亲億亿僅仅從从倉仓儀仪們们價价眾众優优會会傘伞偉伟傳传傷伤倫伦偽伪體体餘余'
+    '俠侠偵侦側侧債债傾倾償偿兇凶黨党蘭兰關关興兴養养獸兽內内岡冈冊册寫写軍军農农衝冲決决況况凍冻'
+    '淨净涼凉減减幾几鳳凤憑凭凱凯擊击劃划劉刘則则剛刚創创刪删別别劑剂劍剑劇剧勸劝辦办務务動动勵励'
+    '勁劲勞劳勢势區区醫医華华協协單单賣卖衛卫卻却廠厂廳厅歷历厲厉壓压厭厌縣县參参雙双發发變变敘叙'
+    '號号嘆叹嚇吓嗎吗啟启員员問问團团園园圍围國国圖图圓圆聖圣場场壞坏塊块堅坚墳坟墜坠壺壶處处備备'
+    '頭头誇夸夾夹奪夺奮奋獎奖婦妇媽妈孫孙學学寧宁寶宝實实寵宠審审憲宪賓宾對对尋寻導导將将爾尔塵尘'
+    '嘗尝層层屆届屬属歲岁島岛嶺岭幣币帥帅師师帳帐帶带幫帮廣广莊庄慶庆應应廟庙開开異异棄弃張张彌弥'
+    '彎弯彈弹強强歸归當当錄录徹彻徑径後后憶忆懷怀態态總总戀恋惡恶惱恼悶闷驚惊慘惨懼惧憤愤願愿戲戏'
+    '戰战戶户撲扑執执擴扩掃扫揚扬擾扰撫抚搶抢護护報报擔担擬拟擁拥攔拦撥拨擇择掛挂擋挡撈捞損损換换'
+    '據据擲掷攜携搖摇攝摄擺摆擠挤敵敌數数齋斋斷断時时曠旷晝昼顯显晉晋曬晒曉晓暈晕暫暂術术機机殺杀'
+    '雜杂權权條条來来楊杨極极構构樞枢棗枣櫃柜標标棧栈欄栏樹树樣样橋桥檢检夢梦槍枪歡欢歐欧殘残毆殴'
+    '畢毕氣气漢汉湯汤溝沟沒没淚泪潑泼澤泽潔洁灑洒濁浊測测濟济瀏浏渾浑濃浓濤涛溫温滅灭燈灯靈灵災灾'
+    '爐炉點点煉炼爛烂燒烧熱热愛爱爺爷牽牵犧牺狀状猶犹獄狱獅狮獨独狹狭獲获豬猪貓猫瑪玛現现環环電电'
+    '畫画療疗瘋疯盜盗盤盘監监瞞瞒礦矿碼码磚砖確确禮礼禍祸離离種种積积穩稳窮穷竊窃競竞筆笔築筑簡简'
+    '籃篮類类糧粮緊紧紅红約约級级紀纪純纯紙纸紛纷細细終终組组結结絕绝給给統统經经綁绑綠绿網网維维'
+    '綜综緒绪線线練练縱纵縮缩績绩繩绳繼继續续罰罚罵骂羅罗聯联聲声聽听腦脑膽胆臉脸興兴艦舰艱艰藝艺'
+    '節节薦荐藥药蘇苏蟲虫蝦虾術术襲袭裝装製制複复覺觉覽览觀观規规視视親亲訂订計计討讨訓训記记許许'
+    '設设訪访證证評评識识詐诈訴诉診诊詞词該该詳详試试話话誠诚誘诱語语誤误說说誰谁課课調调談谈請请'
+    '論论諸诸謀谋謊谎謝谢謠谣講讲識识議议讓让讀读變变豈岂貝贝負负財财貢贡貨货販贩貪贪貫贯責责貴贵'
+    '買买貸贷費费貼贴賀贺資资賊贼賄贿賓宾賠赔賞赏賤贱賭赌賴赖賺赚購购賽赛贈赠趕赶趙赵躍跃蹤踪車车'
+    '軌轨軟软轉转輪轮輸输辦办辭辞農农邊边遞递遠远適适選选遺遗還还鄧邓鄭郑醜丑醫医釋释針针釣钓鈔钞'
+    '鈴铃鉛铅銀银銷销鋒锋鋼钢錢钱錯错鍋锅鍵键鎖锁鎮镇鏈链鏡镜鐘钟鐵铁鑰钥長长門门閃闪閉闭問问間间'
+    '閱阅闊阔關关陸陆陽阳陰阴陣阵隊队際际隨随險险隱隐雖虽雞鸡離离難难電电靜静韓韩頁页頂顶項项'
+    '順顺須须預预領领頻频題题額额顏颜願愿類类顧顾風风飛飞飯饭飲饮飽饱餓饿館馆馬马駕驾駐驻騎骑騙骗'
+    '驗验體体鬥斗鬧闹魚鱼魯鲁鮮鲜鳥鸟鴨鸭鴻鸿麥麦黃黄齊齐齒齿龍龙龜龟'
+)
+# 项目中补充的异体字对照，如 {'氵': '水'}
+MODERATION_CHAR_VARIANTS = getattr(settings, 'MODERATION_CHAR_VARIANTS', {})
+
+
+def build_fold_table():
+    """
+    构建转换表。文本在转换前已经 lower()，因此只需处理全角小写字母
+    """
+    table = {}
+    # 全角 ASCII（！～）转半角，全角大写字母直接转为小写
+    for code in range(0xFF01, 0xFF5F):
+        table[code] = chr(code - 0xFEE0).lower()
+    for traditional, simplified in zip(VARIANT_PAIRS[0::2], VARIANT_PAIRS[1::2]):
+        if traditional != simplified:
+            table[ord(traditional)] = simplified
+    for variant, standard in MODERATION_CHAR_VARIANTS.items():
+        table[ord(variant)] = standard
+    # 分隔符（包括其全角形式）最后处理，覆盖上面的映射；分隔符统一转为 BREAK，扫描时按上下文处理
+    for char in SEPARATOR_CHARS:
+        table[ord(char)] = BREAK
+        if 0x21 <= ord(char) <= 0x7E:
+            table[ord(char) + 0xFEE0] = BREAK
+    for char in ZERO_WIDTH_CHARS:
+        table[ord(char)] = SKIP
+    return table
+
+
+FOLD_TABLE = build_fold_table()
+# 分隔符处理规则的版本，修改 _TRANSPARENT_SEPARATORS 等规则（以及 scan 中的对应实现）时递增
+SEPARATOR_RULES_VERSION = '2'
+# 归一化规则的版本，转换表变化后审核结果缓存和预编译自动机随之失效
+NORMALIZATION_VERSION = hashlib.sha1(
+    (SEPARATOR_RULES_VERSION + repr(sorted(FOLD_TABLE.items()))).encode('utf-8')
+).hexdigest()[:8]
+
+# 转换为 BREAK / SKIP 的原字符，扫描时直接按原字符判断
+SEPARATOR_SET = frozenset(chr(code) for code, value in FOLD_TABLE.items() if value == BREAK)
+MARKER_SET = SEPARATOR_SET | frozenset(ZERO_WIDTH_CHARS)
+# 单字两侧的边界：分隔符、换行
+BOUNDARY_SET = SEPARATOR_SET | {'\n'}
+
+_SEPARATOR_RUN = r'[\x00\x01]*\x01[\x00\x01]*'
+_CJK = r'[\u2e80-\u9fff\uf900-\ufaff]'
+# 可以跳过的分隔符：两侧都是单个字符（前后是分隔符、换行或文本边界），或两侧都是汉字
+_TRANSPARENT_SEPARATORS = re.compile(
+    rf'(?:(?<=\A[^\x00\x01\n])|(?<=[\x01\n][^\x00\x01\n])){_SEPARATOR_RUN}(?=[^\x00\x01\n](?:[\x01\n]|\Z))'
+    rf'|(?<={_CJK}){_SEPARATOR_RUN}(?={_CJK})'
+)
+# 其余包含多个分隔符的片段：只保留第一个 BREAK
+_REPEATED_BREAKS = re.compile(r'\x01[\x00\x01]*\x01')
+
+
+def _skip_all(match):
+    return SKIP * len(match.group())
+
+
+def _keep_first(match):
+    return BREAK + SKIP * (len(match.group()) - 1)
+
+
+CJK_START = '\u2e80'  # 小于它的字符都不是汉字
+
+
+def is_cjk(char):
+    return CJK_START <= char <= '\u9fff' or '\uf900' <= char <= '\ufaff'
+
+
+def fold_text(text):
+    """
+    归一化文本，与原文等长（lower() 改变长度的极少数字符除外）
+    """
+    return text.lower().translate(FOLD_TABLE)
+
+
+def fold_separators(folded):
+    """
+    按上下文处理 fold_text 结果中的分隔符：可以跳过的替换为 SKIP，其余每段只保留第一个 BREAK
+    """
+    if BREAK not in folded:
+        return folded
+    folded = _TRANSPARENT_SEPARATORS.sub(_skip_all, folded)
+    return _REPEATED_BREAKS.sub(_keep_first, folded)
+
+
+def fold_word(word):
+    """
+    敏感词的归一化形式：与扫描文本相同的转换，并去掉 SKIP 和首尾的 BREAK
+    """
+    return fold_separators(fold_text(word)).replace(SKIP, '').strip(BREAK)
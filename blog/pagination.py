@@ -0,0 +1,166 @@
+"""
+列表页的游标分页（keyset / seek pagination）。
+
+Paginator 每次请求都要 COUNT(*)，并用 OFFSET 跳过前面的所有行，越往后翻越慢。
+游标分页按排序键定位：下一页取 (pub_time, id) 小于本页最后一条的记录，
+只需沿索引读取 per_page + 1 行，与页码深浅无关，也不需要总数。
+
+游标是经过签名的排序键值，对用户不透明，被篡改或用在别的列表上时回到第一页。
+
+结果不超过 KEYSET_PAGINATION_THRESHOLD 条时 OFFSET 的开销可以忽略，仍使用带页码链接的页码分页；
+超过时默认使用游标分页。请求中带 ?page= 时始终使用页码分页，旧链接和需要跳页的场景不受影响。
+"""
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+from .counters import CachedCountPaginator
+
+CURSOR_PARAM = 'cursor'
+PAGE_PARAM = 'page'
+
+# 结果数超过该值时默认使用游标分页
+KEYSET_PAGINATION_THRESHOLD = getattr(settings, 'KEYSET_PAGINATION_THRESHOLD', 1000)
+
+
+class KeysetPage(Sequence):
+    """
+    游标分页的一页，模板中用 is_keyset 区分两种分页方式
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __repr__(self):
+        return f'<KeysetPage {len(self)} items>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return ''
+        return self.paginator.encode_cursor(self.object_list[-1], forward=True)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return ''
+        return self.paginator.encode_cursor(self.object_list[0], forward=False)
+
+
+class KeysetPaginator:
+    """
+    按 keys（如 ('-pub_time', '-id')，最后一个必须唯一）排序的游标分页
+    """
+
+    def __init__(self, queryset, per_page, keys):
+        self.queryset = queryset.order_by(*keys)
+        self.per_page = per_page
+        self.keys = [(key.lstrip('-'), key.startswith('-')) for key in keys]
+        self.salt = f'blog.pagination:{queryset.model._meta.label}:{",".join(keys)}'
+
+    def encode_cursor(self, obj, forward):
+        values = [str(getattr(obj, name)) for name, _ in self.keys]
+        return signing.dumps(['n' if forward else 'p', values], salt=self.salt, compress=True)
+
+    def decode_cursor(self, cursor):
+        """
+        返回 (是否向后翻, 排序键值)，无效的游标返回 None
+        """
+        try:
+            direction, values = signing.loads(cursor, salt=self.salt)
+            fields = [self.queryset.model._meta.get_field(name) for name, _ in self.keys]
+            if direction not in ('n', 'p') or len(values) != len(fields):
+                return None
+            return direction == 'n', [field.to_python(value) for field, value in zip(fields, values)]
+        except (signing.BadSignature, ValidationError, ValueError, TypeError):
+            return None
+
+    def seek_filter(self, values, forward):
+        """
+        排在 values 之后（forward）或之前的记录：(k1 < v1) OR (k1 = v1 AND k2 < v2) ...
+        """
+        condition = Q()
+        for index, (name, descending) in enumerate(self.keys):
+            after = descending == forward
+            clause = Q(**{f'{name}__{"lt" if after else "gt"}': values[index]})
+            for prefix_index, (prefix_name, _) in enumerate(self.keys[:index]):
+                clause &= Q(**{prefix_name: values[prefix_index]})
+            condition |= clause
+        return condition
+
+    def get_page(self, cursor=None):
+        decoded = self.decode_cursor(cursor) if cursor else None
+        if decoded is None:
+            rows = list(self.queryset[:self.per_page + 1])
+            return KeysetPage(rows[:self.per_page], self, len(rows) > self.per_page, False)
+
+        forward, values = decoded
+        queryset = self.queryset.filter(self.seek_filter(values, forward))
+        if forward:
+            rows = list(queryset[:self.per_page + 1])
+            return KeysetPage(rows[:self.per_page], self, len(rows) > self.per_page, True)
+        # 向前翻页时反向排序取 per_page + 1 行，再恢复原来的顺序
+        rows = list(queryset.reverse()[:self.per_page + 1])
+        page_rows = rows[:self.per_page][::-1]
+        return KeysetPage(page_rows, self, True, len(rows) > self.per_page)
+
+
+def numbered_paginator(queryset, per_page, keys, count_scope=None):
+    """
+    页码分页；指定 count_scope 时总数读取计数缓存（blog.counters）
+    """
+    if count_scope:
+        return CachedCountPaginator(queryset.order_by(*keys), per_page, count_scope)
+    return Paginator(queryset.order_by(*keys), per_page)
+
+
+def within_threshold(paginator, count_scope):
+    """
+    结果数是否不超过 KEYSET_PAGINATION_THRESHOLD；
+    没有计数缓存时只统计到阈值 + 1 条，大列表不必执行完整的 COUNT(*)
+    """
+    if count_scope:
+        return paginator.count <= KEYSET_PAGINATION_THRESHOLD
+    total = paginator.object_list.order_by()[:KEYSET_PAGINATION_THRESHOLD + 1].count()
+    if total > KEYSET_PAGINATION_THRESHOLD:
+        return False
+    # 页码分页直接使用这个总数，不再重复 COUNT(*)
+    paginator.count = total
+    return True
+
+
+def paginate(request, queryset, per_page, keys, count_scope=None):
+    """
+    列表页分页：带 ?cursor= 时游标分页，带 ?page= 时页码分页；
+    都不带时结果数不超过 KEYSET_PAGINATION_THRESHOLD 用页码分页，否则用游标分页
+    """
+    cursor = request.GET.get(CURSOR_PARAM)
+    page_number = request.GET.get(PAGE_PARAM)
+    if not cursor:
+        paginator = numbered_paginator(queryset, per_page, keys, count_scope)
+        if page_number or within_threshold(paginator, count_scope):
+            return paginator.get_page(page_number)
+    return KeysetPaginator(queryset, per_page, keys).get_page(cursor)
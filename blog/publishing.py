@@ -0,0 +1,130 @@
+"""
+博客和评论的审核发布流程。
+
+同步模式下由视图直接调用；开启异步审核（MODERATION_ASYNC）时由 moderation_worker 在后台调用。
+返回值即视图的 JSON 响应内容：200 已发布，202 已转人工审核，其余为失败。
+"""
+import json
+import logging
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from .comments import save_comment
+from .html_text import html_to_text
+from .moderation import moderate_many, edit_scope, format_moderation_reason, moderation_version
+from .models import Blog, BlogComment, Notification, ModerationLog
+
+logger = logging.getLogger(__name__)
+
+
+def submit_blog(author, title, content, category, blog=None, approved_content='', approved_version=''):
+    """
+    审核并发表博客；blog 不为空时为编辑已有博客，正文只审核相对上次通过版本修改过的文本
+    """
+    # 正文是编辑器生成的 HTML，只审核提取出的文本
+    scanned_content = html_to_text(content)
+    if blog is not None:
+        scanned_content = edit_scope(html_to_text(approved_content), scanned_content, approved_version)
+    # 标题和正文一次扫描
+    title_result, content_result = moderate_many([title, scanned_content])
+
+    # 智能审查未通过，不立即发布，而是创建待审核日志
+    if not title_result.is_safe or not content_result.is_safe:
+        try:
+            ModerationLog.objects.create(
+                content_type='blog',
+                content_id=blog.id if blog else None,
+                original_content=f'标题: {title}\n内容: {content}',
+                flagged_by_ai=True,
+                reason=format_moderation_reason([('标题', title_result), ('内容', content_result)]),
+                status='pending',
+                author=author,
+                category=category,
+            )
+        except Exception as e:
+            logger.error("Error creating ModerationLog for blog: %s", e)
+            return {'code': 500, 'msg': '服务器内部错误：审核日志创建失败'}
+        return {'code': 202, 'msg': '内容包含敏感词，已提交审核，请等待管理员审核。'}
+
+    # 审核通过，正常保存
+    msg = '博客更新成功！' if blog else '发布成功！'
+    try:
+        if blog is None:
+            blog = Blog(author=author)
+        blog.title = title
+        blog.content = content
+        blog.category = category
+        blog.moderated_version = moderation_version()
+        blog.save()
+    except Exception as e:
+        logger.error("Error saving blog: %s", e)
+        return {'code': 500, 'msg': '服务器内部错误：博客保存失败'}
+    return {'code': 200, 'msg': msg, 'data': {'blog_id': blog.id}}
+
+
+def submit_comment(author, blog, content, parent_comment_id=None, reply_to_user_id=None):
+    """
+    审核并发表评论，审核通过时通知被回复的用户或博主
+    """
+    # ai审核
+    (result,) = moderate_many([content])
+
+    if not result.is_safe:
+        comment_content = {
+            'content': content,
+            'blog_id': blog.id,
+            'parent_comment_id': parent_comment_id,
+            'reply_to_user_id': reply_to_user_id
+        }
+        ModerationLog.objects.create(
+            content_type='comment',
+            content_id=None,
+            original_content=json.dumps(comment_content, ensure_ascii=False),  # 将字典转换为 JSON 字符串
+            flagged_by_ai=True,
+            reason=result.message,
+            status='pending',
+            author=author
+        )
+        return {'code': 202, 'msg': '内容包含敏感词，已提交审核，请等待管理员审核。'}
+
+    # 审核通过，保存评论
+    new_comment = BlogComment(blog=blog, author=author, content=content)
+
+    # 默认通知作者
+    target_user = blog.author
+
+    if parent_comment_id:
+        try:
+            parent_comment = BlogComment.objects.get(id=parent_comment_id, deleted_at__isnull=True)
+            new_comment.parent = parent_comment
+            # 避免自己通知自己
+            if parent_comment.author != author:
+                target_user = parent_comment.author
+            if reply_to_user_id:
+                User = get_user_model()
+                try:
+                    reply_to_user = User.objects.get(id=reply_to_user_id)
+                    if reply_to_user != author:
+                        target_user = reply_to_user
+                except User.DoesNotExist:
+                    pass  # 用户不存在，继续通知博主或父评论作者
+        except BlogComment.DoesNotExist:
+            pass  # 忽略错误，作为顶级评论处理
+
+    save_comment(new_comment)
+
+    # 创建通知
+    if target_user != author:  # 避免通知自己
+        notification_obj = Notification.objects.create(
+            recipient=target_user,
+            actor=author,
+            verb='评论了你的博客',
+            description=f'您的文章 "{blog.title}" 有新评论或回复：{new_comment.content[:30]}...',
+        )
+        notification_obj.target_url = reverse('blog:blog_detail', args=[blog.id]) \
+                                      + f'?notification_id={notification_obj.id}' \
+                                      + f'#comment-{new_comment.id}'
+        notification_obj.save()
+
+    return {'code': 200, 'msg': '评论成功', 'comment_id': new_comment.id}
@@ -0,0 +1,326 @@
+"""
+博客正文的预渲染。
+
+详情页原来直接输出 {{ blog.content|safe }}：正文未经过滤，每次访问都原样渲染。
+这里在博客保存（发布、编辑、审核通过）时把正文处理一次，结果保存在 Blog 上：
+    - 按白名单过滤标签、属性、链接协议和内联样式，script / style / iframe 等连同内容一起去掉；
+    - 图片加上 loading="lazy" / decoding="async"，站内图片补上宽高，避免加载时页面跳动；
+    - 为标题生成锚点，并生成目录；
+    - 安装了 Pygments 时，代码块在服务端高亮，只有仍需高亮的文章（未知语言等）才在前端加载 highlight.js。
+渲染结果以「渲染器版本:正文哈希」标记，渲染规则变化后详情页访问时按需重新渲染（或运行 render_blogs 命令）。
+"""
+import hashlib
+import html
+import logging
+import re
+from html.parser import HTMLParser
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .html_text import is_internal_media
+
+try:
+    from PIL import Image
+except ImportError:  # 未安装 Pillow 时不补充图片宽高
+    Image = None
+
+try:
+    from pygments import highlight
+    from pygments.formatters import HtmlFormatter
+    from pygments.lexers import get_lexer_by_name
+    from pygments.util import ClassNotFound
+except ImportError:  # 未安装 Pygments 时全部交给前端 highlight.js
+    highlight = None
+
+logger = logging.getLogger(__name__)
+
+# 渲染规则的版本，修改白名单或处理逻辑后需要递增，已保存的渲染结果随之失效
+RENDER_VERSION = '4'
+# 是否在服务端高亮代码块（需要安装 Pygments）
+BLOG_SERVER_HIGHLIGHT = getattr(settings, 'BLOG_SERVER_HIGHLIGHT', True)
+
+ALLOWED_TAGS = {
+    'a', 'b', 'blockquote', 'br', 'caption', 'code', 'col', 'colgroup', 'dd', 'del', 'div', 'dl', 'dt', 'em',
+    'figcaption', 'figure', 'font', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img', 'ins', 'kbd', 'li',
+    'mark', 'ol', 'p', 'pre', 's', 'small', 'span', 'strike', 'strong', 'sub', 'sup', 'table', 'tbody', 'td',
+    'tfoot', 'th', 'thead', 'tr', 'u', 'ul', 'video',
+}
+# 连同内容一起去掉的标签
+DROPPED_TAGS = {'script', 'style', 'template', 'iframe', 'object', 'embed', 'noscript', 'textarea', 'select'}
+VOID_TAGS = {'br', 'col', 'hr', 'img'}
+GLOBAL_ATTRIBUTES = {'style', 'title'}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'target'},
+    'code': {'class'},
+    'col': {'span', 'width'},
+    'font': {'color', 'size'},
+    'img': {'src', 'alt', 'width', 'height', 'data-href'},
+    'ol': {'start'},
+    'pre': {'class'},
+    'td': {'colspan', 'rowspan', 'width'},
+    'th': {'colspan', 'rowspan', 'width'},
+    'video': {'src', 'poster', 'controls', 'width', 'height'},
+}
+URL_ATTRIBUTES = {'href', 'src', 'poster', 'data-href'}
+ALLOWED_SCHEMES = {'', 'http', 'https', 'mailto'}
+ALLOWED_STYLES = {
+    'background-color', 'border', 'border-collapse', 'color', 'font-family', 'font-size', 'font-style',
+    'font-weight', 'height', 'line-height', 'margin', 'margin-bottom', 'margin-left', 'margin-right',
+    'margin-top', 'max-width', 'padding', 'padding-left', 'text-align', 'text-decoration', 'text-indent',
+    'vertical-align', 'white-space', 'width',
+}
+_UNSAFE_STYLE_VALUE = re.compile(r'url\s*\(|expression\s*\(|javascript:|[\\<>]', re.I)
+_CLASS_NAME = re.compile(r'^[\w\- ]*$')
+# 生成目录的标题级别
+TOC_TAGS = ('h1', 'h2', 'h3', 'h4')
+# wangEditor 代码块的语言：<pre><code class="language-python">
+_LANGUAGE_CLASS = re.compile(r'\blang(?:uage)?-([\w+#.-]+)')
+# 高亮结果的 CSS 类前缀与 static/css/pygments.css 对应
+HIGHLIGHT_CLASS = 'highlight'
+
+
+def render_hash(content):
+    """
+    渲染结果的版本标记
+    """
+    digest = hashlib.sha1(content.encode('utf-8', errors='surrogatepass')).hexdigest()
+    return f'{RENDER_VERSION}:{digest}'
+
+
+def is_current(blog):
+    """
+    已保存的渲染结果是否由当前版本的渲染器生成。正文的修改都经过 Blog.save()，会同时重新渲染
+    """
+    return blog.render_hash.startswith(f'{RENDER_VERSION}:')
+
+
+def get_lexer(attributes):
+    """
+    代码块语言对应的 Pygments 词法分析器，无法在服务端高亮时返回 None
+    """
+    if highlight is None or not BLOG_SERVER_HIGHLIGHT:
+        return None
+    match = _LANGUAGE_CLASS.search(attributes.get('class', ''))
+    if not match:
+        return None
+    try:
+        # 保留代码原有的首尾空行
+        return get_lexer_by_name(match.group(1), stripnl=False, ensurenl=False)
+    except ClassNotFound:
+        return None
+
+
+def safe_url(url):
+    url = url.strip()
+    try:
+        scheme = urlsplit(url).scheme.lower()
+    except ValueError:
+        return None
+    return url if scheme in ALLOWED_SCHEMES else None
+
+
+def safe_style(style):
+    declarations = []
+    for declaration in style.split(';'):
+        name, _, value = declaration.partition(':')
+        name, value = name.strip().lower(), value.strip()
+        if name in ALLOWED_STYLES and value and not _UNSAFE_STYLE_VALUE.search(value):
+            declarations.append(f'{name}: {value}')
+    return '; '.join(declarations)
+
+
+_image_sizes = {}
+
+
+def image_size(url):
+    """
+    站内图片的宽高，读取失败返回 None。同一进程内按地址缓存
+    """
+    if Image is None or not is_internal_media(url):
+        return None
+    if url in _image_sizes:
+        return _image_sizes[url]
+    size = None
+    name = unquote(urlsplit(url).path)[len(settings.MEDIA_URL):]
+    try:
+        with default_storage.open(name) as f, Image.open(f) as image:
+            size = image.size
+    except Exception as e:
+        logger.info("Cannot read image size of %s: %s", url, e)
+    _image_sizes[url] = size
+    return size
+
+
+class ArticleRenderer(HTMLParser):
+    """
+    按白名单重新生成 HTML：只输出允许的标签和属性，文本和属性值重新转义，未闭合的标签在末尾补全
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pieces = []
+        self.open_tags = []
+        self.dropping = None  # 正在跳过内容的标签
+        self.toc = []
+        self.headings = 0
+        self.heading = None  # 正在收集文本的标题 (级别, 锚点, 文本片段)
+        self.code = None  # 正在收集的服务端高亮代码块 (词法分析器, 文本片段)
+        self.needs_highlight = False  # 是否有代码块需要前端高亮
+
+    def handle_starttag(self, tag, attrs):
+        if self.dropping:
+            return
+        if self.code:
+            # 代码块中只保留文本
+            if tag == 'br':
+                self.code[1].append('\n')
+            return
+        if tag in DROPPED_TAGS:
+            self.dropping = tag
+            return
+        if tag not in ALLOWED_TAGS:
+            return
+        attributes = self.clean_attributes(tag, attrs)
+        if tag == 'img':
+            attributes = self.rewrite_image(attributes)
+        elif tag == 'a' and attributes.get('target') == '_blank':
+            attributes['rel'] = 'noopener noreferrer nofollow'
+        elif tag in TOC_TAGS:
+            self.headings += 1
+            anchor = f'heading-{self.headings}'
+            attributes['id'] = anchor
+            self.heading = (int(tag[1]), anchor, [])
+        elif tag == 'code' and 'pre' in self.open_tags:
+            lexer = get_lexer(attributes)
+            if lexer is None:
+                self.needs_highlight = True
+            else:
+                # 服务端高亮的代码块，nohighlight 让 highlight.js 跳过
+                attributes['class'] = f'{HIGHLIGHT_CLASS} nohighlight'
+                attributes['data-language'] = lexer.name
+                self.code = (lexer, [])
+        rendered = ''.join(
+            f' {name}' if value is None else f' {name}="{html.escape(value)}"' for name, value in attributes.items()
+        )
+        self.pieces.append(f'<{tag}{rendered}>')
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.dropping:
+            if tag == self.dropping:
+                self.dropping = None
+            return
+        if self.code:
+            if tag not in ('code', 'pre'):
+                return
+            self.finish_code()
+        if tag not in self.open_tags:
+            return
+        # 先闭合嵌套在其中、没有闭合的标签
+        while self.open_tags:
+            current = self.open_tags.pop()
+            self.pieces.append(f'</{current}>')
+            self.finish_heading(current)
+            if current == tag:
+                break
+
+    def handle_data(self, data):
+        if self.dropping:
+            return
+        if self.code:
+            self.code[1].append(data)
+            return
+        self.pieces.append(html.escape(data, quote=False))
+        if self.heading:
+            self.heading[2].append(data)
+
+    def finish_code(self):
+        lexer, texts = self.code
+        self.code = None
+        source = ''.join(texts)
+        highlighted = highlight(source, lexer, HtmlFormatter(nowrap=True))
+        # 原文不以换行结尾时 Pygments 仍可能补一个换行，只去掉这一个，原文结尾的空行保持不变
+        if highlighted.endswith('\n') and not source.endswith('\n'):
+            highlighted = highlighted[:-1]
+        self.pieces.append(highlighted)
+
+    def finish_heading(self, tag):
+        if self.heading and tag in TOC_TAGS:
+            level, anchor, texts = self.heading
+            title = ' '.join(''.join(texts).split())
+            if title:
+                self.toc.append({'level': level, 'anchor': anchor, 'title': title})
+            self.heading = None
+
+    @staticmethod
+    def clean_attributes(tag, attrs):
+        allowed = GLOBAL_ATTRIBUTES | ALLOWED_ATTRIBUTES.get(tag, set())
+        attributes = {}
+        for name, value in attrs:
+            if name not in allowed or name in attributes:
+                continue
+            if name == 'controls':
+                attributes[name] = None
+                continue
+            if value is None:
+                continue
+            if name in URL_ATTRIBUTES:
+                value = safe_url(value)
+            elif name == 'style':
+                value = safe_style(value)
+            elif name == 'class' and not _CLASS_NAME.match(value):
+                value = None
+            elif name == 'target' and value != '_blank':
+                value = None
+            if value:
+                attributes[name] = value
+        return attributes
+
+    @staticmethod
+    def rewrite_image(attributes):
+        attributes['loading'] = 'lazy'
+        attributes['decoding'] = 'async'
+        if 'src' in attributes and not ('width' in attributes and 'height' in attributes):
+            size = image_size(attributes['src'])
+            if size:
+                attributes['width'], attributes['height'] = str(size[0]), str(size[1])
+        return attributes
+
+    def render(self, source):
+        self.feed(source)
+        self.close()
+        if self.code:
+            self.finish_code()
+        while self.open_tags:
+            tag = self.open_tags.pop()
+            self.pieces.append(f'</{tag}>')
+            self.finish_heading(tag)
+        return ''.join(self.pieces)
+
+
+def render_content(content):
+    """
+    返回 (过滤后的 HTML, 目录, 是否需要前端高亮)
+    """
+    renderer = ArticleRenderer()
+    rendered = renderer.render(content)
+    return rendered, renderer.toc, renderer.needs_highlight
+
+
+RENDERED_FIELDS = ['rendered_content', 'toc', 'needs_highlight', 'render_hash']
+
+
+def render_blog(blog):
+    """
+    重新渲染博客正文，保存到 blog 的渲染字段上（不写入数据库）
+    """
+    blog.rendered_content, blog.toc, blog.needs_highlight = render_content(blog.content)
+    blog.render_hash = render_hash(blog.content)
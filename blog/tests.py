@@ -1,3 +1,713 @@
-from django.test import TestCase
+import datetime
+import html
+import io
+import json
+import os
+import random
+import re
+import tempfile
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.core import signing
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .comments import (
+    COMMENT_PAGE_SIZE, comment_page, create_comment, delete_comment_tree, load_comment_trees, reply_page,
+)
+from .counters import ALL_SCOPE, author_scope, cached_count, category_scope, make_key
+from .management.commands import remoderate
+from .models import (
+    COMMENT_MAX_LEVEL, COMMENT_PATH_LENGTH, Blog, BlogCategory, BlogComment, ModerationLog, ModerationTask, User,
+    comment_path_step,
+)
+from .moderation import (
+    REPEAT_CHAR_MESSAGE, REPEAT_CHAR_PRIORITY, WORD_PRIORITY, Hit, ModerationEngine, edit_scope, moderate_edit,
+    moderate_many, moderate_stream, moderation_version, primary_moderation,
+)
+from .moderation_stats import CLEAN_LABEL, WORD_LABEL, ModerationStats
+from .moderation_tasks import MODERATION_TASK_MAX_ATTEMPTS, MODERATION_TASK_TIMEOUT, claim_tasks, enqueue_blog, process_task
+from .normalization import SKIP, fold_separators, fold_text, fold_word
+from .pagination import KeysetPaginator
+from .rendering import highlight, render_content
+
+
+class SeparatorFoldingTests(SimpleTestCase):
+    """
+    分隔符只在单字之间跳过，敏感词不能跨英文单词命中
+    """
+    # 曾因跨单词拼接被误判为含有敏感词的正常句子
+    ORDINARY_SENTENCES = [
+        'This is extremely useful.',
+        'Thanks. Example below',
+        'I was made',
+        'jobs: 3 posts',
+        'a cab, a lot',
+        'see https://example.com/x ok',
+    ]
+
+    def test_no_match_across_words(self):
+        for text in self.ORDINARY_SENTENCES:
+            with self.subTest(text=text):
+                is_safe, message = primary_moderation(text)
+                self.assertNotIn('敏感词', message)
+
+    def test_separated_single_letters_still_match(self):
+        for text in ('sex', 's.e.x', 's e x', 'S. E. X', 'se​x'):
+            with self.subTest(text=text):
+                self.assertEqual(primary_moderation(text), (False, '文字含有敏感词：sex'))
+
+    def test_phrases_match_across_separators(self):
+        for text in ('fuck you', 'Fuck,  you!', 'cao ni ma'):
+            with self.subTest(text=text):
+                self.assertFalse(primary_moderation(text)[0])
+
+    def test_scan_matches_regex_folding(self):
+        # 扫描时按上下文处理分隔符，结果应与 fold_separators 的正则实现一致
+        words = {fold_word(word) for word in ('sex', 'ab', 'a b', 'xa', '法轮', '轮 功')}
+        engine = ModerationEngine(words, [])
+        alphabet = list('absex法轮功') + [' ', '.', ',', '，', '\u200b', '\n']
+        rng = random.Random(0)
+        for _ in range(500):
+            text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 30)))
+            with self.subTest(text=text):
+                hits = {(hit.start, hit.end) for hit in engine.scan(text, first_only=False)
+                        if hit.priority == WORD_PRIORITY}
+                self.assertEqual(hits, self.reference_hits(words, text))
+
+    @staticmethod
+    def reference_hits(words, text):
+        folded = fold_separators(fold_text(text))
+        kept = [index for index, char in enumerate(folded) if char != SKIP]
+        compact = ''.join(folded[index] for index in kept)
+        hits = set()
+        for word in words:
+            start = compact.find(word)
+            while start != -1:
+                hits.add((kept[start], kept[start + len(word) - 1] + 1))
+                start = compact.find(word, start + 1)
+        return hits
+
+
+class EditModerationTests(SimpleTestCase):
+    """
+    编辑后只重新审核修改部分及其两侧的重叠窗口
+    """
+    PREFIX = 'lorem ipsum dolor ' * 200
+    SUFFIX = ' sit amet consectetur' * 200
+
+    def test_full_text_without_matching_version(self):
+        new_text = self.PREFIX + 'changed' + self.SUFFIX
+        self.assertEqual(edit_scope('', new_text, moderation_version()), new_text)
+        self.assertEqual(edit_scope(self.PREFIX + self.SUFFIX, new_text, ''), new_text)
+        self.assertEqual(edit_scope(self.PREFIX + self.SUFFIX, new_text, 'outdated'), new_text)
+
+    def test_unchanged_text_needs_nothing(self):
+        text = self.PREFIX + self.SUFFIX
+        self.assertEqual(edit_scope(text, text, moderation_version()), '')
+        self.assertEqual(moderate_edit(text, text, moderation_version()), (True, ''))
+
+    def test_scope_covers_change_only(self):
+        approved = self.PREFIX + self.SUFFIX
+        new_text = self.PREFIX + 'inserted' + self.SUFFIX
+        scope = edit_scope(approved, new_text, moderation_version())
+        self.assertIn('inserted', scope)
+        self.assertLess(len(scope), len(new_text) // 4)
+
+    def test_word_across_edit_boundary(self):
+        # 删除中间的字符后拼出敏感词，修改点两侧的窗口能发现它
+        approved = self.PREFIX + 'seqx' + self.SUFFIX
+        new_text = self.PREFIX + 'sex' + self.SUFFIX
+        self.assertTrue(primary_moderation(approved)[0])
+        self.assertEqual(moderate_edit(approved, new_text, moderation_version()), (False, '文字含有敏感词：sex'))
+
+
+class BatchModerationTests(SimpleTestCase):
+    """
+    批量审核的命中按字段切分，位置相对于各自的字段；分块审核能发现跨块的敏感词
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_moderate_many_maps_hits_to_fields(self):
+        texts = ['a clean title', 'it says sex here', '', 'visit https://example.com now']
+        results = moderate_many(texts)
+        self.assertEqual([result.is_safe for result in results], [True, False, True, False])
+        hit, = results[1].hits
+        self.assertEqual((hit.start, hit.end, hit.word), (8, 11, 'sex'))
+        self.assertEqual(results[1].message, '文字含有敏感词：sex')
+        link, = results[3].hits
+        self.assertEqual(texts[3][link.start:link.end], 'https://example.com')
+
+    def test_moderate_many_cached_clean_fields(self):
+        moderate_many(['a clean title'])
+        results = moderate_many(['a clean title', 'sex'])
+        self.assertEqual([result.is_safe for result in results], [True, False])
+
+    def test_repeat_run_does_not_cross_fields(self):
+        # 两个字段各有 4 个 a，拼接后也不构成重复字符命中
+        self.assertTrue(all(result.is_safe for result in moderate_many(['x aaaa', 'aaaa y'])))
+
+    def test_stream_finds_word_split_across_chunks(self):
+        chunks = ['lorem ipsum ' * 100 + 'se', 'x dolor ' * 100]
+        result = moderate_stream(chunks)
+        self.assertFalse(result.is_safe)
+        hit, = result.hits
+        self.assertEqual(''.join(chunks)[hit.start:hit.end], 'sex')
+
+    def test_stream_reports_each_hit_once(self):
+        chunks = ['one sex two ', 'three ', 'four sex']
+        result = moderate_stream(chunks, first_only=False)
+        text = ''.join(chunks)
+        self.assertEqual([(hit.start, hit.end) for hit in result.hits], [(4, 7), (len(text) - 3, len(text))])
+
+
+class ModerationStatsTests(SimpleTestCase):
+    """
+    扫描耗时按命中的规则和敏感词归类，模型推理耗时单独统计
+    """
+
+    def test_scan_latency_grouped_by_hits(self):
+        stats = ModerationStats()
+        stats.observe_scan(100, 0.002, [
+            Hit(0, 3, WORD_PRIORITY, None, 'sex'),
+            Hit(3, 9, REPEAT_CHAR_PRIORITY, REPEAT_CHAR_MESSAGE, None),
+        ])
+        stats.observe_scan(100, 0.001, [])
+        stats.observe_model(0.5, 1)
+        snapshot = stats.snapshot()
+        self.assertEqual(
+            {label: latency['count'] for label, latency in snapshot['scan_latency_by_rule'].items()},
+            {WORD_LABEL: 1, REPEAT_CHAR_MESSAGE: 1, CLEAN_LABEL: 1},
+        )
+        # 整次扫描的耗时计入命中的每条规则
+        self.assertEqual(snapshot['scan_latency_by_rule'][WORD_LABEL]['max_ms'], 2.0)
+        self.assertEqual(snapshot['scan_latency_by_word']['sex']['count'], 1)
+        self.assertEqual(snapshot['model_latency']['count'], 1)
+
+
+class ListingPaginationTests(TestCase):
+    """
+    博客不多时首页使用页码分页，总页数来自计数缓存
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author', password='password')
+        category = BlogCategory.objects.create(name='category')
+        for number in range(20):
+            Blog.objects.create(title=f'blog {number}', content='<p>content</p>', category=category, author=author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_index_renders_page_count(self):
+        response = self.client.get('/')
+        self.assertEqual(response.context['blogs'].paginator.num_pages, 4)
+        self.assertContains(response, '1 / 4')
+
+    def test_index_count_served_from_cache(self):
+        self.client.get('/')
+        self.assertEqual(cache.get(make_key(ALL_SCOPE)), 20)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/')
+        self.assertContains(response, '1 / 4')
+        self.assertFalse([query for query in queries.captured_queries if 'COUNT(' in query['sql']])
+
+
+class BlogCounterSignalTests(TestCase):
+    """
+    计数缓存由 Blog 的信号维护，后台保存、QuerySet.delete() 和级联删除同样生效
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author', password='password')
+        cls.category = BlogCategory.objects.create(name='category')
+        cls.other = BlogCategory.objects.create(name='other')
+        cls.blog = Blog.objects.create(title='blog', content='<p>content</p>', category=cls.category, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.scopes = {
+            ALL_SCOPE: Blog.objects.all(),
+            category_scope(self.category.id): Blog.objects.filter(category=self.category),
+            category_scope(self.other.id): Blog.objects.filter(category=self.other),
+            author_scope(self.author.id): Blog.objects.filter(author=self.author),
+        }
+        for scope, queryset in self.scopes.items():
+            cached_count(scope, queryset)
+
+    def assertCountsCurrent(self):
+        for scope, queryset in self.scopes.items():
+            with self.subTest(scope=scope):
+                self.assertEqual(cache.get(make_key(scope)), queryset.count())
+
+    def test_create(self):
+        Blog.objects.create(title='new', content='<p>content</p>', category=self.other, author=self.author)
+        self.assertCountsCurrent()
+
+    def test_move_category(self):
+        blog = Blog.objects.get(id=self.blog.id)
+        blog.category = self.other
+        blog.save()
+        self.assertCountsCurrent()
+        # 再次保存不会重复计数
+        blog.save()
+        self.assertCountsCurrent()
+
+    def test_queryset_delete(self):
+        Blog.objects.filter(id=self.blog.id).delete()
+        self.assertCountsCurrent()
+
+    def test_cascade_delete(self):
+        Blog.objects.create(title='new', content='<p>content</p>', category=self.other, author=self.author)
+        self.other.delete()
+        self.assertCountsCurrent()
+
+
+class CommentTreeTests(TestCase):
+    """
+    评论树每条评论只内联显示最新的几条回复，回复数来自聚合
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author', password='password')
+        category = BlogCategory.objects.create(name='category')
+        cls.blog = Blog.objects.create(title='blog', content='<p>content</p>', category=category, author=cls.author)
+        cls.top = cls.comment()
+        cls.replies = [cls.comment(cls.top) for _ in range(5)]
+        cls.nested = [cls.comment(cls.replies[-1]) for _ in range(4)]
+        cls.deep = cls.comment(cls.nested[-1])
+
+    @classmethod
+    def comment(cls, parent=None):
+        return create_comment(content='comment', blog=cls.blog, author=cls.author, parent=parent)
+
+    def test_inline_replies_bounded(self):
+        top, = load_comment_trees(self.blog, [self.top])
+        children = top.get_children()
+        self.assertEqual([child.id for child in children], [reply.id for reply in self.replies[:-4:-1]])
+        self.assertEqual((top.reply_count, top.hidden_reply_count), (5, 2))
+        self.assertTrue(top.replies_cursor)
+        newest = children[0]
+        self.assertEqual([child.id for child in newest.get_children()], [reply.id for reply in self.nested[:-4:-1]])
+        self.assertEqual((newest.reply_count, newest.hidden_reply_count), (4, 1))
+        self.assertEqual((children[1].reply_count, children[1].hidden_reply_count), (0, 0))
+
+    def test_deleted_replies_not_counted(self):
+        BlogComment.objects.filter(id=self.replies[0].id).update(deleted_at=self.top.pub_time)
+        top, = comment_page(self.blog).object_list
+        self.assertEqual((top.reply_count, top.hidden_reply_count), (4, 1))
+
+    def test_reply_page_loads_one_level(self):
+        with CaptureQueriesContext(connection) as queries:
+            page = reply_page(self.top)
+        self.assertEqual([reply.id for reply in page.object_list], [reply.id for reply in reversed(self.replies)])
+        newest = page.object_list[0]
+        self.assertEqual((newest.reply_count, newest.hidden_reply_count), (4, 1))
+        inline = newest.get_children()
+        self.assertEqual([child.id for child in inline], [reply.id for reply in self.nested[:-4:-1]])
+        # 第三层只给出回复数，由「查看更多回复」继续加载
+        self.assertEqual((inline[0].reply_count, inline[0].hidden_reply_count, inline[0].replies_cursor), (1, 1, ''))
+        self.assertEqual(inline[0].get_children(), [])
+        self.assertFalse([query for query in queries.captured_queries if 'LIKE' in query['sql']])
+
+
+class SanitizerTests(SimpleTestCase):
+    """
+    正文按白名单重新生成：去掉脚本链接、事件属性和样式中的 url()，保留安全的标签和属性
+    """
+
+    def render(self, content):
+        return render_content(content)[0]
+
+    def test_script_urls_removed(self):
+        for href in ('javascript:alert(1)', ' JavaScript:alert(1)', 'java&#x09;script:alert(1)', 'vbscript:x'):
+            with self.subTest(href=href):
+                self.assertEqual(self.render(f'<a href="{href}">x</a>'), '<a>x</a>')
+        self.assertEqual(self.render('<a href="https://example.com/">x</a>'), '<a href="https://example.com/">x</a>')
+
+    def test_event_attributes_removed(self):
+        rendered = self.render('<img src="/media/a.png" onerror="alert(1)"><div onclick="alert(1)">d</div>')
+        self.assertNotIn('onerror', rendered)
+        self.assertNotIn('onclick', rendered)
+        self.assertIn('src="/media/a.png"', rendered)
+
+    def test_style_urls_removed(self):
+        self.assertEqual(
+            self.render('<p style="background: url(http://evil.example/x.png); color: red">t</p>'),
+            '<p style="color: red">t</p>',
+        )
+        self.assertEqual(self.render('<p style="background-color: URL (x)">t</p>'), '<p>t</p>')
+        self.assertEqual(self.render('<p style="width: expression(alert(1))">t</p>'), '<p>t</p>')
+
+    def test_dropped_tags_and_unclosed_tags(self):
+        self.assertEqual(self.render('<script>alert(1)</script><b>ok'), '<b>ok</b>')
+        self.assertEqual(
+            self.render('<a href="https://example.com/" target="_blank">x</a>'),
+            '<a href="https://example.com/" target="_blank" rel="noopener noreferrer nofollow">x</a>',
+        )
+
+
+@skipIf(highlight is None, '未安装 Pygments')
+class CodeBlockRenderingTests(SimpleTestCase):
+    """
+    服务端高亮的代码块保持原文，包括结尾的空行
+    """
+
+    def round_trip(self, source):
+        rendered, _, _ = render_content(f'<pre><code class="language-python">{html.escape(source)}</code></pre>')
+        code = re.search(r'<code[^>]*>(.*)</code>', rendered, re.S).group(1)
+        return html.unescape(re.sub(r'<[^>]+>', '', code))
+
+    def test_trailing_blank_lines_kept(self):
+        for source in ('x = 1\n\n\n', 'x = 1\n', '\n\nx = 1\n\n'):
+            with self.subTest(source=source):
+                self.assertEqual(self.round_trip(source), source)
+
+    def test_no_newline_added(self):
+        self.assertEqual(self.round_trip('x = 1'), 'x = 1')
+
+
+class ModerationTaskTests(TestCase):
+    """
+    异步审核任务的领取、超时重新领取，以及同一任务不会重复发布
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author', password='password')
+        cls.category = BlogCategory.objects.create(name='category')
+
+    def setUp(self):
+        cache.clear()
+        self.task = enqueue_blog(self.author, 'title', '<p>content</p>', self.category)
+
+    def expire(self, task):
+        started_at = timezone.now() - datetime.timedelta(seconds=MODERATION_TASK_TIMEOUT + 1)
+        ModerationTask.objects.filter(id=task.id).update(started_at=started_at)
+
+    def test_claim_once(self):
+        task, = claim_tasks(10)
+        self.assertEqual((task.id, task.status, task.attempts), (self.task.id, 'processing', 1))
+        self.assertEqual(claim_tasks(10), [])
+        self.assertEqual(process_task(task).status, 'published')
+        self.assertEqual(Blog.objects.filter(id=task.content_id, title='title').count(), 1)
+
+    def test_reclaimed_task_published_once(self):
+        first, = claim_tasks(10)
+        self.expire(first)
+        second, = claim_tasks(10)
+        self.assertEqual(second.attempts, 2)
+        # 原 worker 的领取凭证已失效，不能再发布
+        with self.assertLogs('blog.moderation_tasks', 'WARNING'):
+            self.assertIsNone(process_task(first))
+        self.assertEqual(process_task(second).status, 'published')
+        with self.assertLogs('blog.moderation_tasks', 'WARNING'):
+            self.assertIsNone(process_task(second))
+        self.assertEqual(Blog.objects.count(), 1)
+
+    def test_published_task_not_republished(self):
+        task, = claim_tasks(10)
+        process_task(task)
+        # 任务已经发布但状态被改回处理中（例如提交结果后进程退出），重新领取时直接返回上次的结果
+        ModerationTask.objects.filter(id=task.id).update(status='processing')
+        self.expire(task)
+        again, = claim_tasks(10)
+        self.assertEqual(process_task(again).content_id, task.content_id)
+        self.assertEqual(Blog.objects.count(), 1)
+
+    def test_too_many_attempts_fails(self):
+        for _ in range(MODERATION_TASK_MAX_ATTEMPTS):
+            task, = claim_tasks(10)
+            self.expire(task)
+        self.assertEqual(claim_tasks(10), [])
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'failed')
+
+
+class RemoderateCheckpointTests(TestCase):
+    """
+    复审命令按批推进断点，中断后使用同一断点文件从上次的位置继续，不重复写入审核日志
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author', password='password')
+        category = BlogCategory.objects.create(name='category')
+        cls.blogs = [
+            Blog.objects.create(title=f'blog {number}', content=f'<p>{text}</p>', category=category, author=author)
+            for number, text in enumerate(['fine', 'sex', 'fine', 'fine', 'more sex', 'fine'])
+        ]
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.checkpoint = os.path.join(directory.name, 'checkpoint.json')
+
+    def remoderate(self, *args):
+        call_command(
+            'remoderate', '--type=blog', '--workers=1', '--chunk-size=2', f'--checkpoint={self.checkpoint}', *args,
+            stdout=io.StringIO(),
+        )
+
+    def flagged_ids(self):
+        return sorted(ModerationLog.objects.filter(content_type='blog').values_list('content_id', flat=True))
+
+    def read_checkpoint(self):
+        with open(self.checkpoint, encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_resume_after_interruption(self):
+        scan_blogs = remoderate.scan_blogs
+        calls = []
+
+        def interrupted(rows):
+            calls.append(rows)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return scan_blogs(rows)
+
+        with mock.patch.object(remoderate, 'scan_blogs', interrupted), self.assertRaises(KeyboardInterrupt):
+            self.remoderate()
+        # 第一批处理完成后才推进断点
+        self.assertEqual(self.read_checkpoint()['blog'], self.blogs[1].id)
+        self.assertEqual(self.flagged_ids(), [self.blogs[1].id])
+
+        with mock.patch.object(remoderate, 'scan_blogs', wraps=scan_blogs) as scan:
+            self.remoderate()
+        # 从断点之后继续，已复审的批次不再读取
+        self.assertEqual([row[0] for call in scan.call_args_list for row in call.args[0]],
+                         [blog.id for blog in self.blogs[2:]])
+        self.assertEqual(self.flagged_ids(), [self.blogs[1].id, self.blogs[4].id])
+        self.assertEqual(self.read_checkpoint()['blog'], self.blogs[-1].id)
+
+    def test_restart_does_not_duplicate_logs(self):
+        self.remoderate()
+        self.remoderate('--restart')
+        self.assertEqual(self.flagged_ids(), [self.blogs[1].id, self.blogs[4].id])
+
+    def test_checkpoint_of_other_version_ignored(self):
+        with open(self.checkpoint, 'w', encoding='utf-8') as f:
+            json.dump({'version': 'outdated', 'blog': self.blogs[-1].id, 'comment': 0}, f)
+        self.remoderate()
+        self.assertEqual(self.flagged_ids(), [self.blogs[1].id, self.blogs[4].id])
+
+
+class KeysetCursorTests(TestCase):
+    """
+    游标分页按签名的排序键翻页，被篡改或用在别的列表上的游标回到第一页
+    """
+    KEYS = ('-pub_time', '-id')
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author', password='password')
+        category = BlogCategory.objects.create(name='category')
+        for number in range(7):
+            Blog.objects.create(title=f'blog {number}', content='<p>content</p>', category=category, author=author)
+        cls.ordered = list(Blog.objects.order_by(*cls.KEYS).values_list('id', flat=True))
+
+    def paginator(self, queryset=None, keys=KEYS):
+        return KeysetPaginator(queryset if queryset is not None else Blog.objects.all(), 3, keys)
+
+    def ids(self, page):
+        return [blog.id for blog in page]
+
+    def test_forward_and_backward(self):
+        paginator = self.paginator()
+        pages = [paginator.get_page()]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual([blog_id for page in pages for blog_id in self.ids(page)], self.ordered)
+        self.assertEqual([page.has_previous() for page in pages], [False, True, True])
+        previous = paginator.get_page(pages[-1].previous_cursor)
+        self.assertEqual(self.ids(previous), self.ids(pages[1]))
+        self.assertTrue(previous.has_previous())
+
+    def test_tampered_cursor_returns_first_page(self):
+        paginator = self.paginator()
+        cursor = paginator.get_page().next_cursor
+        payload, _, signature = cursor.rpartition(':')
+        forged = signing.dumps(['n', [str(Blog.objects.get(id=self.ordered[-1]).pub_time), '0']], salt='other')
+        for bad in (payload + ':' + signature[::-1], payload[:-1] + ':' + signature, forged, 'garbage', ''):
+            with self.subTest(cursor=bad):
+                self.assertEqual(self.ids(paginator.get_page(bad)), self.ordered[:3])
+
+    def test_cursor_of_other_list_returns_first_page(self):
+        cursor = self.paginator(keys=('-like_count', '-id')).get_page().next_cursor
+        self.assertEqual(self.ids(self.paginator().get_page(cursor)), self.ordered[:3])
+        comment_cursor = KeysetPaginator(BlogComment.objects.all(), 3, self.KEYS).encode_cursor(
+            Blog.objects.get(id=self.ordered[0]), forward=True
+        )
+        self.assertEqual(self.ids(self.paginator().get_page(comment_cursor)), self.ordered[:3])
+
+
+class CommentPaginationTests(TestCase):
+    """
+    顶级评论在数据库中按 (pub_time, id) 游标分页，只加载当前页的评论树
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author', password='password')
+        category = BlogCategory.objects.create(name='category')
+        cls.blog = Blog.objects.create(title='blog', content='<p>content</p>', category=category, author=cls.author)
+        cls.roots = [
+            create_comment(content=f'comment {number}', blog=cls.blog, author=cls.author)
+            for number in range(COMMENT_PAGE_SIZE + 3)
+        ]
+        create_comment(content='reply', blog=cls.blog, author=cls.author, parent=cls.roots[0])
+        BlogComment.objects.filter(id=cls.roots[1].id).update(deleted_at=timezone.now())
+        cls.visible = [root.id for root in reversed(cls.roots) if root.id != cls.roots[1].id]
+
+    def test_cursor_pages(self):
+        first = comment_page(self.blog)
+        self.assertEqual([comment.id for comment in first], self.visible[:COMMENT_PAGE_SIZE])
+        self.assertTrue(first.has_next())
+        second = comment_page(self.blog, first.next_cursor)
+        self.assertEqual([comment.id for comment in second], self.visible[COMMENT_PAGE_SIZE:])
+        self.assertFalse(second.has_next())
+        # 回复只出现在所属顶级评论的评论树中
+        self.assertEqual([child.content for child in second[-1].get_children()], ['reply'])
+
+    def test_load_comments_endpoint(self):
+        first = comment_page(self.blog)
+        response = self.client.get(f'/blog/comment/more/{self.blog.id}/', {'cursor': first.next_cursor})
+        data = response.json()['data']
+        self.assertFalse(data['has_next'])
+        self.assertIn('>comment 0</div>', data['html'])
+        self.assertIn('>comment 2</div>', data['html'])
+        # 已删除的评论不显示
+        self.assertNotIn('>comment 1</div>', data['html'])
+
+
+class CommentPathTests(TestCase):
+    """
+    评论以物化路径保存：插入只写自身一行，层数有上限，子树按路径前缀查询
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author', password='password')
+        category = BlogCategory.objects.create(name='category')
+        cls.blog = Blog.objects.create(title='blog', content='<p>content</p>', category=category, author=cls.author)
+
+    def comment(self, parent=None):
+        return create_comment(content='comment', blog=self.blog, author=self.author, parent=parent)
+
+    def test_path_and_level(self):
+        root = self.comment()
+        reply = self.comment(root)
+        nested = self.comment(reply)
+        self.assertEqual((root.path, root.level), (comment_path_step(root.id), 0))
+        self.assertEqual((reply.path, reply.level), (root.path + comment_path_step(reply.id), 1))
+        self.assertEqual(nested.path, reply.path + comment_path_step(nested.id))
+        nested.refresh_from_db()
+        self.assertEqual((nested.path, nested.level), (reply.path + comment_path_step(nested.id), 2))
+
+    def test_insert_does_not_touch_other_rows(self):
+        root = self.comment()
+        sibling = self.comment(root)
+        with CaptureQueriesContext(connection) as queries:
+            self.comment(root)
+        writes = [query['sql'] for query in queries.captured_queries if query['sql'].startswith(('INSERT', 'UPDATE'))]
+        # 插入自身、补上路径、更新博客的评论数
+        self.assertEqual(len(writes), 3)
+        sibling_path = sibling.path
+        sibling.refresh_from_db()
+        self.assertEqual(sibling.path, sibling_path)
+
+    def test_level_cap(self):
+        comment = None
+        for _ in range(COMMENT_MAX_LEVEL + 3):
+            comment = self.comment(comment)
+        comment.refresh_from_db()
+        self.assertEqual(comment.level, COMMENT_MAX_LEVEL)
+        self.assertLessEqual(len(comment.path), COMMENT_PATH_LENGTH)
+        # 超过上限的回复挂到最深一层的评论下，与被回复的评论同级
+        self.assertEqual(comment.parent.level, COMMENT_MAX_LEVEL - 1)
+
+    def test_subtree_filter(self):
+        first = self.comment()
+        reply = self.comment(first)
+        nested = self.comment(reply)
+        second = self.comment()
+        self.comment(second)
+        subtree = set(BlogComment.objects.filter(first.subtree_filter()).values_list('id', flat=True))
+        self.assertEqual(subtree, {first.id, reply.id, nested.id})
+        self.assertEqual(set(reply.get_descendants().values_list('id', flat=True)), {nested.id})
+        # 路径缺失时只匹配自身，不会匹配到全部评论
+        self.assertEqual(BlogComment(pk=first.pk).subtree_filter(), Q(pk=first.pk))
+
+
+class SoftDeleteCommentTests(TestCase):
+    """
+    删除评论只标记整棵子树，读取时过滤；purge_deleted_comments 在后台分批物理删除
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author', password='password')
+        category = BlogCategory.objects.create(name='category')
+        cls.blog = Blog.objects.create(title='blog', content='<p>content</p>', category=category, author=cls.author)
+
+    def setUp(self):
+        self.root = self.comment()
+        self.reply = self.comment(self.root)
+        self.nested = [self.comment(self.reply) for _ in range(3)]
+        self.sibling = self.comment(self.root)
+
+    def comment(self, parent=None):
+        return create_comment(content='comment', blog=self.blog, author=self.author, parent=parent)
+
+    def comment_count(self):
+        return Blog.objects.values_list('comment_count', flat=True).get(id=self.blog.id)
+
+    def purge(self, *args):
+        call_command('purge_deleted_comments', '--chunk-size=2', *args, stdout=io.StringIO())
+
+    def test_delete_marks_subtree(self):
+        self.assertEqual(self.comment_count(), 6)
+        self.assertEqual(delete_comment_tree(self.reply), 4)
+        self.assertEqual(self.comment_count(), 2)
+        deleted = BlogComment.objects.filter(deleted_at__isnull=False).values_list('id', flat=True)
+        self.assertEqual(set(deleted), {self.reply.id, *(comment.id for comment in self.nested)})
+        top, = comment_page(self.blog).object_list
+        self.assertEqual([child.id for child in top.get_children()], [self.sibling.id])
+        # 再次删除不会重复减少评论数
+        self.assertEqual(delete_comment_tree(self.reply), 0)
+        self.assertEqual(self.comment_count(), 2)
+
+    def test_purge_removes_tombstones_only(self):
+        delete_comment_tree(self.reply)
+        self.purge('--dry-run')
+        self.assertEqual(BlogComment.objects.count(), 6)
+        self.purge()
+        self.assertEqual(set(BlogComment.objects.values_list('id', flat=True)), {self.root.id, self.sibling.id})
+        self.assertEqual(self.comment_count(), 2)
+
+    def test_purge_respects_older_than(self):
+        delete_comment_tree(self.reply)
+        self.purge('--older-than=60')
+        self.assertEqual(BlogComment.objects.count(), 6)
+
+    def test_late_reply_under_deleted_comment(self):
+        delete_comment_tree(self.reply)
+        # 标记删除之后才写入的回复：清理时同样标记删除，留到下一次清理
+        late = self.comment(self.nested[0])
+        self.assertEqual(self.comment_count(), 3)
+        self.purge()
+        self.assertEqual(self.comment_count(), 2)
+        self.purge()
+        self.assertFalse(BlogComment.objects.filter(id=late.id).exists())
+        self.assertEqual(set(BlogComment.objects.values_list('id', flat=True)), {self.root.id, self.sibling.id})
@@ -17,6 +17,10 @@ urlpatterns = [
     path('blog/comment/<int:blog_id>/reply/<int:parent_comment_id>/', views.pub_comment, name='comment_reply'),
     # 删除评论
     path('blog/comment/delete/<int:comment_id>/', views.delete_comment, name='delete_comment'),
+    # 加载更多评论
+    path('blog/comment/more/<int:blog_id>/', views.load_comments, name='load_comments'),
+    # 查看更多回复
+    path('blog/comment/replies/<int:comment_id>/', views.load_replies, name='load_replies'),
     # 删除博客
     path('blog/delete/<int:blog_id>', views.delete_blog, name='delete_blog'),
     # 编辑已发的博客
@@ -45,6 +49,10 @@ urlpatterns = [
     path('moderation/action/<int:log_id>/<str:action>/', views.review_action, name='review_action'),
     # 待审核数
     path('moderation/count/', views.get_moderation_count, name='get_moderation_count'),
+    # 审核词典运行指标
+    path('moderation/metrics/', views.get_moderation_metrics, name='get_moderation_metrics'),
+    # 异步审核任务状态
+    path('moderation/task/<int:task_id>/', views.moderation_task_status, name='moderation_task_status'),
     # 审核详情
     path('moderation/detail/<int:log_id>/', views.moderation_detail, name='moderation_detail'),
     # 举报
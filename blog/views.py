@@ -2,37 +2,50 @@ import datetime
 import json
 
 from django.shortcuts import get_object_or_404, render, redirect, reverse
+from django.template.loader import render_to_string
 from django.http.response import JsonResponse
 from django.urls.base import reverse_lazy
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth import get_user_model
 from django.views.decorators.http import require_http_methods, require_POST, require_GET
-from django.db.models import Q, F, Count
+from django.db.models import Q, F
 from django.http import HttpResponseForbidden
 from django.core.paginator import Paginator
 from django.core.files.storage import default_storage
 from django.db import IntegrityError
 from django.utils import timezone
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
 from django.views.decorators.csrf import csrf_exempt  # 测试时 禁用 CSRF 验证
 
-from .moderation import moderate_content
-from .models import BlogCategory, Blog, BlogComment, Notification, BlogLike, ModerationLog, User
+from .comments import (COMMENT_PAGE_SIZE, ROOT_COMMENT_KEYS, comment_page, create_comment, delete_comment_tree,
+                       load_comment_trees, reply_page, root_comments)
+from .counters import ALL_SCOPE, category_scope
+from .html_text import HtmlText, mark_html
+from .pagination import paginate
+from .moderation import hit_spans, moderation_metrics, moderation_version
+from .moderation_tasks import MODERATION_ASYNC, enqueue_blog, enqueue_comment, task_status
+from .publishing import submit_blog, submit_comment
+from .rendering import RENDERED_FIELDS, is_current, render_blog
+from .models import BlogCategory, Blog, BlogComment, Notification, BlogLike, ModerationLog, ModerationTask, User
 from qxauth.models import Follow
 from .forms import PubBlogForm, PubCommentForm
 
 
+def list_blogs():
+    """
+    列表页的博客查询：不加载正文，一并查询作者
+    """
+    return Blog.objects.defer('content').select_related('author')
+
+
 def index(request):
     """
     首页
     """
-    # 使用 annotate() 和 Count() 来一次性计算每篇博客的评论数
-    blog_list = Blog.objects.annotate(comment_count=Count('comments')).order_by('-pub_time')
-
-    # 实例化 Paginator，每页显示 6 篇文章
-    paginator = Paginator(blog_list, 6)
-    # 获取当前的页码
-    page = request.GET.get('page')
-    blogs = paginator.get_page(page)  # 获取指定页面的数据
+    # 评论数直接读取 Blog.comment_count，摘要读取 Blog.excerpt，不加载正文
+    # 按 (pub_time, id) 排序，每页显示 6 篇文章，文章多时使用游标分页
+    blogs = paginate(request, list_blogs(), 6, ('-pub_time', '-id'), count_scope=ALL_SCOPE)
 
     return render(request, 'registration/index.html', context={'blogs': blogs})
 
@@ -44,11 +57,9 @@ def category_blogs(request, category_id):
     """
     category = get_object_or_404(BlogCategory, id=category_id)
     # 获取分类下的博客
-    blog_list = Blog.objects.filter(category=category).order_by('-like_count')
-
-    paginator = Paginator(blog_list, 6)
-    page = request.GET.get('page')
-    blogs = paginator.get_page(page)
+    blog_list = list_blogs().filter(category=category)
+    # 按 (like_count, id) 排序分页
+    blogs = paginate(request, blog_list, 6, ('-like_count', '-id'), count_scope=category_scope(category.id))
 
     return render(request, 'article/category_blogs.html', context={'blogs': blogs, 'category': category})
 
@@ -57,7 +68,12 @@ def blog_detail(request, blog_id):
     """
     博客详情
     """
-    blog = get_object_or_404(Blog.objects.annotate(comment_count=Count('comments')), id=blog_id)
+    # 正文使用保存时预渲染的结果，不加载原始正文
+    blog = get_object_or_404(Blog.objects.defer('content'), id=blog_id)
+    if not is_current(blog):
+        # 渲染规则更新后首次访问，重新渲染并保存
+        render_blog(blog)
+        blog.save(update_fields=RENDERED_FIELDS)
 
     # 获取浏览量
     session_key = f'viewed_blog_{blog_id}'
@@ -74,19 +90,8 @@ def blog_detail(request, blog_id):
     if request.user.is_authenticated:
         is_liked = BlogLike.objects.filter(blog=blog, user=request.user).exists()
 
-    # 获取顶级评论
-    comment_list = BlogComment.objects.filter(blog=blog, parent__isnull=True).select_related('author',
-                                                                                             'reply_to').order_by(
-        'tree_id', 'lft')
-    processed_comments = []
-    for comment in comment_list:
-        comment.display_level = min(comment.level, 1)
-        processed_comments.append(comment)
-
-    # 分页
-    paginator = Paginator(processed_comments, 10)
-    page = request.GET.get('comment_page')
-    comments = paginator.get_page(page)
+    # 顶级评论在数据库中分页：默认按游标取第一页，之后由「加载更多」接口获取；带 ?comment_page= 时按页码分页
+    comments = paginate_comments(request, blog)
 
     comment_form = PubCommentForm()  # 创建一个空的表单 用来渲染
 
@@ -115,6 +120,54 @@ def blog_detail(request, blog_id):
     return render(request, 'article/blog_detail.html', context=context)
 
 
+def paginate_comments(request, blog):
+    """
+    详情页的顶级评论：默认按游标取第一页，带 ?comment_page= 时按页码分页；
+    每条评论的整棵评论树一次查询加载
+    """
+    page_number = request.GET.get('comment_page')
+    if not page_number:
+        return comment_page(blog, request.GET.get('comment_cursor'))
+    roots = root_comments(blog).order_by(*ROOT_COMMENT_KEYS)
+    comments = Paginator(roots, COMMENT_PAGE_SIZE).get_page(page_number)
+    comments.object_list = load_comment_trees(blog, comments.object_list)
+    return comments
+
+
+@require_GET
+def load_comments(request, blog_id):
+    """
+    加载更多评论：按游标返回下一页顶级评论及其回复渲染后的 HTML
+    """
+    blog = get_object_or_404(Blog.objects.only('id', 'author_id'), id=blog_id)
+    comments = comment_page(blog, request.GET.get('cursor'))
+    html = render_to_string('article/_comment_list.html', {'comments': comments}, request=request)
+    return JsonResponse({'code': 200, 'data': {
+        'html': html,
+        'has_next': comments.has_next(),
+        'next_cursor': comments.next_cursor,
+    }})
+
+
+@require_GET
+def load_replies(request, comment_id):
+    """
+    查看更多回复：按游标返回评论的下一页直接回复（每条回复只内联显示最新的几条下级回复）渲染后的 HTML
+    """
+    comment = get_object_or_404(
+        BlogComment.objects.select_related('author', 'blog').defer('blog__content', 'blog__rendered_content'),
+        id=comment_id, deleted_at__isnull=True
+    )
+    replies = reply_page(comment, request.GET.get('cursor'))
+    html = render_to_string('article/_comment_list.html', {'comments': replies}, request=request)
+    return JsonResponse({'code': 200, 'data': {
+        'html': html,
+        'count': len(replies),
+        'has_next': replies.has_next(),
+        'next_cursor': replies.next_cursor,
+    }})
+
+
 @require_POST
 def get_image_for_blog(request):
     """
@@ -139,6 +192,21 @@ def get_image_for_blog(request):
     return JsonResponse({"errno": 1, "message": "图片上传失败"})
 
 
+def moderation_processing_response(task):
+    """
+    异步审核模式下的响应：内容已进入审核队列，前端可轮询 status_url 获取结果
+    """
+    return JsonResponse({
+        'code': 202,
+        'msg': '已提交，正在审核中，请稍候。',
+        'status': 'processing',
+        'data': {
+            'task_id': task.id,
+            'status_url': reverse('blog:moderation_task_status', args=[task.id]),
+        },
+    })
+
+
 @require_http_methods(['GET', 'POST'])
 @login_required(login_url=reverse_lazy('qxauth:login'))
 def edit_blog(request, blog_id):
@@ -160,39 +228,23 @@ def edit_blog(request, blog_id):
         }
         return render(request, 'article/edit_blog.html', context=context)
     else:
+        # 表单校验时会把新数据写入 instance，先记下上次审核通过的内容
+        approved_content = blog.content
+        approved_version = blog.moderated_version
         form = PubBlogForm(request.POST, instance=blog)  # instance 绑定数据
         if form.is_valid():
             title = form.cleaned_data.get('title')
             content = form.cleaned_data.get('content')
             category = form.cleaned_data.get('category')
 
-            # 内容审核
-            is_title_safe, title_moderation_msg = moderate_content(title)
-            is_content_safe, content_moderation_msg = moderate_content(content)
-
-            if not is_title_safe or not is_content_safe:
-                try:
-                    ModerationLog.objects.create(
-                        content_type='blog',
-                        content_id=blog.id,
-                        original_content=f'标题: {title}\n内容: {content}',
-                        flagged_by_ai=True,
-                        reason=f'标题审查: {title_moderation_msg}; 内容审查: {content_moderation_msg}',
-                        status='pending',
-                        author=blog.author,
-                        category=category,
-                    )
-                    return JsonResponse({'code': 202, 'msg': '内容包含敏感词，已提交审核！'})
-                except Exception as e:
-                    # 如果 ModerationLog 创建失败，返回 500 错误
-                    print(f"Error creating ModerationLog for edited blog: {e}")
-                    return JsonResponse({'code': 500, 'msg': f'服务器内部错误：审核日志创建失败'})
-            try:
-                blog = form.save()
-                return JsonResponse({'code': 200, 'msg': '博客更新成功！', 'data': {'blog_id': blog.id}})
-            except Exception as e:
-                print(f"Error saving edited blog: {e}")
-                return JsonResponse({'code': 500, 'msg': '服务器内部错误：博客保存失败'})
+            if MODERATION_ASYNC:
+                task = enqueue_blog(request.user, title, content, category, blog=blog)
+                return moderation_processing_response(task)
+            # 内容审核：正文只审核相对上次通过版本修改过的部分
+            return JsonResponse(submit_blog(
+                request.user, title, content, category,
+                blog=blog, approved_content=approved_content, approved_version=approved_version,
+            ))
         else:
             print(form.errors)
             return JsonResponse({'code': 400, 'msg': '参数错误！', 'errors': form.errors})
@@ -213,31 +265,13 @@ def pub_blog(request):
         if form.is_valid():
             title = form.cleaned_data.get('title')
             content = form.cleaned_data.get('content')
+            category = form.cleaned_data.get('category')
 
-            # ai审核
-            is_title_safe, title_moderation_msg = moderate_content(title)
-            is_content_safe, content_moderation_msg = moderate_content(content)
-
-            # 智能审查未通过，不立即发布，而是创建待审核日志
-            if not is_title_safe or not is_content_safe:
-                ModerationLog.objects.create(
-                    content_type='blog',
-                    content_id=None,
-                    original_content=f'标题: {title}\n内容: {content}',
-                    flagged_by_ai=True,
-                    reason=f'标题审查: {title_moderation_msg}; 内容审查: {content_moderation_msg}',
-                    status='pending',
-                    author=request.user,
-                    category=form.cleaned_data.get('category'),
-                )
-                return JsonResponse({'code': 202, 'msg': '内容包含敏感词，已提交审核，请等待管理员审核。'})
-
-            # 审核通过，正常保存
-            # 使用 form.save(commit=False) 获取模型实例，但不立即保存到数据库
-            blog = form.save(commit=False)
-            blog.author = request.user
-            blog.save()
-            return JsonResponse({'code': 200, 'msg': '发布成功！', 'data': {'blog_id': blog.id}})
+            if MODERATION_ASYNC:
+                task = enqueue_blog(request.user, title, content, category)
+                return moderation_processing_response(task)
+            # ai审核，通过后发布，否则创建待审核日志
+            return JsonResponse(submit_blog(request.user, title, content, category))
         else:
             return JsonResponse({'code': 400, 'msg': '参数错误！', 'errors': form.errors})
 
@@ -269,76 +303,11 @@ def pub_comment(request, blog_id, parent_comment_id=None):
         except User.DoesNotExist:
             pass  # 如果用户不存在，则不移除前缀
 
-    # ai审核
-    is_safe, moderation_msg = moderate_content(content)
-
-    if not is_safe:
-        comment_content = {
-            'content': content,
-            'blog_id': blog_id,
-            'parent_comment_id': parent_comment_id,
-            'reply_to_user_id': reply_to_user_id
-        }
-        ModerationLog.objects.create(
-            content_type='comment',
-            content_id=None,
-            original_content=json.dumps(comment_content, ensure_ascii=False),  # 将字典转换为 JSON 字符串
-            flagged_by_ai=True,
-            reason=moderation_msg,
-            status='pending',
-            author=request.user
-        )
-        return JsonResponse({'code': 202, 'msg': '内容包含敏感词，已提交审核，请等待管理员审核。'})
-
-    # 审核通过，保存评论
-    new_comment = form.save(commit=False)
-    new_comment.blog = blog
-    new_comment.author = request.user
-    new_comment.content = content
-
-    # 默认通知作者
-    target_user = blog.author
-
-    if parent_comment_id:
-        try:
-            parent_comment = BlogComment.objects.get(id=parent_comment_id)
-            new_comment.parent = parent_comment
-            # 避免自己通知自己
-            if parent_comment.author != request.user:
-                target_user = parent_comment.author
-            if reply_to_user_id:
-                User = get_user_model()
-                try:
-                    reply_to_user = User.objects.get(id=reply_to_user_id)
-                    if reply_to_user != request.user:
-                        target_user = reply_to_user
-                except User.DoesNotExist:
-                    pass  # 用户不存在，继续通知博主或父评论作者
-        except BlogComment.DoesNotExist:
-            pass  # 忽略错误，作为顶级评论处理
-
-    new_comment.save()
-
-    notification_obj = None
-
-    # 创建通知
-    if target_user != request.user:  # 避免通知自己
-        notification_obj = Notification.objects.create(
-            recipient=target_user,
-            actor=request.user,
-            verb='评论了你的博客',
-            description=f'您的文章 "{blog.title}" 有新评论或回复：{new_comment.content[:30]}...',
-            target_url=reverse('blog:blog_detail', args=[blog_id]) + f'#comment-{new_comment.id}'  # 定位到评论
-        )
-
-    # 如果创建了通知对象，则更新其 target_url
-    if notification_obj:
-        notification_obj.target_url = reverse('blog:blog_detail', args=[blog.id]) \
-                                      + f'?notification_id={notification_obj.id}' \
-                                      + f'#comment-{new_comment.id}'
-        notification_obj.save()
-
-    return JsonResponse({'code': 200, 'msg': '评论成功', 'comment_id': new_comment.id})
+    if MODERATION_ASYNC:
+        task = enqueue_comment(request.user, blog, content, parent_comment_id, reply_to_user_id)
+        return moderation_processing_response(task)
+    # ai审核，通过后保存评论并通知，否则创建待审核日志
+    return JsonResponse(submit_comment(request.user, blog, content, parent_comment_id, reply_to_user_id))
 
 
 @require_POST
@@ -348,7 +317,7 @@ def delete_comment(request, comment_id):
     删除评论
     """
     # 获取评论
-    comment = get_object_or_404(BlogComment, id=comment_id)
+    comment = get_object_or_404(BlogComment, id=comment_id, deleted_at__isnull=True)
 
     # 权限检查：只有评论作者或超级用户才能删除
     if not request.user.is_superuser and comment.author != request.user:
@@ -361,7 +330,7 @@ def delete_comment(request, comment_id):
     notification_obj = None
 
     try:
-        comment.delete()
+        delete_comment_tree(comment)
         # 如果不是评论作者自己删除，则通知评论作者
         if comment_author != deleter:
             notification_obj = Notification.objects.create(
@@ -387,7 +356,8 @@ def search(request):
     """ 查找视图函数 /search?q=xxx """
     q = request.GET.get('q')
     # 从博客标题和内容进行查找
-    blogs = Blog.objects.filter(Q(title__icontains=q) | Q(content__icontains=q)).all()
+    blog_list = list_blogs().filter(Q(title__icontains=q) | Q(content__icontains=q))
+    blogs = paginate(request, blog_list, 6, ('-pub_time', '-id'))
     return render(request, 'registration/index.html', context={'blogs': blogs})
 
 
@@ -604,7 +574,15 @@ def review_action(request, log_id, action):
                 target_url=reverse('blog:blog_detail', args=[content_obj.id])
             )
         else:
-            if log.content_type == 'blog':
+            if log.is_published:
+                # 复查已发布的内容，通过时内容保持不变
+                if log.content_type == 'comment':
+                    verb = "评论内容"
+                    blog_id = json.loads(log.original_content)['blog_id']
+                    target_url = reverse('blog:blog_detail', args=[blog_id]) + f'#comment-{log.content_id}'
+                else:
+                    target_url = reverse('blog:blog_detail', args=[log.content_id])
+            elif log.content_type == 'blog':
                 if log.content_id:
                     # 已有博客的审核
                     existing_blog = get_object_or_404(Blog, id=log.content_id)
@@ -617,6 +595,7 @@ def review_action(request, log_id, action):
                     existing_blog.content = content
                     existing_blog.category = log.category
                     existing_blog.pub_time = timezone.now()
+                    existing_blog.moderated_version = moderation_version()
                     existing_blog.save()
                     verb = "博客文章"
                     target_url = reverse('blog:blog_detail', args=[existing_blog.id])
@@ -629,7 +608,8 @@ def review_action(request, log_id, action):
                         category=log.category,
                         title=title,
                         content=content,
-                        pub_time=timezone.now()
+                        pub_time=timezone.now(),
+                        moderated_version=moderation_version(),
                     )
                     log.content_id = new_blog.id
                     log.save()
@@ -641,7 +621,10 @@ def review_action(request, log_id, action):
                 # # 获取父评论和回复用户对象
                 parent_comment = None
                 if comment_data.get('parent_comment_id'):
-                    parent_comment = BlogComment.objects.get(id=comment_data['parent_comment_id'])
+                    # 父评论已被删除时作为顶级评论发布
+                    parent_comment = BlogComment.objects.filter(
+                        id=comment_data['parent_comment_id'], deleted_at__isnull=True
+                    ).first()
 
                 reply_to_user = None
                 if comment_data.get('reply_to_user_id'):
@@ -649,7 +632,7 @@ def review_action(request, log_id, action):
 
                 blog_instance = get_object_or_404(Blog, id=comment_data['blog_id'])
 
-                new_comment = BlogComment.objects.create(
+                new_comment = create_comment(
                     content=comment_data['content'],
                     blog= blog_instance,
                     author=log.author,
@@ -691,6 +674,16 @@ def review_action(request, log_id, action):
             else:
                 target_url = reverse('blog:index')
 
+        # 复查已发布的内容未通过，删除该内容
+        if log.is_published:
+            if log.content_type == 'blog':
+                content_obj.delete()
+            else:
+                comment = BlogComment.objects.filter(id=log.content_id, deleted_at__isnull=True).first()
+                if comment:
+                    delete_comment_tree(comment)
+                target_url = reverse('blog:blog_detail', args=[json.loads(log.original_content)['blog_id']])
+
         # 如果是举报内容，通知举报人举报成功并删除内容，通知作者违规
         if not log.flagged_by_ai:
             if content_obj:
@@ -729,6 +722,42 @@ def get_moderation_count(request):
         return JsonResponse({'code': 500, 'msg': '服务器错误！'})
 
 
+@require_GET
+@user_passes_test(is_moderator)
+def get_moderation_metrics(request):
+    """
+    获取审核的运行指标（词典大小、版本、热加载耗时、结果缓存，以及各规则的命中次数与耗时分布等）
+    """
+    return JsonResponse({'code': 200, 'msg': '获取成功！', 'data': moderation_metrics()})
+
+
+@require_GET
+@login_required(login_url=reverse_lazy('qxauth:login'))
+def moderation_task_status(request, task_id):
+    """
+    查询异步审核任务的处理状态，只能查询自己提交的任务
+    """
+    task = get_object_or_404(ModerationTask, id=task_id, author=request.user)
+    return JsonResponse({'code': 200, 'data': task_status(task)})
+
+
+def highlight_hits(text, is_html=False):
+    """
+    审核详情页中用 <mark> 标出命中的内容；纯文本先转义，HTML 正文按提取文本的命中位置映射回原文
+    """
+    if is_html:
+        extracted = HtmlText(text)
+        return mark_safe(mark_html(text, [extracted.source_span(*span) for span in hit_spans(extracted.text)]))
+    pieces = []
+    position = 0
+    for start, end in hit_spans(text):
+        pieces.append(escape(text[position:start]))
+        pieces.append(f'<mark>{escape(text[start:end])}</mark>')
+        position = end
+    pieces.append(escape(text[position:]))
+    return mark_safe(''.join(pieces))
+
+
 @user_passes_test(is_moderator, login_url=reverse_lazy('qxauth:login'))
 @require_GET
 def moderation_detail(request, log_id):
@@ -744,8 +773,8 @@ def moderation_detail(request, log_id):
             title = lines[0].replace('标题: ', '').strip()
             content = lines[1].replace('内容: ', '').strip()
             processed_content = {
-                'title': title,
-                'content': content,
+                'title': highlight_hits(title),
+                'content': highlight_hits(content, is_html=True),
             }
         except IndexError:
             # 如果解析失败，提供一个默认值
@@ -754,6 +783,7 @@ def moderation_detail(request, log_id):
         try:
             comment_data = json.loads(log.original_content)
             processed_content = comment_data
+            processed_content['content'] = highlight_hits(comment_data.get('content', ''))
         except json.JSONDecodeError:
             # 如果解析失败，提供一个默认值
             processed_content = {'content': '无法解析的评论内容'}
@@ -12,13 +12,14 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404
 from django.shortcuts import render, redirect, reverse
 from django.http.response import JsonResponse
-from django.core.paginator import Paginator
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt  # 测试时 禁用 CSRF 验证
 
 from .models import Profile, Follow
 from .forms import RegisterForm, LoginForm, ProfileForm
 from blog.models import Blog
+from blog.counters import author_scope, cached_count
+from blog.pagination import paginate
 
 User = get_user_model()
 
@@ -161,10 +162,9 @@ def user_frofile(request, user_id):
     except Profile.DoesNotExist:
         profile = None
 
-    user_blogs = Blog.objects.filter(author=target_user).order_by('-pub_time')
-    paginator = Paginator(user_blogs, 6)
-    page_num = request.GET.get('page')
-    blogs_paginated = paginator.get_page(page_num)
+    # 只显示标题和发布时间，不加载正文
+    user_blogs = Blog.objects.filter(author=target_user).only('id', 'title', 'pub_time')
+    blogs_paginated = paginate(request, user_blogs, 6, ('-pub_time', '-id'), count_scope=author_scope(target_user.id))
 
     is_following = False
     if request.user.is_authenticated and request.user != target_user:
@@ -172,7 +172,7 @@ def user_frofile(request, user_id):
 
     followeds_count = target_user.following.count()
     followers_count_for_template = target_user.followers.count()
-    blog_count = user_blogs.count()  # 获取博客数量
+    blog_count = cached_count(author_scope(target_user.id), user_blogs)  # 获取博客数量（计数缓存）
     garden_age = (timezone.now() - target_user.date_joined).days
 
     context = {
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sjt_blog.settings')
+# 服务进程启动时预先构建审核引擎，避免第一个请求承担加载耗时
+os.environ.setdefault('MODERATION_EAGER_LOAD', '1')
 
 application = get_asgi_application()
@@ -42,8 +42,6 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'blog',
     'qxauth',
-    # 树形结构
-    'mptt',
 ]
 
 MIDDLEWARE = [
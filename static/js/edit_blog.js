@@ -40,6 +40,23 @@ document.addEventListener('DOMContentLoaded', function() {
     const blogForm = document.getElementById('blog-form');
     const submitBtn = document.getElementById('submit-btn');
 
+    // 异步审核任务的轮询
+    function waitForModeration(statusUrl) {
+        fetch(statusUrl)
+            .then(response => response.json())
+            .then(response => {
+                const task = response.data;
+                if (task.status === 'pending' || task.status === 'processing') {
+                    setTimeout(() => waitForModeration(statusUrl), 1000);
+                } else if (task.status === 'published') {
+                    alert(task.result.msg);
+                    window.location.href = submitBtn.dataset.redirectUrl.replace('0', task.result.data.blog_id);
+                } else {
+                    alert(task.result.msg);
+                }
+            });
+    }
+
     if (submitBtn && blogForm) {
         submitBtn.addEventListener('click', function() {
             // 在提交前，确保wangEditor内容已经同步到隐藏的textarea
@@ -63,6 +80,11 @@ document.addEventListener('DOMContentLoaded', function() {
                     const redirectUrlTemplate = submitBtn.dataset.redirectUrl;
                     window.location.href = redirectUrlTemplate.replace('0', data.data.blog_id);
 
+                } else if (data.status === 'processing') {
+                    // 异步审核：轮询任务状态，发布后跳转到博客详情
+                    waitForModeration(data.data.status_url);
+                } else if (data.code === 202) {
+                    alert(data.msg);
                 } else {
                     alert('错误：' + data.msg + '\n' + JSON.stringify(data.errors || {}));
                     console.error('表单提交错误:', data.errors);
@@ -95,6 +95,22 @@ $(document).ready(function() {
             'csrfmiddlewaretoken': csrfToken
         };
 
+        // 异步审核任务的轮询
+        function waitForModeration(statusUrl) {
+            $.get(statusUrl, function(response) {
+                const task = response.data;
+                if (task.status === 'pending' || task.status === 'processing') {
+                    setTimeout(() => waitForModeration(statusUrl), 1000);
+                } else if (task.status === 'published') {
+                    alert('发布成功！');
+                    window.location.href = blogDetailUrlTemplate.replace("0", task.result.data.blog_id);
+                } else {
+                    publishMessageDiv.html(`<div class="alert alert-warning" role="alert">${task.result.msg}</div>`);
+                    alert(task.result.msg);
+                }
+            });
+        }
+
         // 发送 AJAX 请求到 Django 后端
         $.ajax({
             url: pubBlogForm.attr('action'),
@@ -109,7 +125,12 @@ $(document).ready(function() {
                 } else if (response.code === 202) {
                     const warningAlert = `<div class="alert alert-warning" role="alert">${response.msg}</div>`;
                     publishMessageDiv.html(warningAlert);
-                    alert(response.msg);
+                    if (response.status === 'processing') {
+                        // 异步审核：轮询任务状态，发布后跳转到博客详情
+                        waitForModeration(response.data.status_url);
+                    } else {
+                        alert(response.msg);
+                    }
                 }
             },
             error: function(jqXHR, textStatus, errorThrown) {